@@ -0,0 +1,167 @@
+"""
+Admission control: adaptive concurrency limit (AIMD) plus per-request deadlines.
+
+Requests beyond the current limit are rejected immediately with 503 instead of
+queueing in the threadpool and connection pool. The limit grows by roughly one
+per limit's worth of fast completions and is cut multiplicatively when observed
+latency exceeds LOAD_SHED_TARGET_MS or a request fails, at most once per
+target interval so a burst of slow completions doesn't collapse it.
+
+Each admitted request gets a deadline (REQUEST_DEADLINE_MS, overridable per path
+prefix via ROUTE_DEADLINES_MS='{"/books/stats": 500}') that app/database.py turns
+into a statement timeout.
+
+Cover uploads and downloads take as long as the client's connection does, so
+they are neither shed nor time-boxed as a whole; upload_cover gives each of
+its database steps a deadline of its own (step_deadline).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge
+
+from app.database import reset_request_deadline, set_request_deadline
+
+LOAD_SHED_ENABLED = os.getenv("LOAD_SHED_ENABLED", "true").lower() == "true"
+LOAD_SHED_TARGET_MS = float(os.getenv("LOAD_SHED_TARGET_MS", "500"))
+LOAD_SHED_INITIAL_LIMIT = int(os.getenv("LOAD_SHED_INITIAL_LIMIT", "20"))
+LOAD_SHED_MIN_LIMIT = int(os.getenv("LOAD_SHED_MIN_LIMIT", "2"))
+LOAD_SHED_MAX_LIMIT = int(os.getenv("LOAD_SHED_MAX_LIMIT", "200"))
+LOAD_SHED_BACKOFF = 0.8
+
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "5000"))
+ROUTE_DEADLINES_MS: dict[str, float] = json.loads(os.getenv("ROUTE_DEADLINES_MS", "{}"))
+
+# Never shed or time-box probes and scrapes, or transfers paced by the client
+EXEMPT_PREFIXES = ("/health", "/metrics", "/covers/")
+EXEMPT_PATHS = re.compile(r"^/books/[^/]+/cover$")
+
+REQUESTS_SHED = Counter("librarylite_requests_shed_total", "Requests rejected by admission control")
+CONCURRENCY_LIMIT = Gauge("librarylite_concurrency_limit", "Current adaptive concurrency limit")
+REQUESTS_ADMITTED_INFLIGHT = Gauge(
+    "librarylite_admitted_requests_inflight", "Requests currently admitted by admission control"
+)
+
+
+class AdaptiveLimiter:
+    """Thread-safe AIMD concurrency limiter driven by request latency."""
+
+    def __init__(
+        self,
+        initial: int = LOAD_SHED_INITIAL_LIMIT,
+        min_limit: int = LOAD_SHED_MIN_LIMIT,
+        max_limit: int = LOAD_SHED_MAX_LIMIT,
+        target_s: float = LOAD_SHED_TARGET_MS / 1000,
+        backoff: float = LOAD_SHED_BACKOFF,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_s = target_s
+        self.backoff = backoff
+        self.limit = float(initial)
+        self.inflight = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        CONCURRENCY_LIMIT.set(self.limit)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.inflight >= int(self.limit):
+                return False
+            self.inflight += 1
+        REQUESTS_ADMITTED_INFLIGHT.inc()
+        return True
+
+    def release(self, latency_s: float, ok: bool = True) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.inflight -= 1
+            if not ok or latency_s > self.target_s:
+                if now - self._last_decrease >= self.target_s:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            limit = self.limit
+        REQUESTS_ADMITTED_INFLIGHT.dec()
+        CONCURRENCY_LIMIT.set(limit)
+
+
+default_limiter = AdaptiveLimiter()
+
+
+def deadline_for(path: str) -> float:
+    """Deadline in seconds for a path: longest matching ROUTE_DEADLINES_MS prefix or default."""
+    best, best_len = REQUEST_DEADLINE_MS, -1
+    for prefix, ms in ROUTE_DEADLINES_MS.items():
+        if path.startswith(prefix) and len(prefix) > best_len:
+            best, best_len = ms, len(prefix)
+    return best / 1000
+
+
+def is_exempt(path: str) -> bool:
+    return path.startswith(EXEMPT_PREFIXES) or EXEMPT_PATHS.match(path) is not None
+
+
+@contextmanager
+def step_deadline(path: str):
+    """Deadline for one database step of an exempt request, starting now."""
+    token = set_request_deadline(time.monotonic() + deadline_for(path))
+    try:
+        yield
+    finally:
+        reset_request_deadline(token)
+
+
+async def _reject(send) -> None:
+    body = b'{"detail":"Server overloaded, retry later"}'
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", b"1"),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the limiter and setting the request deadline."""
+
+    def __init__(self, app, limiter: AdaptiveLimiter | None = None) -> None:
+        self.app = app
+        self.limiter = limiter or default_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or is_exempt(scope["path"]):
+            return await self.app(scope, receive, send)
+
+        if LOAD_SHED_ENABLED and not self.limiter.try_acquire():
+            REQUESTS_SHED.inc()
+            return await _reject(send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.monotonic()
+        token = set_request_deadline(start + deadline_for(scope["path"]))
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reset_request_deadline(token)
+            if LOAD_SHED_ENABLED:
+                self.limiter.release(time.monotonic() - start, ok=status < 500)
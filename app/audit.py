@@ -0,0 +1,466 @@
+"""
+Append-only audit trail of catalog writes and logins.
+
+Handlers call ``audit_log.record(...)`` once their change is committed. That
+only appends to an in-memory buffer; a writer thread flushes it in batches
+every AUDIT_FLUSH_INTERVAL seconds (sooner once AUDIT_FLUSH_BATCH events are
+waiting). A full buffer (AUDIT_BUFFER_MAX) drops new events and counts them in
+``librarylite_audit_events_total{outcome="dropped"}`` rather than blocking the
+request.
+
+Sinks (AUDIT_SINK):
+
+  * ``file`` (default) - gzip-compressed JSON lines in AUDIT_DIR. Each process
+    appends to its own open segment, rotated after AUDIT_SEGMENT_MAX_BYTES of
+    events or AUDIT_SEGMENT_MAX_SECONDS; closed segments are named after the
+    time range they cover, so queries skip the rest without decompressing them.
+    Every batch ends in a gzip sync point, so after a crash an open segment is
+    still readable up to its last flush. AUDIT_FSYNC is ``flush`` (fsync every
+    batch), ``interval`` (at most every AUDIT_FSYNC_INTERVAL seconds) or
+    ``rotate`` (only when a segment is closed).
+  * ``database`` - one multi-row INSERT into ``audit_events`` per batch.
+  * ``package.module:ClassName`` - any class implementing write/close.
+
+Query (time-ordered JSON lines on stdout):
+
+    python -m app.audit --since 2026-10-01 --until 2026-10-02T12:00 --action 'book.*'
+"""
+
+import argparse
+import fnmatch
+import gzip
+import heapq
+import importlib
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Protocol
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import insert
+
+from app import models
+from app.database import SessionLocal
+
+AUDIT_ENABLED = os.getenv("AUDIT_ENABLED", "true").lower() == "true"
+AUDIT_SINK = os.getenv("AUDIT_SINK", "file")
+AUDIT_DIR = Path(os.getenv("AUDIT_DIR", "./data/audit"))
+AUDIT_BUFFER_MAX = int(os.getenv("AUDIT_BUFFER_MAX", "10000"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1"))
+AUDIT_FLUSH_BATCH = int(os.getenv("AUDIT_FLUSH_BATCH", "1000"))
+AUDIT_FSYNC = os.getenv("AUDIT_FSYNC", "flush")
+AUDIT_FSYNC_INTERVAL = float(os.getenv("AUDIT_FSYNC_INTERVAL", "5"))
+AUDIT_SEGMENT_MAX_BYTES = int(os.getenv("AUDIT_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+AUDIT_SEGMENT_MAX_SECONDS = float(os.getenv("AUDIT_SEGMENT_MAX_SECONDS", "3600"))
+
+FSYNC_POLICIES = ("flush", "interval", "rotate")
+# audit-<first ms>-<last ms | "open">-<pid>.jsonl.gz
+SEGMENT_RE = re.compile(r"^audit-(\d{13})-(\d{13}|open)-(\d+)\.jsonl\.gz$")
+
+AUDIT_EVENTS = Counter(
+    "librarylite_audit_events_total", "Audit events by outcome", ["outcome"]
+)  # written | dropped
+AUDIT_WRITE_ERRORS = Counter(
+    "librarylite_audit_write_errors_total", "Failed audit batch writes (events are retried)"
+)
+AUDIT_FLUSH_SECONDS = Histogram(
+    "librarylite_audit_flush_seconds",
+    "Time to write one batch of audit events to the sink",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+AUDIT_BUFFER_DEPTH = Gauge("librarylite_audit_buffer_depth", "Audit events waiting to be written")
+
+
+class AuditSink(Protocol):
+    def write(self, events: list[dict]) -> None: ...
+
+    def close(self) -> None: ...
+
+
+def segment_name(first_ts: float, last_ts: float | None, pid: int) -> str:
+    end = "open" if last_ts is None else f"{math.ceil(last_ts * 1000):013d}"
+    return f"audit-{math.floor(first_ts * 1000):013d}-{end}-{pid}.jsonl.gz"
+
+
+def _fsync_dir(directory: Path) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FileSink:
+    """Rotating gzip JSON-lines segments, one open segment per process."""
+
+    def __init__(
+        self,
+        directory: Path | str | None = None,
+        fsync: str = AUDIT_FSYNC,
+        max_bytes: int = AUDIT_SEGMENT_MAX_BYTES,
+        max_seconds: float = AUDIT_SEGMENT_MAX_SECONDS,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown AUDIT_FSYNC: {fsync!r}")
+        self.directory = Path(directory or AUDIT_DIR)
+        self.fsync = fsync
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self._raw = None
+        self._gzip: gzip.GzipFile | None = None
+        self._path: Path | None = None
+        self._first_ts = self._last_ts = 0.0
+        self._bytes = 0
+        self._opened_at = self._last_fsync = 0.0
+
+    def write(self, events: list[dict]) -> None:
+        if self._gzip is not None and time.monotonic() - self._opened_at >= self.max_seconds:
+            self.close()
+        if self._gzip is None:
+            self._open(min(e["ts"] for e in events))
+
+        data = "".join(json.dumps(e, separators=(",", ":"), default=str) + "\n" for e in events)
+        encoded = data.encode()
+        self._gzip.write(encoded)
+        self._gzip.flush()  # Z_SYNC_FLUSH: everything so far decompresses without the trailer
+        self._bytes += len(encoded)
+        self._first_ts = min(self._first_ts, *(e["ts"] for e in events))
+        self._last_ts = max(self._last_ts, *(e["ts"] for e in events))
+
+        now = time.monotonic()
+        if self.fsync == "flush" or (
+            self.fsync == "interval" and now - self._last_fsync >= AUDIT_FSYNC_INTERVAL
+        ):
+            os.fsync(self._raw.fileno())
+            self._last_fsync = now
+        if self._bytes >= self.max_bytes:
+            self.close()
+
+    def close(self) -> None:
+        """Finish the open segment (gzip trailer, fsync) and rename it to its time range."""
+        if self._gzip is None:
+            return
+        self._gzip.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+        os.replace(
+            self._path, self.directory / segment_name(self._first_ts, self._last_ts, os.getpid())
+        )
+        _fsync_dir(self.directory)
+        self._raw = self._gzip = self._path = None
+
+    def _open(self, first_ts: float) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._path = self.directory / segment_name(first_ts, None, os.getpid())
+        self._raw = open(self._path, "ab")
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6, mtime=0)
+        self._first_ts = self._last_ts = first_ts
+        self._bytes = 0
+        self._opened_at = self._last_fsync = time.monotonic()
+
+
+class DatabaseSink:
+    """One multi-row INSERT into audit_events per batch."""
+
+    def __init__(self, session_factory=SessionLocal) -> None:
+        self.session_factory = session_factory
+
+    def write(self, events: list[dict]) -> None:
+        rows = [
+            {
+                "ts": e["ts"],
+                "tenant_id": e["tenant"],
+                "actor": e["actor"],
+                "action": e["action"],
+                "target": e["target"],
+                "details": e["details"],
+            }
+            for e in events
+        ]
+        with self.session_factory() as db:
+            db.execute(insert(models.AuditRecord), rows)
+            db.commit()
+
+    def close(self) -> None:
+        return None
+
+
+def build_sink(name: str = AUDIT_SINK) -> AuditSink:
+    if name == "file":
+        return FileSink()
+    if name == "database":
+        return DatabaseSink()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown AUDIT_SINK: {name!r}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class AuditLog:
+    """Bounded in-memory buffer in front of a sink, drained by a writer thread."""
+
+    def __init__(
+        self,
+        sink: AuditSink,
+        enabled: bool = AUDIT_ENABLED,
+        buffer_max: int = AUDIT_BUFFER_MAX,
+        flush_batch: int = AUDIT_FLUSH_BATCH,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+    ) -> None:
+        self.sink = sink
+        self.enabled = enabled
+        self.buffer_max = buffer_max
+        self.flush_batch = flush_batch
+        self.flush_interval = flush_interval
+        self._buffer: deque[dict] = deque()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def record(
+        self,
+        action: str,
+        actor: str | None,
+        tenant_id: str,
+        target: object = None,
+        **details,
+    ) -> bool:
+        """Queue an event; never blocks. False if it was dropped (buffer full or disabled)."""
+        if not self.enabled:
+            return False
+        if len(self._buffer) >= self.buffer_max:
+            AUDIT_EVENTS.labels("dropped").inc()
+            return False
+        self._buffer.append(
+            {
+                "ts": time.time(),
+                "tenant": tenant_id,
+                "actor": actor,
+                "action": action,
+                "target": None if target is None else str(target),
+                "details": details or None,
+            }
+        )
+        if len(self._buffer) >= self.flush_batch:
+            self._wake.set()
+        return True
+
+    def flush(self) -> int:
+        """Write everything buffered so far in batches; returns how many events were written."""
+        written = 0
+        with self._flush_lock:
+            while self._buffer:
+                batch = []
+                while self._buffer and len(batch) < self.flush_batch:
+                    batch.append(self._buffer.popleft())
+                start = time.perf_counter()
+                try:
+                    self.sink.write(batch)
+                except Exception as e:
+                    # put them back in order; the next flush retries
+                    self._buffer.extendleft(reversed(batch))
+                    AUDIT_WRITE_ERRORS.inc()
+                    print(f"[AUDIT] Writing {len(batch)} events failed: {e}")
+                    break
+                AUDIT_FLUSH_SECONDS.observe(time.perf_counter() - start)
+                AUDIT_EVENTS.labels("written").inc(len(batch))
+                written += len(batch)
+        return written
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the writer, flush what is left and close the sink."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+        self.sink.close()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+audit_log = AuditLog(build_sink())
+AUDIT_BUFFER_DEPTH.set_function(lambda: len(audit_log))
+
+
+def parse_segment(name: str) -> tuple[float, float, int] | None:
+    """(first ts, last ts, pid) encoded in a segment name; open segments end at +inf."""
+    m = SEGMENT_RE.match(name)
+    if not m:
+        return None
+    last = math.inf if m.group(2) == "open" else int(m.group(2)) / 1000
+    return int(m.group(1)) / 1000, last, int(m.group(3))
+
+
+def read_segment(path: Path) -> Iterator[dict]:
+    """Events of one segment, tolerating a missing trailer or a torn last batch."""
+    decompressor = zlib.decompressobj(wbits=31)
+    pending = b""
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 16):
+            while chunk:
+                try:
+                    pending += decompressor.decompress(chunk)
+                except zlib.error:
+                    return
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    if line:
+                        yield json.loads(line)
+                if not decompressor.eof:
+                    break
+                # concatenated gzip members
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(wbits=31)
+
+
+def query(
+    directory: Path | str | None = None,
+    since: float | None = None,
+    until: float | None = None,
+    actor: str | None = None,
+    action: str | None = None,
+    tenant: str | None = None,
+) -> Iterator[dict]:
+    """Time-ordered events in [since, until] from the file sink's segments.
+
+    Segments outside the range are skipped by name; the rest are merged lazily,
+    opening a segment only once the merge reaches its first timestamp.
+    """
+    lo = -math.inf if since is None else since
+    hi = math.inf if until is None else until
+    segments = []
+    for path in Path(directory or AUDIT_DIR).glob("audit-*.jsonl.gz"):
+        parsed = parse_segment(path.name)
+        if parsed and parsed[0] <= hi and parsed[1] >= lo:
+            segments.append((parsed[0], path))
+    segments.sort()
+
+    def matches(event: dict) -> bool:
+        return (
+            (actor is None or event["actor"] == actor)
+            and (tenant is None or event["tenant"] == tenant)
+            and (action is None or fnmatch.fnmatchcase(event["action"], action))
+        )
+
+    heap: list[tuple[float, int, dict, Iterator[dict]]] = []
+
+    def push(seq: int, events: Iterator[dict]) -> None:
+        for event in events:
+            if event["ts"] >= lo:
+                heapq.heappush(heap, (event["ts"], seq, event, events))
+                return
+
+    opened = 0
+    while heap or opened < len(segments):
+        while opened < len(segments) and (not heap or segments[opened][0] <= heap[0][0]):
+            push(opened, read_segment(segments[opened][1]))
+            opened += 1
+        if not heap:
+            continue
+        ts, seq, event, events = heapq.heappop(heap)
+        if ts > hi:
+            return
+        if matches(event):
+            yield event
+        push(seq, events)
+
+
+def query_database(
+    since: float | None = None,
+    until: float | None = None,
+    actor: str | None = None,
+    action: str | None = None,
+    tenant: str | None = None,
+) -> Iterator[dict]:
+    """Same as query() for AUDIT_SINK=database, using the ts index."""
+    record = models.AuditRecord
+    with SessionLocal() as db:
+        q = db.query(record).order_by(record.ts, record.id)
+        if since is not None:
+            q = q.filter(record.ts >= since)
+        if until is not None:
+            q = q.filter(record.ts <= until)
+        if actor is not None:
+            q = q.filter(record.actor == actor)
+        if tenant is not None:
+            q = q.filter(record.tenant_id == tenant)
+        for row in q.yield_per(1000):
+            if action is None or fnmatch.fnmatchcase(row.action, action):
+                yield {
+                    "ts": row.ts,
+                    "tenant": row.tenant_id,
+                    "actor": row.actor,
+                    "action": row.action,
+                    "target": row.target,
+                    "details": row.details,
+                }
+
+
+def parse_time(value: str) -> float:
+    """Epoch seconds or an ISO 8601 date/datetime (UTC unless an offset is given)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=UTC)
+    return parsed.timestamp()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the audit log")
+    parser.add_argument("--since", type=parse_time, help="epoch seconds or ISO time (UTC)")
+    parser.add_argument("--until", type=parse_time, help="epoch seconds or ISO time (UTC)")
+    parser.add_argument("--actor")
+    parser.add_argument("--action", help="fnmatch pattern, e.g. 'book.*'")
+    parser.add_argument("--tenant")
+    parser.add_argument("--dir", default=None, help=f"segment directory (default {AUDIT_DIR})")
+    args = parser.parse_args(argv)
+
+    filters = {
+        "since": args.since,
+        "until": args.until,
+        "actor": args.actor,
+        "action": args.action,
+        "tenant": args.tenant,
+    }
+    if AUDIT_SINK == "database" and args.dir is None:
+        events = query_database(**filters)
+    else:
+        events = query(args.dir, **filters)
+    out = sys.stdout
+    for event in events:
+        out.write(json.dumps(event, separators=(",", ":")) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
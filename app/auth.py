@@ -4,12 +4,16 @@ Note: behavior unchanged; added docstrings and minor formatting for clarity.
 """
 
 import os
+import uuid
 from datetime import UTC, datetime, timedelta
+from functools import lru_cache
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+
+from app.database import SessionLocal
+from app.models import User
+from app.revocation import revocation_store
 
 # --- JWT / Auth settings ---
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "abc7d9f2e4k1m3n5p7q9r2s4t6v8w0x2z4")
@@ -18,9 +22,25 @@ JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "60"))
 
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin")
+# set to false in real deployments: only DB users can log in
+AUTH_DEMO_FALLBACK = os.getenv("AUTH_DEMO_FALLBACK", "true").lower() == "true"
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+# same header, but anonymous requests pass through (public reads still need the tenant)
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
+
+# JWT claim carrying the user's tenant id (see app/tenancy.py)
+TENANT_CLAIM = "tid"
+# JWT claim set at login for admins; is_admin re-checks the user's flag in the database
+ADMIN_CLAIM = "adm"
+
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    """Bcrypt context, built on first use so passlib stays off the startup import path."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def _truncate_bcrypt_limit(password: str) -> str:
@@ -35,7 +55,7 @@ def hash_password(password: str) -> str:
     """Hash plain password using passlib's bcrypt (safe-truncated)."""
     safe = _truncate_bcrypt_limit(password)
     try:
-        return pwd_context.hash(safe)
+        return get_pwd_context().hash(safe)
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"Password hashing failed: {str(e)}") from e
 
@@ -44,13 +64,20 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify plain password against bcrypt hash (safe-truncated before verify)."""
     safe = _truncate_bcrypt_limit(plain_password)
     try:
-        return pwd_context.verify(safe, hashed_password)
+        return get_pwd_context().verify(safe, hashed_password)
     except Exception:
         return False
 
 
+def normalize_email(email: str) -> str:
+    """Canonical stored/lookup form of an email (matches the lower(email) index)."""
+    return email.strip().lower()
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     """Create a signed JWT with an optional custom expiration delta."""
+    from jose import jwt  # deferred: jose/cryptography are slow to import
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(UTC) + expires_delta
@@ -58,33 +85,92 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
         expire = datetime.now(UTC) + timedelta(minutes=JWT_EXPIRE_MINUTES)
 
     to_encode.update({"exp": expire})
+    # unique token id so a single token can be revoked on logout
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
 
-def verify_token(token: str) -> str | None:
-    """Decode and validate token; return username (sub) or None on failure."""
+def decode_token(token: str) -> dict | None:
+    """Decode and validate signature/expiry; return the claims or None on failure."""
+    from jose import JWTError, jwt
+
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        return username
+        return jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
     except JWTError:
         return None
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
+def verify_claims(token: str) -> dict | None:
+    """Decode and validate token; return its claims, or None if invalid, sub-less or revoked."""
+    payload = decode_token(token)
+    if payload is None or payload.get("sub") is None:
+        return None
+    jti = payload.get("jti")
+    if jti is not None and revocation_store.is_revoked(jti):
+        return None
+    return payload
+
+
+def verify_token(token: str) -> str | None:
+    """Decode and validate token; return username (sub) or None on failure or revocation."""
+    claims = verify_claims(token)
+    return None if claims is None else claims["sub"]
+
+
+def revoke_token(token: str) -> bool:
+    """Revoke a valid token until its expiry; False if it carries no jti/exp."""
+    payload = decode_token(token)
+    if payload is None or "jti" not in payload or "exp" not in payload:
+        return False
+    revocation_store.revoke(payload["jti"], int(payload["exp"]))
+    return True
+
+
+async def get_token_claims(token: str | None = Depends(optional_oauth2_scheme)) -> dict | None:
+    """FastAPI dependency: verified claims of the Bearer token, None when absent or invalid.
+
+    Cached per request by FastAPI, so the token is decoded once even when both
+    get_current_user and the tenant dependency need it.
+    """
+    return None if token is None else verify_claims(token)
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), claims: dict | None = Depends(get_token_claims)
+) -> str:
     """FastAPI dependency returning the current username or raising 401."""
     credential_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    username = verify_token(token)
-    if username is None:
+    if claims is None:
         raise credential_exception
-    return username
+    return claims["sub"]
+
+
+def is_admin(claims: dict | None) -> bool:
+    """Whether verified claims belong to an admin: the token's admin claim and the user's flag.
+
+    The demo admin has no users row and is accepted only while AUTH_DEMO_FALLBACK is on.
+    """
+    if not claims or claims.get(ADMIN_CLAIM) is not True:
+        return False
+    with SessionLocal() as db:
+        flag = db.query(User.is_admin).filter(User.username == claims["sub"]).scalar()
+    if flag is None:
+        return AUTH_DEMO_FALLBACK and claims["sub"] == ADMIN_USERNAME
+    return bool(flag)
+
+
+def get_admin_user(
+    current_user: str = Depends(get_current_user), claims: dict | None = Depends(get_token_claims)
+) -> str:
+    """FastAPI dependency allowing only admins (403 otherwise); sync, as is_admin queries."""
+    if not is_admin(claims):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return current_user
 
 
 def authenticate_demo_user(username: str, password: str) -> str | None:
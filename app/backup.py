@@ -0,0 +1,257 @@
+"""
+Online backup of the whole database into checksummed, compressed segments.
+
+    python -m app.backup ./backups/2026-10-19            # every table
+    python -m app.backup ./backups/books --tables books users
+
+The app keeps serving while this runs; the backup is one consistent snapshot:
+
+  * Postgres - every table is read in a single REPEATABLE READ, READ ONLY
+    transaction, streamed through a server-side cursor.
+  * SQLite - the online backup API first copies the database to a snapshot
+    file next to the segments (writers wait only for that page copy, not in WAL
+    mode), and the segments are read from the copy.
+
+Each table is read in primary-key order and cut into segments of
+BACKUP_SEGMENT_ROWS rows: ``<table>-<n>.json.gz``, a gzip-compressed JSON
+array of rows (columns in manifest order, JSON columns as JSON text). BACKUP_JOBS
+threads encode, compress and fsync segments while the next one is read.
+``manifest.json`` lists every segment with its row count, size and SHA-256; it
+is written last, so a directory without one is an unfinished backup.
+app/restore.py loads it back.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+
+from sqlalchemy import JSON, Table, Text, cast, create_engine, select
+from sqlalchemy.engine import Connection, Engine
+
+from app import models
+from app.database import engine as default_engine
+
+BACKUP_SEGMENT_ROWS = int(os.getenv("BACKUP_SEGMENT_ROWS", "100000"))
+BACKUP_COMPRESS_LEVEL = int(os.getenv("BACKUP_COMPRESS_LEVEL", "1"))
+BACKUP_JOBS = int(os.getenv("BACKUP_JOBS", "2"))
+
+FORMAT = 1
+MANIFEST = "manifest.json"
+SNAPSHOT = ".snapshot.sqlite"
+
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+class BackupError(Exception):
+    """A backup that can't be written, or a segment or manifest that doesn't check out."""
+
+
+def select_tables(names: list[str] | None = None) -> list[Table]:
+    """The models' tables (all of them by default), in metadata order."""
+    tables = models.Base.metadata.sorted_tables
+    if not names:
+        return tables
+    unknown = set(names) - {table.name for table in tables}
+    if unknown:
+        raise BackupError(f"Unknown tables: {', '.join(sorted(unknown))}")
+    return [table for table in tables if table.name in names]
+
+
+def write_segment(path: Path, rows: list[tuple], level: int = BACKUP_COMPRESS_LEVEL) -> dict:
+    """Write one segment file; returns its manifest entry."""
+    data = gzip.compress(_encode(rows).encode(), compresslevel=level, mtime=0)
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return {
+        "file": path.name,
+        "rows": len(rows),
+        "bytes": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+
+
+def _checked_bytes(directory: Path, segment: dict) -> bytes:
+    path = Path(directory) / segment["file"]
+    try:
+        data = path.read_bytes()
+    except OSError as e:
+        raise BackupError(f"{segment['file']}: {e}") from e
+    if len(data) != segment["bytes"] or hashlib.sha256(data).hexdigest() != segment["sha256"]:
+        raise BackupError(f"{segment['file']}: checksum mismatch")
+    return data
+
+
+def check_segment(directory: Path, segment: dict) -> None:
+    """Check a segment file's size and checksum without decoding it."""
+    _checked_bytes(directory, segment)
+
+
+def read_segment(directory: Path, segment: dict) -> list[list]:
+    """A segment's rows, after checking its size, checksum and row count."""
+    rows = json.loads(gzip.decompress(_checked_bytes(directory, segment)))
+    if len(rows) != segment["rows"]:
+        raise BackupError(f"{segment['file']}: {len(rows)} rows, manifest says {segment['rows']}")
+    return rows
+
+
+def read_manifest(directory: Path) -> dict:
+    try:
+        manifest = json.loads((Path(directory) / MANIFEST).read_text())
+    except FileNotFoundError as e:
+        raise BackupError(f"No {MANIFEST} in {directory} (missing or unfinished backup)") from e
+    if manifest.get("format") != FORMAT:
+        raise BackupError(f"Unsupported backup format {manifest.get('format')!r}")
+    return manifest
+
+
+def _export_table(
+    conn: Connection,
+    table: Table,
+    directory: Path,
+    pool: ThreadPoolExecutor,
+    jobs: int,
+    segment_rows: int,
+    level: int,
+) -> dict:
+    # JSON columns are copied as their JSON text: no decoding here, no encoding on restore
+    stmt = select(
+        *(cast(c, Text).label(c.name) if isinstance(c.type, JSON) else c for c in table.columns)
+    ).order_by(*table.primary_key.columns)
+    result = conn.execute(stmt.execution_options(yield_per=segment_rows))
+    segments: list[dict] = []
+    pending: deque = deque()
+    for number, chunk in enumerate(result.partitions()):
+        path = directory / f"{table.name}-{number:06d}.json.gz"
+        pending.append(pool.submit(write_segment, path, [tuple(row) for row in chunk], level))
+        # bounded read-ahead: at most a couple of segments per thread held in memory
+        while len(pending) > 2 * jobs:
+            segments.append(pending.popleft().result())
+    segments.extend(future.result() for future in pending)
+    return {
+        "columns": [column.name for column in table.columns],
+        "rows": sum(segment["rows"] for segment in segments),
+        "segments": segments,
+    }
+
+
+def _export(
+    conn: Connection, tables: list[Table], directory: Path, segment_rows: int, level: int, jobs: int
+) -> dict:
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="backup") as pool:
+        exported = {}
+        for table in tables:
+            started = time.perf_counter()
+            exported[table.name] = _export_table(
+                conn, table, directory, pool, jobs, segment_rows, level
+            )
+            print(
+                f"[BACKUP] {table.name}: {exported[table.name]['rows']} rows in "
+                f"{len(exported[table.name]['segments'])} segments, "
+                f"{time.perf_counter() - started:.1f}s"
+            )
+        return exported
+
+
+def backup(
+    directory: str | Path,
+    engine: Engine = default_engine,
+    tables: list[str] | None = None,
+    segment_rows: int = BACKUP_SEGMENT_ROWS,
+    level: int = BACKUP_COMPRESS_LEVEL,
+    jobs: int = BACKUP_JOBS,
+) -> dict:
+    """Write a consistent snapshot of ``tables`` into ``directory``; returns the manifest."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    if any(directory.iterdir()):
+        raise BackupError(f"{directory} is not empty")
+    selected = select_tables(tables)
+    started = time.time()
+
+    if engine.dialect.name == "sqlite":
+        if not engine.url.database or engine.url.database == ":memory:":
+            raise BackupError("In-memory SQLite databases can't be backed up")
+        snapshot = directory / SNAPSHOT
+        raw = engine.raw_connection()
+        try:
+            with closing(sqlite3.connect(snapshot)) as target:
+                raw.driver_connection.backup(target)
+        finally:
+            raw.close()
+        print(f"[BACKUP] SQLite snapshot copied in {time.time() - started:.1f}s")
+        source = create_engine(f"sqlite:///{snapshot}")
+        try:
+            with source.connect() as conn:
+                exported = _export(conn, selected, directory, segment_rows, level, jobs)
+        finally:
+            source.dispose()
+            snapshot.unlink()
+    else:
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="REPEATABLE READ", postgresql_readonly=True)
+            with conn.begin():
+                exported = _export(conn, selected, directory, segment_rows, level, jobs)
+
+    manifest = {
+        "format": FORMAT,
+        "created_at": started,
+        "dialect": engine.dialect.name,
+        "tables": exported,
+    }
+    tmp = directory / f"{MANIFEST}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, directory / MANIFEST)
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return manifest
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Back up the database into segment files")
+    parser.add_argument("directory", help="new or empty directory for the segments")
+    parser.add_argument("--tables", nargs="+", help="only these tables (default: all)")
+    parser.add_argument("--segment-rows", type=int, default=BACKUP_SEGMENT_ROWS)
+    parser.add_argument("--level", type=int, default=BACKUP_COMPRESS_LEVEL, help="gzip level")
+    parser.add_argument("--jobs", type=int, default=BACKUP_JOBS)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        manifest = backup(
+            args.directory,
+            tables=args.tables,
+            segment_rows=args.segment_rows,
+            level=args.level,
+            jobs=args.jobs,
+        )
+    except BackupError as e:
+        print(f"[BACKUP] {e}", file=sys.stderr)
+        return 1
+    tables = manifest["tables"].values()
+    print(
+        f"[BACKUP] {sum(t['rows'] for t in tables)} rows, "
+        f"{sum(s['bytes'] for t in tables for s in t['segments'])} bytes "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,8 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # tenant for anonymous requests without X-Tenant and for rows created before tenancy
+    DEFAULT_TENANT: str = os.getenv("DEFAULT_TENANT", "default")
 
 
 settings = Settings()
@@ -0,0 +1,230 @@
+"""
+Book cover storage and thumbnails.
+
+Uploads are streamed chunk by chunk into a temp file while being hashed, then
+renamed to their content address (sha256 + extension detected from the file's
+magic bytes), so the same image uploaded for many books is stored once:
+
+    COVER_DIR/ab/ab12...ef.jpg           original
+    COVER_DIR/thumbs/ab/ab12...ef.jpg    COVER_THUMB_SIZE px JPEG thumbnail
+
+Thumbnails are rendered by a small process pool (COVER_THUMB_WORKERS) so
+image decoding never runs on the event loop or the request threadpool. At
+most COVER_THUMB_QUEUE_MAX jobs wait; beyond that a job is dropped and the
+thumbnail is re-requested the first time it is served.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from collections.abc import AsyncIterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge, Histogram
+
+COVER_DIR = Path(os.getenv("COVER_DIR", "./data/covers"))
+COVER_MAX_BYTES = int(os.getenv("COVER_MAX_BYTES", str(5 * 1024 * 1024)))
+COVER_THUMB_SIZE = int(os.getenv("COVER_THUMB_SIZE", "240"))
+COVER_THUMB_WORKERS = int(os.getenv("COVER_THUMB_WORKERS", "2"))
+COVER_THUMB_QUEUE_MAX = int(os.getenv("COVER_THUMB_QUEUE_MAX", "64"))
+
+# content-addressed URLs never change meaning, so browsers may cache them forever
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+COVER_KEY_RE = re.compile(r"^[0-9a-f]{64}\.(jpg|png|gif|webp)$")
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp"}
+
+COVER_UPLOADS = Counter(
+    "librarylite_cover_uploads_total", "Accepted cover uploads", ["result"]
+)  # stored | deduplicated
+THUMB_QUEUE_DEPTH = Gauge(
+    "librarylite_cover_thumbnail_queue_depth", "Thumbnail jobs submitted and not yet finished"
+)
+THUMB_SECONDS = Histogram(
+    "librarylite_cover_thumbnail_seconds",
+    "Time a worker process spent rendering one thumbnail",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+THUMB_WAIT_SECONDS = Histogram(
+    "librarylite_cover_thumbnail_queue_wait_seconds",
+    "Time a thumbnail job waited for a free worker",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 15),
+)
+THUMBS_TOTAL = Counter(
+    "librarylite_cover_thumbnails_total", "Thumbnail jobs by outcome", ["outcome"]
+)  # ok | error | dropped
+
+_pool: ProcessPoolExecutor | None = None
+_pending: set[str] = set()
+_pool_lock = threading.Lock()
+
+
+def sniff_extension(head: bytes) -> str | None:
+    """Detect the image type from magic bytes; the client's Content-Type is not trusted."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def original_path(key: str, directory: Path | None = None) -> Path:
+    return (directory or COVER_DIR) / key[:2] / key
+
+
+def thumbnail_path(key: str, directory: Path | None = None) -> Path:
+    digest = key.partition(".")[0]
+    return (directory or COVER_DIR) / "thumbs" / key[:2] / f"{digest}.jpg"
+
+
+def media_type(key: str) -> str:
+    return MEDIA_TYPES[key.rpartition(".")[2]]
+
+
+async def store_upload(
+    chunks: AsyncIterator[bytes],
+    max_bytes: int = COVER_MAX_BYTES,
+    directory: Path | None = None,
+) -> str:
+    """Stream chunks to disk, hashing on the way, and return the cover key.
+
+    Raises 413 past ``max_bytes``, 415 for non-images and 400 for an empty body;
+    the partial temp file is removed in every failure case. File writes run in a
+    worker thread, off the event loop.
+    """
+    directory = directory or COVER_DIR
+    tmp_dir = directory / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=tmp_dir)
+    tmp = Path(tmp_name)
+    hasher = hashlib.sha256()
+    head = b""
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail="Cover image too large")
+                if len(head) < 16:
+                    head += chunk[: 16 - len(head)]
+                hasher.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        ext = sniff_extension(head)
+        if ext is None:
+            raise HTTPException(status_code=415, detail="Cover must be a JPEG, PNG, GIF or WebP")
+
+        key = f"{hasher.hexdigest()}.{ext}"
+        stored = await asyncio.to_thread(_move_into_place, tmp, original_path(key, directory))
+        COVER_UPLOADS.labels("stored" if stored else "deduplicated").inc()
+        return key
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _move_into_place(tmp: Path, dest: Path) -> bool:
+    """Rename the temp file to its content address; False (and dropped) if already stored."""
+    if dest.exists():
+        tmp.unlink()
+        return False
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp, dest)
+    return True
+
+
+def _render_thumbnail(src: str, dst: str, size: int, submitted_at: float) -> tuple[float, float]:
+    """Runs in a worker process; returns (queue wait, render time) in seconds."""
+    started_at = time.time()
+    start = time.perf_counter()
+    from PIL import Image, ImageOps
+
+    with Image.open(src) as im:
+        im.draft("RGB", (size, size))  # JPEG: decode at reduced scale, far less work
+        img = ImageOps.exif_transpose(im)
+        img.thumbnail((size, size))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        img.save(tmp, "JPEG", quality=82, optimize=True)
+    os.replace(tmp, dst)
+    return started_at - submitted_at, time.perf_counter() - start
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that already runs threads (uvicorn, profiler) is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=COVER_THUMB_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def _job_done(key: str, future: Future) -> None:
+    with _pool_lock:
+        _pending.discard(key)
+        THUMB_QUEUE_DEPTH.set(len(_pending))
+    try:
+        wait, render = future.result()
+    except Exception as e:
+        THUMBS_TOTAL.labels("error").inc()
+        print(f"[COVERS] Thumbnail for {key} failed: {e}")
+        return
+    THUMB_WAIT_SECONDS.observe(max(wait, 0.0))
+    THUMB_SECONDS.observe(render)
+    THUMBS_TOTAL.labels("ok").inc()
+
+
+def schedule_thumbnail(key: str, directory: Path | None = None) -> Future | None:
+    """Queue thumbnail rendering; None if already queued, already present or the queue is full."""
+    dst = thumbnail_path(key, directory)
+    if dst.exists():
+        return None
+    with _pool_lock:
+        if key in _pending:
+            return None
+        if len(_pending) >= COVER_THUMB_QUEUE_MAX:
+            THUMBS_TOTAL.labels("dropped").inc()
+            return None
+        _pending.add(key)
+        THUMB_QUEUE_DEPTH.set(len(_pending))
+    try:
+        future = _get_pool().submit(
+            _render_thumbnail,
+            str(original_path(key, directory)),
+            str(dst),
+            COVER_THUMB_SIZE,
+            time.time(),
+        )
+    except Exception:
+        with _pool_lock:
+            _pending.discard(key)
+            THUMB_QUEUE_DEPTH.set(len(_pending))
+        raise
+    future.add_done_callback(lambda f: _job_done(key, f))
+    return future
+
+
+def shutdown_thumbnail_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
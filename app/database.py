@@ -1,21 +1,44 @@
 """
 Database setup: engine/session configuration for SQLite/Postgres.
-Behavior unchanged; docstring and comments added for clarity.
+
+SQL instrumentation lives here too: engine-level cursor hooks time every
+statement, feed a per-fingerprint/per-route latency histogram, count queries
+per request and log slow statements together with their EXPLAIN plan.
+
+Request deadlines (set by app/admission.py) are enforced at the database:
+Postgres transactions get a matching ``SET LOCAL statement_timeout`` and
+SQLite statements are interrupted by a progress handler once the deadline passes.
 """
 
+import hashlib
+import logging
 import os
+import re
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
 
-from sqlalchemy import create_engine
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 # Prefer Settings.DATABASE_URL (from env). Fall back to local sqlite.
 DATABASE_URL = settings.DATABASE_URL or os.getenv("DATABASE_URL", "sqlite:///./dev.db")
 
 # Optional SSL flag for managed Postgres providers; disabled by default for local dev
 REQUIRE_SSL = os.getenv("DATABASE_REQUIRE_SSL", "false").lower() == "true"
 
+# Statements slower than this are logged with their plan (0 disables the slow-query log)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+
+# Max seconds to wait for a pooled connection (Postgres); keeps waits bounded under load
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
 # If using Postgres and SSL is explicitly required but not present, append sslmode=require
 if REQUIRE_SSL and DATABASE_URL.startswith("postgresql") and "sslmode" not in DATABASE_URL:
     sep = "&" if "?" in DATABASE_URL else "?"
@@ -25,7 +48,223 @@ if REQUIRE_SSL and DATABASE_URL.startswith("postgresql") and "sslmode" not in DA
 if DATABASE_URL.startswith("sqlite"):
     engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 else:
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    engine = create_engine(DATABASE_URL, pool_pre_ping=True, pool_timeout=DB_POOL_TIMEOUT)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+
+# --- request deadlines ---
+class DeadlineExceeded(Exception):
+    """Raised when a statement would start after the current request's deadline."""
+
+
+_request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+def set_request_deadline(deadline: float | None):
+    """Set the absolute time.monotonic() deadline for DB work in this context; returns a token."""
+    return _request_deadline.set(deadline)
+
+
+def reset_request_deadline(token) -> None:
+    _request_deadline.reset(token)
+
+
+def deadline_remaining() -> float | None:
+    """Seconds left before the current request's deadline (None when there is no deadline)."""
+    deadline = _request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _sqlite_deadline_handler() -> int:
+    deadline = _request_deadline.get()
+    return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_conn, connection_record, connection_proxy):
+    if engine.dialect.name == "sqlite":
+        # called every 1000 VM steps; a non-zero return interrupts the running statement
+        dbapi_conn.set_progress_handler(_sqlite_deadline_handler, 1000)
+
+
+@event.listens_for(SessionLocal, "after_begin")
+def _apply_statement_timeout(session, transaction, connection):
+    remaining = deadline_remaining()
+    if remaining is None or connection.dialect.name != "postgresql":
+        return
+    if remaining <= 0:
+        raise DeadlineExceeded("request deadline exceeded before the transaction started")
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}")
+
+
+# --- SQL instrumentation ---
+SQL_QUERY_SECONDS = Histogram(
+    "librarylite_sql_query_duration_seconds",
+    "SQL statement latency by route and statement fingerprint",
+    ["route", "fingerprint"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+SQL_QUERIES_PER_REQUEST = Histogram(
+    "librarylite_sql_queries_per_request",
+    "Number of SQL statements executed per HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+SQL_FINGERPRINT_INFO = Gauge(
+    "librarylite_sql_fingerprint_info",
+    "Maps a statement fingerprint label to its normalized SQL text",
+    ["fingerprint", "statement"],
+)
+
+NO_ROUTE = "none"
+
+OTHER_FINGERPRINT = "other"
+_MAX_FINGERPRINTS = 10_000
+
+# string/number literals and DBAPI placeholders (qmark, pyformat, format) all become "?"
+_LITERALS_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|%s")
+# expanded IN lists differ only in length; one fingerprint covers them all
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+_fingerprints: dict[str, str] = {}
+
+# Observers get (statement, duration_s, route) for every statement; used by profiling/tests
+QueryObserver = Callable[[str, float, str], None]
+_query_observers: list[QueryObserver] = []
+
+
+class RequestQueryStats:
+    """Per-request SQL counters; the route template is read lazily from the ASGI scope."""
+
+    __slots__ = ("scope", "count", "seconds")
+
+    def __init__(self, scope: dict | None = None) -> None:
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route") if self.scope else None
+        return getattr(route, "path", NO_ROUTE)
+
+
+_request_queries: ContextVar[RequestQueryStats | None] = ContextVar("request_queries", default=None)
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Short stable id for a statement with literals, IN-list lengths and whitespace
+    normalized away. Once _MAX_FINGERPRINTS statements are known, unseen ones all
+    share OTHER_FINGERPRINT so the label set (and SQL_FINGERPRINT_INFO) stays bounded.
+    """
+    cached = _fingerprints.get(statement)
+    if cached is not None:
+        return cached
+    if len(_fingerprints) >= _MAX_FINGERPRINTS:
+        return OTHER_FINGERPRINT
+    normalized = _LITERALS_RE.sub("?", statement)
+    normalized = _IN_LIST_RE.sub("IN (...)", normalized)
+    normalized = _WHITESPACE_RE.sub(" ", normalized).strip()
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+    _fingerprints[statement] = digest
+    SQL_FINGERPRINT_INFO.labels(digest, normalized[:300]).set(1)
+    return digest
+
+
+def add_query_observer(observer: QueryObserver) -> None:
+    _query_observers.append(observer)
+
+
+def remove_query_observer(observer: QueryObserver) -> None:
+    _query_observers.remove(observer)
+
+
+def _explain(cursor, statement: str, parameters, dialect: str) -> str:
+    """Best-effort plan for a slow SELECT, run on the same DBAPI connection."""
+    if dialect == "sqlite":
+        sql = f"EXPLAIN QUERY PLAN {statement}"
+    elif dialect == "postgresql":
+        sql = f"EXPLAIN {statement}"
+    else:
+        return "(EXPLAIN not supported for this dialect)"
+
+    dbapi_conn = cursor.connection
+    explain_cursor = dbapi_conn.cursor()
+    try:
+        if dialect == "postgresql":
+            # a failing EXPLAIN must not abort the request's transaction
+            explain_cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            explain_cursor.execute(sql, parameters or ())
+            rows = explain_cursor.fetchall()
+        except Exception as e:
+            if dialect == "postgresql":
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return f"(EXPLAIN failed: {e})"
+        if dialect == "postgresql":
+            explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return "\n".join(" | ".join(str(col) for col in row) for row in rows)
+    finally:
+        explain_cursor.close()
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    deadline = _request_deadline.get()
+    if deadline is not None and time.monotonic() > deadline:
+        raise DeadlineExceeded("request deadline exceeded")
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+
+    stats = _request_queries.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += duration
+        route = stats.route
+    else:
+        route = NO_ROUTE
+
+    SQL_QUERY_SECONDS.labels(route, fingerprint(statement)).observe(duration)
+    for observer in _query_observers:
+        observer(statement, duration, route)
+
+    if SLOW_QUERY_MS > 0 and duration * 1000 >= SLOW_QUERY_MS:
+        plan = ""
+        if SLOW_QUERY_EXPLAIN and not executemany and statement.lstrip()[:6].upper() == "SELECT":
+            plan = _explain(cursor, statement, parameters, conn.dialect.name)
+        logger.warning(
+            "slow query %.1fms route=%s fingerprint=%s\n%s\nplan:\n%s",
+            duration * 1000,
+            route,
+            fingerprint(statement),
+            statement,
+            plan or "(not collected)",
+        )
+
+
+class QueryCountMiddleware:
+    """Pure ASGI middleware tracking SQL statements per request for the histogram above."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestQueryStats(scope)
+        token = _request_queries.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_queries.reset(token)
+            SQL_QUERIES_PER_REQUEST.labels(stats.route).observe(stats.count)
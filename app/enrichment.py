@@ -0,0 +1,496 @@
+"""
+ISBN, page count and subjects for catalog books, from an external metadata service.
+
+Enrichment never runs on the request path. A ``book.created`` outbox event (or
+a ``book.updated`` that changes the ISBN) hands the book to a background thread
+with its own event loop and one pooled ``httpx.AsyncClient``: at most
+ENRICH_CONCURRENCY requests in flight, each cut off after ENRICH_TIMEOUT
+seconds, and concurrent lookups of the same key share one request. Once
+ENRICH_QUEUE_MAX books are waiting, new ones are skipped instead of queued;
+like failed lookups they keep ``enriched_at`` NULL for the bulk command.
+
+The service is expected to speak this subset of the Open Library API:
+
+    GET {ENRICH_URL}/isbn/{isbn}.json                      number_of_pages, subjects, isbn_13
+    GET {ENRICH_URL}/search.json?title=..&author=..&limit=1   docs[0]: isbn, subject, ...
+
+Books with an ISBN are looked up by it, the others by title and author; a
+user-entered ISBN is never overwritten. After an ISBN change the page count and
+subjects come from the new lookup only (cleared when it finds nothing).
+Answers, "not found" included, are cached on disk in ENRICH_CACHE_DIR (one JSON
+file per key, shared by all workers) for ENRICH_CACHE_TTL / ENRICH_NEGATIVE_TTL
+seconds. Failures (timeouts, connection errors, 5xx) are not cached.
+
+    python -m app.enrichment                 # enrich books never enriched
+    python -m app.enrichment --all           # refresh every book (the cache still applies)
+    python -m app.enrichment --prune-cache   # delete expired cache entries
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import JSON, bindparam, func, select, update
+
+from app import models
+from app.database import SessionLocal
+from app.isbn import normalize_isbn
+from app.outbox import OutboxMessage, registry
+from app.suggest import normalize
+
+ENRICH_URL = os.getenv("ENRICH_URL", "")  # empty: enrichment is off
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "8"))
+ENRICH_TIMEOUT = float(os.getenv("ENRICH_TIMEOUT", "5"))
+ENRICH_QUEUE_MAX = int(os.getenv("ENRICH_QUEUE_MAX", "1000"))
+ENRICH_BATCH_SIZE = int(os.getenv("ENRICH_BATCH_SIZE", "500"))
+ENRICH_CACHE_DIR = Path(os.getenv("ENRICH_CACHE_DIR", "./data/enrich"))
+ENRICH_CACHE_TTL = float(os.getenv("ENRICH_CACHE_TTL", str(30 * 86400)))
+ENRICH_NEGATIVE_TTL = float(os.getenv("ENRICH_NEGATIVE_TTL", "86400"))
+ENRICH_MAX_SUBJECTS = 20
+
+ENRICH_BOOKS = Counter(
+    "librarylite_enrich_books_total", "Books handled by enrichment by outcome", ["outcome"]
+)  # enriched | not_found | failed | skipped
+ENRICH_LOOKUPS = Counter(
+    "librarylite_enrich_lookups_total", "Metadata lookups by outcome", ["outcome"]
+)  # cached | coalesced | fetched | not_found | failed
+ENRICH_REQUEST_SECONDS = Histogram(
+    "librarylite_enrich_request_seconds",
+    "Metadata service requests, including waits for a connection",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+ENRICH_QUEUE_DEPTH = Gauge(
+    "librarylite_enrich_queue_depth", "Books handed to the enricher and not yet done"
+)
+
+MISS = object()
+
+
+class EnrichmentError(Exception):
+    """The metadata service could not answer (timeout, connection error, 5xx)."""
+
+
+def lookup_key(isbn: str | None, title: str, author: str) -> str:
+    return f"isbn:{isbn}" if isbn else f"search:{normalize(title)}|{normalize(author)}"
+
+
+def _metadata(isbns, pages, subjects) -> dict:
+    isbn = next(filter(None, (normalize_isbn(str(i)) for i in isbns or ())), None)
+    names = [s if isinstance(s, str) else str(s.get("name", "")) for s in subjects or ()]
+    return {
+        "isbn": isbn,
+        "page_count": pages if isinstance(pages, int) and pages > 0 else None,
+        "subjects": [name.strip()[:100] for name in names if name.strip()][:ENRICH_MAX_SUBJECTS],
+    }
+
+
+class LookupCache:
+    """One JSON file per lookup key under ``directory`` (sharded by hash), with a TTL."""
+
+    def __init__(
+        self,
+        directory: Path | str | None = None,
+        ttl: float = ENRICH_CACHE_TTL,
+        negative_ttl: float = ENRICH_NEGATIVE_TTL,
+    ) -> None:
+        self.directory = Path(directory or ENRICH_CACHE_DIR)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.json"
+
+    def get(self, key: str):
+        """The cached answer (None means "not found"), or MISS."""
+        try:
+            entry = json.loads(self._path(key).read_text())
+        except (OSError, ValueError):
+            return MISS
+        if entry.get("key") != key or entry.get("expires_at", 0) <= time.time():
+            return MISS
+        return entry["value"]
+
+    def put(self, key: str, value: dict | None) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        ttl = self.ttl if value is not None else self.negative_ttl
+        entry = {"key": key, "expires_at": time.time() + ttl, "value": value}
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)  # readers in other workers see the old or the new entry
+
+    def prune(self) -> int:
+        """Delete expired entries; returns how many."""
+        removed, now = 0, time.time()
+        for path in self.directory.glob("*/*.json"):
+            try:
+                expired = json.loads(path.read_text()).get("expires_at", 0) <= now
+            except (OSError, ValueError):
+                expired = True
+            if expired:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+class MetadataClient:
+    """Pooled async client for the metadata service, with the cache and request coalescing.
+
+    Use it from a single event loop.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        cache: LookupCache | None = None,
+        concurrency: int = ENRICH_CONCURRENCY,
+        timeout: float = ENRICH_TIMEOUT,
+    ) -> None:
+        import httpx  # deferred: only processes that enrich pay for the import
+
+        self._http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            headers={"Accept": "application/json"},
+        )
+        self.cache = cache or LookupCache()
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(concurrency)
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def lookup(self, isbn: str | None, title: str, author: str) -> dict | None:
+        """Metadata for a book, or None when the service does not know it."""
+        key = lookup_key(isbn, title, author)
+        cached = self.cache.get(key)
+        if cached is not MISS:
+            ENRICH_LOOKUPS.labels("cached").inc()
+            return cached
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, isbn, title, author))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            ENRICH_LOOKUPS.labels("coalesced").inc()
+        # one caller giving up must not cancel the request the others are waiting for
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str, isbn: str | None, title: str, author: str) -> dict | None:
+        started = time.perf_counter()
+        try:
+            async with self._slots:
+                # the deadline covers connecting and reading, not waiting for a slot
+                async with asyncio.timeout(self.timeout):
+                    if isbn:
+                        result = await self._by_isbn(isbn)
+                    else:
+                        result = await self._by_search(title, author)
+        except Exception as e:
+            ENRICH_LOOKUPS.labels("failed").inc()
+            raise EnrichmentError(f"{key}: {e!r}") from e
+        finally:
+            ENRICH_REQUEST_SECONDS.observe(time.perf_counter() - started)
+        self.cache.put(key, result)
+        ENRICH_LOOKUPS.labels("fetched" if result else "not_found").inc()
+        return result
+
+    async def _by_isbn(self, isbn: str) -> dict | None:
+        response = await self._http.get(f"/isbn/{isbn}.json")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        data = response.json()
+        isbns = [isbn, *data.get("isbn_13", ()), *data.get("isbn_10", ())]
+        return _metadata(isbns, data.get("number_of_pages"), data.get("subjects"))
+
+    async def _by_search(self, title: str, author: str) -> dict | None:
+        response = await self._http.get(
+            "/search.json",
+            params={
+                "title": title,
+                "author": author,
+                "limit": 1,
+                "fields": "isbn,number_of_pages_median,subject",
+            },
+        )
+        response.raise_for_status()
+        docs = response.json().get("docs") or []
+        if not docs:
+            return None
+        doc = docs[0]
+        return _metadata(doc.get("isbn"), doc.get("number_of_pages_median"), doc.get("subject"))
+
+
+def store(
+    session_factory, results: list[tuple[str, int, dict | None]], replace: bool = False
+) -> None:
+    """Write (tenant, book id, metadata or None) results in one executemany UPDATE.
+
+    ``replace`` is for books whose lookup key changed (a new ISBN): the page count
+    and subjects found under the old key no longer apply, so they are overwritten
+    (cleared on a miss) instead of kept.
+    """
+    if not results:
+        return
+    books = models.Book.__table__
+    now = time.time()
+    pages = bindparam("b_pages")
+    subjects = bindparam("b_subjects", type_=JSON(none_as_null=True))
+    if not replace:
+        # a miss only records the attempt; earlier answers are kept
+        pages = func.coalesce(pages, books.c.page_count)
+        subjects = func.coalesce(subjects, books.c.subjects)
+    # user-entered ISBNs are never overwritten
+    stmt = (
+        update(books)
+        .where(books.c.tenant_id == bindparam("b_tenant"), books.c.id == bindparam("b_id"))
+        .values(
+            isbn=func.coalesce(books.c.isbn, bindparam("b_isbn")),
+            page_count=pages,
+            subjects=subjects,
+            enriched_at=now,
+        )
+    )
+    params = [
+        {
+            "b_tenant": tenant,
+            "b_id": book_id,
+            "b_isbn": (meta or {}).get("isbn"),
+            "b_pages": (meta or {}).get("page_count"),
+            "b_subjects": (meta or {}).get("subjects"),
+        }
+        for tenant, book_id, meta in results
+    ]
+    with session_factory() as db:
+        db.execute(stmt, params)
+        db.commit()
+
+
+class Enricher:
+    """Enriches books handed over by the outbox handler, on a background event loop."""
+
+    def __init__(
+        self,
+        url: str = ENRICH_URL,
+        cache: LookupCache | None = None,
+        concurrency: int = ENRICH_CONCURRENCY,
+        timeout: float = ENRICH_TIMEOUT,
+        queue_max: int = ENRICH_QUEUE_MAX,
+        session_factory=SessionLocal,
+    ) -> None:
+        self.url = url
+        self.cache = cache
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.queue_max = queue_max
+        self.session_factory = session_factory
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._client: MetadataClient | None = None
+        self._pending: set[concurrent.futures.Future] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(
+        self,
+        tenant: str,
+        book_id: int,
+        isbn: str | None,
+        title: str,
+        author: str,
+        replace: bool = False,
+    ) -> bool:
+        """Queue a book without waiting; False when it was skipped because the queue is full.
+
+        ``replace`` is passed on to store(): set it when the book's ISBN changed.
+        """
+        with self._lock:
+            if len(self._pending) >= self.queue_max:
+                ENRICH_BOOKS.labels("skipped").inc()
+                return False
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="enrichment", daemon=True
+                )
+                self._thread.start()
+            future = asyncio.run_coroutine_threadsafe(
+                self._enrich(tenant, book_id, isbn, title, author, replace), self._loop
+            )
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return True
+
+    def _done(self, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            ENRICH_BOOKS.labels("failed").inc()
+            print(f"[ENRICH] Storing enrichment failed: {future.exception()!r}")
+
+    async def _enrich(
+        self, tenant: str, book_id: int, isbn: str | None, title: str, author: str, replace: bool
+    ) -> None:
+        if self._client is None:
+            self._client = MetadataClient(self.url, self.cache, self.concurrency, self.timeout)
+        try:
+            result = await self._client.lookup(isbn, title, author)
+        except EnrichmentError as e:
+            ENRICH_BOOKS.labels("failed").inc()
+            print(f"[ENRICH] Book {book_id} left for the bulk run: {e}")
+            return
+        await asyncio.to_thread(store, self.session_factory, [(tenant, book_id, result)], replace)
+        ENRICH_BOOKS.labels("enriched" if result else "not_found").inc()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Give queued books up to ``timeout`` seconds, then close the client and the loop."""
+        with self._lock:
+            loop, thread, pending = self._loop, self._thread, list(self._pending)
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        concurrent.futures.wait(pending, timeout)
+        for future in pending:
+            future.cancel()
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(timeout)
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        loop.close()
+
+
+enricher = Enricher()
+ENRICH_QUEUE_DEPTH.set_function(lambda: enricher.pending)
+
+
+@registry.handler("book.*")
+def enrich_book_change(message: OutboxMessage) -> None:
+    """Hand new books and changed ISBNs to the enricher; never waits for the service."""
+    payload = message.payload
+    changed = message.topic == "book.updated" and "isbn" in payload.get("changed", ())
+    if enricher.enabled and (message.topic == "book.created" or changed):
+        enricher.submit(
+            message.tenant_id,
+            payload["id"],
+            payload.get("isbn"),
+            payload["title"],
+            payload["author"],
+            replace=changed,
+        )
+
+
+def _next_batch(session_factory, after_id: int, limit: int, refresh: bool, tenant: str | None):
+    book = models.Book
+    query = (
+        select(book.tenant_id, book.id, book.isbn, book.title, book.author)
+        .where(book.id > after_id)
+        .order_by(book.id)
+        .limit(limit)
+    )
+    if not refresh:
+        query = query.where(book.enriched_at.is_(None))
+    if tenant is not None:
+        query = query.where(book.tenant_id == tenant)
+    with session_factory() as db:
+        return db.execute(query).all()
+
+
+async def enrich_all(
+    client: MetadataClient,
+    session_factory=SessionLocal,
+    refresh: bool = False,
+    tenant: str | None = None,
+    batch_size: int = ENRICH_BATCH_SIZE,
+) -> dict[str, int]:
+    """Enrich every book (``refresh``) or those never enriched; returns counts by outcome.
+
+    Batches are read by keyset on id, looked up concurrently (bounded by the
+    client) and written while the next batch is being looked up.
+    """
+    counts = {"enriched": 0, "not_found": 0, "failed": 0}
+    after_id, writing = 0, None
+    while rows := await asyncio.to_thread(
+        _next_batch, session_factory, after_id, batch_size, refresh, tenant
+    ):
+        after_id = rows[-1].id
+        answers = await asyncio.gather(
+            *(client.lookup(row.isbn, row.title, row.author) for row in rows),
+            return_exceptions=True,
+        )
+        results = []
+        for row, answer in zip(rows, answers, strict=True):
+            if isinstance(answer, EnrichmentError):
+                counts["failed"] += 1
+                continue
+            if isinstance(answer, BaseException):
+                raise answer
+            counts["enriched" if answer else "not_found"] += 1
+            results.append((row.tenant_id, row.id, answer))
+        if writing is not None:
+            await writing
+        writing = asyncio.ensure_future(asyncio.to_thread(store, session_factory, results))
+        print(f"[ENRICH] Up to book {after_id}: {counts}")
+    if writing is not None:
+        await writing
+    return counts
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Enrich books from the metadata service")
+    parser.add_argument("--all", action="store_true", help="refresh books enriched before")
+    parser.add_argument("--tenant", help="only this tenant's books")
+    parser.add_argument("--url", default=ENRICH_URL, help="metadata service (ENRICH_URL)")
+    parser.add_argument("--concurrency", type=int, default=ENRICH_CONCURRENCY)
+    parser.add_argument("--cache-dir", default=None, help="lookup cache (ENRICH_CACHE_DIR)")
+    parser.add_argument("--prune-cache", action="store_true", help="delete expired cache entries")
+    args = parser.parse_args(argv)
+
+    cache = LookupCache(args.cache_dir)
+    if args.prune_cache:
+        print(f"[ENRICH] Removed {cache.prune()} expired cache entries")
+        return 0
+    if not args.url:
+        print("[ENRICH] Set ENRICH_URL or pass --url", file=sys.stderr)
+        return 2
+
+    async def run() -> dict[str, int]:
+        client = MetadataClient(args.url, cache, concurrency=args.concurrency)
+        try:
+            return await enrich_all(client, refresh=args.all, tenant=args.tenant)
+        finally:
+            await client.aclose()
+
+    started = time.perf_counter()
+    counts = asyncio.run(run())
+    print(
+        f"[ENRICH] {counts['enriched']} enriched, {counts['not_found']} not found, "
+        f"{counts['failed']} failed in {time.perf_counter() - started:.1f}s"
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
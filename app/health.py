@@ -0,0 +1,70 @@
+"""
+Liveness/readiness support.
+
+Readiness is answered from a cached database probe refreshed in the
+background, so /health/ready never runs a query per call.
+"""
+
+import asyncio
+import os
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "5"))
+
+
+class DatabaseProbe:
+    """Periodically checks that a pooled connection can run SELECT 1 and caches the result."""
+
+    def __init__(self, engine: Engine, interval: float = HEALTH_PROBE_INTERVAL) -> None:
+        self.engine = engine
+        self.interval = interval
+        self.started = False
+        self.ok = False
+        self.error: str | None = None
+        self.latency_ms: float | None = None
+        self.checked_at: float | None = None
+
+    def check(self) -> bool:
+        """Run one probe synchronously and store the outcome."""
+        start = time.perf_counter()
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            self.ok, self.error = True, None
+        except Exception as e:
+            self.ok, self.error = False, str(e)
+        self.latency_ms = round((time.perf_counter() - start) * 1000, 3)
+        self.checked_at = time.monotonic()
+        return self.ok
+
+    async def run(self) -> None:
+        """Background loop; probes run in a worker thread to keep the event loop free."""
+        while True:
+            await asyncio.to_thread(self.check)
+            await asyncio.sleep(self.interval)
+
+    def is_ready(self) -> bool:
+        if not (self.started and self.ok and self.checked_at is not None):
+            return False
+        # a stuck probe loop must not keep reporting a stale "ok"
+        return time.monotonic() - self.checked_at < self.interval * 3
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        pool_stats = {}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, name, None)
+            if callable(method):
+                pool_stats[name] = method()
+        age = None if self.checked_at is None else round(time.monotonic() - self.checked_at, 3)
+        return {
+            "started": self.started,
+            "db_ok": self.ok,
+            "db_error": self.error,
+            "probe_latency_ms": self.latency_ms,
+            "probe_age_s": age,
+            "pool": pool_stats,
+        }
@@ -1,3 +1,5 @@
+import os
+import random
 import time
 
 from sqlalchemy.exc import OperationalError
@@ -5,31 +7,48 @@ from sqlalchemy.orm import Session
 
 from app import models
 from app.database import SessionLocal, engine
+from app.stats import rebuild_stats, record_book_change, stats_stale
+from app.tenancy import DEFAULT_TENANT, create_partitioned_table
 
+# Set when the schema is managed by migrations/deploy tooling: startup skips create_all
+DB_SCHEMA_MIGRATED = os.getenv("DB_SCHEMA_MIGRATED", "false").lower() == "true"
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", "10"))
 
-def wait_for_db(retries: int = 10, delay: float = 1.0):
-    """Wait until the database is reachable (simple retry loop)."""
+
+def wait_for_db(
+    retries: int = DB_CONNECT_RETRIES, base_delay: float = 0.05, max_delay: float = 5.0
+) -> bool:
+    """Wait until the database is reachable (exponential backoff with full jitter)."""
     for attempt in range(1, retries + 1):
         try:
             conn = engine.connect()
             conn.close()
             return True
         except OperationalError:
-            print(f"Database not ready, attempt {attempt}/{retries}...")
+            if attempt == retries:
+                break
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            print(f"Database not ready, attempt {attempt}/{retries}, retrying in {delay:.2f}s...")
             time.sleep(delay)
     return False
 
 
-def init_db():
+def init_db(skip_schema: bool = DB_SCHEMA_MIGRATED):
     # wait for DB (useful when running in Docker and Postgres needs to start)
     if not wait_for_db():
         raise RuntimeError("Could not connect to the database after several attempts")
 
-    models.Base.metadata.create_all(bind=engine)
+    if not skip_schema:
+        # Postgres: books is created partitioned by tenant before create_all sees it
+        with engine.begin() as conn:
+            if create_partitioned_table(conn, models.Book.__table__):
+                print("Created books as a tenant-partitioned table.")
+        models.Base.metadata.create_all(bind=engine)
 
     db: Session = SessionLocal()
 
-    if db.query(models.Book).count() == 0:
+    # LIMIT 1 probe instead of COUNT(*) over the whole table
+    if db.query(models.Book.id).first() is None:
         sample_books = [
             models.Book(
                 title="The Pragmatic Programmer",
@@ -51,12 +70,19 @@ def init_db():
             ),
         ]
 
+        for book in sample_books:
+            book.tenant_id = DEFAULT_TENANT
+            record_book_change(db, DEFAULT_TENANT, None, (book.author, book.year))
         db.add_all(sample_books)
         db.commit()
         print("Sample books inserted.")
     else:
         print("Books already exist — skipping initialization.")
 
+    if stats_stale(db):
+        rebuild_stats(db)
+        print("Catalog statistics rebuilt.")
+
     db.close()
 
 
@@ -0,0 +1,27 @@
+"""
+ISBN validation and normalization, shared by the request schemas and enrichment.
+
+Kept free of app imports so that validating a request body never loads the
+enrichment machinery (database, outbox handlers, HTTP client).
+"""
+
+import re
+
+
+def _isbn13_check_digit(first12: str) -> str:
+    total = sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def normalize_isbn(value: str) -> str | None:
+    """ISBN-13 for a valid ISBN-10 or ISBN-13 (hyphens and spaces ignored), else None."""
+    digits = re.sub(r"[\s-]", "", value).upper()
+    if re.fullmatch(r"97[89]\d{10}", digits):
+        return digits if _isbn13_check_digit(digits[:12]) == digits[12] else None
+    if re.fullmatch(r"\d{9}[\dX]", digits):
+        total = sum((10 - i) * (10 if c == "X" else int(c)) for i, c in enumerate(digits))
+        if total % 11:
+            return None
+        first12 = "978" + digits[:9]
+        return first12 + _isbn13_check_digit(first12)
+    return None
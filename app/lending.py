@@ -0,0 +1,415 @@
+"""
+Loans and reservations: lending copies of a book without ever lending one twice.
+
+Checkout claims a copy in a single statement:
+
+    UPDATE book_copies SET status = 'on_loan'
+    WHERE id IN (SELECT id FROM book_copies
+                 WHERE tenant_id = :t AND book_id = :b AND status = 'available'
+                 ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED)
+    RETURNING id
+
+On Postgres concurrent checkouts of the same title skip the copies other
+transactions are claiming instead of queueing behind them, so there is no
+global lock: each contender gets a different copy or none. SQLite has a single
+writer anyway; lending transactions there go through one per-process lock so
+a burst of checkouts waits its turn in Python instead of failing with
+"database is locked". Either way the partial unique index on open loans
+(``uq_loans_open_copy``) turns a double lend into an IntegrityError.
+
+Reservations are a FIFO queue per title (by id). A returned copy, a copy added
+while people wait, or a hold that is cancelled or expires goes to the oldest
+waiting reservation: the copy becomes ``held`` and the reservation ``ready``
+for LENDING_HOLD_HOURS, during which only that borrower can check it out
+(outbox topic ``reservation.ready``). Expired holds are passed on lazily by
+the next checkout or reservation of the title.
+"""
+
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+from prometheus_client import Counter, Histogram
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from app import models
+from app.outbox import enqueue
+
+LENDING_LOAN_DAYS = float(os.getenv("LENDING_LOAN_DAYS", "21"))
+LENDING_HOLD_HOURS = float(os.getenv("LENDING_HOLD_HOURS", "48"))
+
+ACTIVE_RESERVATION = ("waiting", "ready")
+NOT_AVAILABLE = "No copy available; reserve the book to join the queue"
+
+LENDING_CHECKOUTS = Counter(
+    "librarylite_checkouts_total", "Checkout attempts by outcome", ["outcome"]
+)  # lent | held | unavailable
+LENDING_LOCK_WAIT = Histogram(
+    "librarylite_lending_lock_wait_seconds",
+    "Time lending transactions waited for the SQLite write path",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+_sqlite_write_lock = threading.Lock()
+
+
+@contextmanager
+def _write_path(db: Session) -> Iterator[None]:
+    """Serialize lending transactions on SQLite; roll back on any error."""
+    serialize = db.get_bind().dialect.name == "sqlite"
+    if serialize:
+        start = time.perf_counter()
+        _sqlite_write_lock.acquire()
+        LENDING_LOCK_WAIT.observe(time.perf_counter() - start)
+    try:
+        yield
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        if serialize:
+            _sqlite_write_lock.release()
+
+
+def _skip_locked(db: Session, query):
+    if db.get_bind().dialect.name == "postgresql":
+        return query.with_for_update(skip_locked=True)
+    return query
+
+
+def _require_book(db: Session, tenant: str, book_id: int) -> None:
+    found = db.execute(
+        select(models.Book.id).where(models.Book.tenant_id == tenant, models.Book.id == book_id)
+    ).first()
+    if found is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+
+def _hand_over(db: Session, tenant: str, book_id: int, copy_id: int, now: float) -> None:
+    """Give a freed copy to the oldest waiting reservation, or put it back on the shelf."""
+    r = models.Reservation
+    head = _skip_locked(
+        db,
+        select(r.id)
+        .where(r.tenant_id == tenant, r.book_id == book_id, r.status == "waiting")
+        .order_by(r.id)
+        .limit(1),
+    )
+    ready_until = now + LENDING_HOLD_HOURS * 3600
+    ready = db.execute(
+        update(r)
+        .where(r.id.in_(head.scalar_subquery()))
+        .values(status="ready", copy_id=copy_id, ready_until=ready_until)
+        .returning(r.id, r.borrower)
+    ).first()
+    db.execute(
+        update(models.BookCopy)
+        .where(models.BookCopy.id == copy_id)
+        .values(status="held" if ready else "available")
+    )
+    if ready:
+        payload = {
+            "reservation_id": ready.id,
+            "book_id": book_id,
+            "copy_id": copy_id,
+            "borrower": ready.borrower,
+            "ready_until": ready_until,
+        }
+        enqueue(db, tenant, "reservation.ready", payload)
+
+
+def _expire_holds(db: Session, tenant: str, book_id: int, now: float) -> None:
+    r = models.Reservation
+    expired = db.execute(
+        update(r)
+        .where(
+            r.tenant_id == tenant,
+            r.book_id == book_id,
+            r.status == "ready",
+            r.ready_until < now,
+        )
+        .values(status="expired")
+        .returning(r.copy_id)
+    ).scalars()
+    for copy_id in list(expired):
+        _hand_over(db, tenant, book_id, copy_id, now)
+
+
+def add_copies(db: Session, tenant: str, book_id: int, count: int) -> list[int]:
+    """Add ``count`` copies of a book; each one first serves the reservation queue."""
+    with _write_path(db):
+        now = time.time()
+        _require_book(db, tenant, book_id)
+        copies = [
+            models.BookCopy(tenant_id=tenant, book_id=book_id, status="available", added_at=now)
+            for _ in range(count)
+        ]
+        db.add_all(copies)
+        db.flush()
+        for copy in copies:
+            _hand_over(db, tenant, book_id, copy.id, now)
+        db.commit()
+    return [copy.id for copy in copies]
+
+
+def availability(db: Session, tenant: str, book_id: int) -> dict:
+    _require_book(db, tenant, book_id)
+    c, r = models.BookCopy, models.Reservation
+    counts = dict(
+        db.execute(
+            select(c.status, func.count())
+            .where(c.tenant_id == tenant, c.book_id == book_id)
+            .group_by(c.status)
+        ).all()
+    )
+    waiting = db.execute(
+        select(func.count()).where(
+            r.tenant_id == tenant, r.book_id == book_id, r.status == "waiting"
+        )
+    ).scalar_one()
+    return {
+        "book_id": book_id,
+        "copies": sum(counts.values()),
+        "available": counts.get("available", 0),
+        "on_loan": counts.get("on_loan", 0),
+        "held": counts.get("held", 0),
+        "waiting": waiting,
+    }
+
+
+def _lendable(tenant: str, book_id: int, borrower: str, now: float):
+    """True when a copy is on the shelf, held for ``borrower`` or held past its expiry."""
+    c, r = models.BookCopy, models.Reservation
+    return or_(
+        select(c.id)
+        .where(c.tenant_id == tenant, c.book_id == book_id, c.status == "available")
+        .exists(),
+        select(r.id)
+        .where(
+            r.tenant_id == tenant,
+            r.book_id == book_id,
+            r.status == "ready",
+            or_(r.borrower == borrower, r.ready_until < now),
+        )
+        .exists(),
+    )
+
+
+def checkout(db: Session, tenant: str, book_id: int, borrower: str) -> models.Loan:
+    """Lend the copy held for ``borrower`` or else any available copy (409 when none)."""
+    c, r = models.BookCopy, models.Reservation
+    # optimistic read outside the write path: when nothing can be lent, answer 409
+    # without queueing behind (or locking against) the checkouts that can succeed
+    found = db.execute(
+        select(models.Book.id, _lendable(tenant, book_id, borrower, time.time())).where(
+            models.Book.tenant_id == tenant, models.Book.id == book_id
+        )
+    ).first()
+    if found is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    if not found[1]:
+        db.rollback()
+        LENDING_CHECKOUTS.labels("unavailable").inc()
+        raise HTTPException(status_code=409, detail=NOT_AVAILABLE)
+
+    with _write_path(db):
+        now = time.time()
+        if db.get_bind().dialect.name == "sqlite":
+            # whoever queued behind the lock for the same copy finds out here, before
+            # starting a write transaction
+            if not db.execute(select(_lendable(tenant, book_id, borrower, now))).scalar():
+                LENDING_CHECKOUTS.labels("unavailable").inc()
+                raise HTTPException(status_code=409, detail=NOT_AVAILABLE)
+        _expire_holds(db, tenant, book_id, now)
+
+        outcome = "held"
+        copy_id = db.execute(
+            update(r)
+            .where(
+                r.tenant_id == tenant,
+                r.book_id == book_id,
+                r.borrower == borrower,
+                r.status == "ready",
+            )
+            .values(status="fulfilled")
+            .returning(r.copy_id)
+        ).scalar()
+        if copy_id is not None:
+            db.execute(update(c).where(c.id == copy_id).values(status="on_loan"))
+        else:
+            outcome = "lent"
+            free = _skip_locked(
+                db,
+                select(c.id)
+                .where(c.tenant_id == tenant, c.book_id == book_id, c.status == "available")
+                .order_by(c.id)
+                .limit(1),
+            )
+            copy_id = db.execute(
+                update(c)
+                .where(c.id.in_(free.scalar_subquery()))
+                .values(status="on_loan")
+                .returning(c.id)
+            ).scalar()
+
+        if copy_id is None:
+            db.commit()  # keeps any expired holds passed on above
+            LENDING_CHECKOUTS.labels("unavailable").inc()
+            raise HTTPException(status_code=409, detail=NOT_AVAILABLE)
+
+        loan = models.Loan(
+            tenant_id=tenant,
+            book_id=book_id,
+            copy_id=copy_id,
+            borrower=borrower,
+            loaned_at=now,
+            due_at=now + LENDING_LOAN_DAYS * 86400,
+        )
+        db.add(loan)
+        db.flush()
+        enqueue(
+            db,
+            tenant,
+            "loan.checked_out",
+            {"loan_id": loan.id, "book_id": book_id, "copy_id": copy_id, "borrower": borrower},
+        )
+        db.commit()
+    LENDING_CHECKOUTS.labels(outcome).inc()
+    return loan
+
+
+def return_loan(db: Session, tenant: str, loan_id: int, actor: str, librarian: bool) -> models.Loan:
+    """Close an open loan (the borrower's own, or any when ``librarian``) and pass the copy on."""
+    lo = models.Loan
+    with _write_path(db):
+        now = time.time()
+        conditions = [lo.id == loan_id, lo.tenant_id == tenant, lo.returned_at.is_(None)]
+        if not librarian:
+            conditions.append(lo.borrower == actor)
+        closed = db.execute(
+            update(lo).where(*conditions).values(returned_at=now).returning(lo.copy_id, lo.book_id)
+        ).first()
+        if closed is None:
+            loan = db.get(lo, loan_id)
+            if (
+                loan is None
+                or loan.tenant_id != tenant
+                or not (librarian or loan.borrower == actor)
+            ):
+                raise HTTPException(status_code=404, detail="Loan not found")
+            raise HTTPException(status_code=409, detail="Loan already returned")
+        _hand_over(db, tenant, closed.book_id, closed.copy_id, now)
+        enqueue(
+            db,
+            tenant,
+            "loan.returned",
+            {"loan_id": loan_id, "book_id": closed.book_id, "copy_id": closed.copy_id},
+        )
+        db.commit()
+    return db.get(lo, loan_id)
+
+
+def reserve(db: Session, tenant: str, book_id: int, borrower: str) -> dict:
+    """Join the title's queue; only allowed while no copy is on the shelf."""
+    c = models.BookCopy
+    with _write_path(db):
+        now = time.time()
+        _require_book(db, tenant, book_id)
+        _expire_holds(db, tenant, book_id, now)
+        on_shelf = db.execute(
+            select(c.id)
+            .where(c.tenant_id == tenant, c.book_id == book_id, c.status == "available")
+            .limit(1)
+        ).first()
+        if on_shelf is not None:
+            db.commit()
+            raise HTTPException(status_code=409, detail="A copy is available; check it out instead")
+        reservation = models.Reservation(
+            tenant_id=tenant, book_id=book_id, borrower=borrower, status="waiting", created_at=now
+        )
+        db.add(reservation)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(
+                status_code=409, detail="Already in the queue for this book"
+            ) from None
+    return _reservation_rows(db, tenant, models.Reservation.id == reservation.id)[0]
+
+
+def cancel_reservation(db: Session, tenant: str, reservation_id: int, borrower: str) -> None:
+    r = models.Reservation
+    with _write_path(db):
+        now = time.time()
+        cancelled = db.execute(
+            update(r)
+            .where(
+                r.id == reservation_id,
+                r.tenant_id == tenant,
+                r.borrower == borrower,
+                r.status.in_(ACTIVE_RESERVATION),
+            )
+            .values(status="cancelled")
+            .returning(r.book_id, r.copy_id)
+        ).first()
+        if cancelled is None:
+            raise HTTPException(status_code=404, detail="Reservation not found")
+        if cancelled.copy_id is not None:
+            _hand_over(db, tenant, cancelled.book_id, cancelled.copy_id, now)
+        db.commit()
+
+
+def open_loans(db: Session, tenant: str, borrower: str) -> list[models.Loan]:
+    lo = models.Loan
+    return (
+        db.execute(
+            select(lo)
+            .where(lo.tenant_id == tenant, lo.borrower == borrower, lo.returned_at.is_(None))
+            .order_by(lo.id)
+        )
+        .scalars()
+        .all()
+    )
+
+
+def _reservation_rows(db: Session, tenant: str, *conditions) -> list[dict]:
+    """Active reservations with their 1-based place among the waiting ones (None once ready)."""
+    r = models.Reservation
+    ahead = aliased(models.Reservation)
+    position = (
+        select(func.count())
+        .where(
+            ahead.tenant_id == r.tenant_id,
+            ahead.book_id == r.book_id,
+            ahead.status == "waiting",
+            ahead.id <= r.id,
+        )
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(r, position)
+        .where(r.tenant_id == tenant, r.status.in_(ACTIVE_RESERVATION), *conditions)
+        .order_by(r.id)
+    ).all()
+    return [
+        {
+            "id": res.id,
+            "book_id": res.book_id,
+            "status": res.status,
+            "position": pos if res.status == "waiting" else None,
+            "created_at": res.created_at,
+            "copy_id": res.copy_id,
+            "ready_until": res.ready_until,
+        }
+        for res, pos in rows
+    ]
+
+
+def active_reservations(db: Session, tenant: str, borrower: str) -> list[dict]:
+    return _reservation_rows(db, tenant, models.Reservation.borrower == borrower)
@@ -1,76 +1,186 @@
+import asyncio
+import contextlib
+import os
 from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
 
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from prometheus_fastapi_instrumentator import Instrumentator
+from sqlalchemy.exc import DBAPIError, OperationalError
 
-from app.database import Base, engine
-from app.routers import auth, books
+from app.admission import AdmissionMiddleware
+from app.database import (
+    DeadlineExceeded,
+    QueryCountMiddleware,
+    SessionLocal,
+    deadline_remaining,
+    engine,
+)
+from app.health import DatabaseProbe
+from app.metrics import build_instrumentator
+from app.profiling import ProfilingMiddleware
+from app.routers import admin, auth, books, covers, loans
+from app.tenancy import TenantMetricsMiddleware
 
-# Create tables at startup (SQLite/Postgres will create if needed)
-Base.metadata.create_all(bind=engine)
+db_probe = DatabaseProbe(engine)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    from app.audit import audit_log
+    from app.covers import shutdown_thumbnail_pool
+    from app.enrichment import enricher  # registers its outbox handler
     from app.init_db import init_db
+    from app.outbox import OUTBOX_WORKER_ENABLED, load_handlers, run_outbox_loop
+    from app.readmodel import READ_MODEL_ENABLED, read_model, run_reload_loop
+    from app.revocation import revocation_store, run_sync_loop
+    from app.suggest import SUGGEST_REBUILD_INTERVAL, build_suggest_index, run_rebuild_loop
 
+    # schema creation happens here (once) unless DB_SCHEMA_MIGRATED=true
     init_db()
+    with SessionLocal() as db:
+        build_suggest_index(db)
+    revocation_store.sync()
+
+    audit_log.start()
+
+    db_probe.check()
+    db_probe.started = True
+    tasks = [
+        asyncio.create_task(db_probe.run()),
+        asyncio.create_task(run_sync_loop(revocation_store)),
+    ]
+    if SUGGEST_REBUILD_INTERVAL > 0:
+        tasks.append(asyncio.create_task(run_rebuild_loop()))
+    if read_model.enabled:
+        tasks.append(asyncio.create_task(run_reload_loop(read_model)))
+    elif READ_MODEL_ENABLED:
+        print("[READMODEL] READ_MODEL_ENABLED needs numpy; GET /books/ reads the database")
+    if OUTBOX_WORKER_ENABLED:
+        load_handlers()
+        tasks.append(asyncio.create_task(run_outbox_loop()))
     yield
+    db_probe.started = False
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    shutdown_thumbnail_pool()
+    enricher.stop()
+    audit_log.stop()
 
 
 app = FastAPI(title="LibraryLite", lifespan=lifespan)
-Instrumentator().instrument(app).expose(app)
+# inside the instrumentator so shed requests still show up as 503s in HTTP metrics
+app.add_middleware(AdmissionMiddleware)
+build_instrumentator().instrument(app).expose(app)
+app.add_middleware(QueryCountMiddleware)
+app.add_middleware(TenantMetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
+
+
+@app.exception_handler(DBAPIError)
+async def database_error_handler(request: Request, exc: DBAPIError):
+    # a dropped connection may surface as another DBAPI error class (e.g. InterfaceError);
+    # anything else is a genuine bug and stays a 500
+    if not (isinstance(exc, OperationalError) or exc.connection_invalidated):
+        raise exc
+    # statement_timeout / SQLite interrupt after the deadline vs. a genuinely unavailable DB
+    remaining = deadline_remaining()
+    if remaining is not None and remaining <= 0:
+        return JSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
+    return JSONResponse(
+        {"detail": "Database unavailable"}, status_code=503, headers={"Retry-After": "1"}
+    )
 
 
 BASE_DIR = Path(__file__).resolve().parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 static_dir = str(BASE_DIR / "static")
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 
+@lru_cache(maxsize=1)
+def get_templates():
+    """Jinja environment built on first page render, with compiled templates cached on disk."""
+    import jinja2
+    from fastapi.templating import Jinja2Templates
+
+    cache_dir = os.getenv("TEMPLATE_CACHE_DIR")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(BASE_DIR / "templates")),
+        autoescape=jinja2.select_autoescape(),
+        bytecode_cache=jinja2.FileSystemBytecodeCache(cache_dir or None),
+    )
+    return Jinja2Templates(env=env)
+
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
 
+@app.get("/health/live")
+def liveness():
+    """Process is up and the event loop responds; never touches the database."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def readiness():
+    """Ready once startup finished and the cached DB probe is recent and healthy."""
+    ready = db_probe.is_ready()
+    body = {"status": "ready" if ready else "not ready", **db_probe.snapshot()}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
 @app.get("/")
 def home(request: Request):
-    return templates.TemplateResponse(request, "index.html")
+    return get_templates().TemplateResponse(request, "index.html")
 
 
 # added pages for auth
 @app.get("/login")
 def login_page(request: Request):
-    return templates.TemplateResponse(request, "login.html")
+    return get_templates().TemplateResponse(request, "login.html")
 
 
 @app.get("/register")
 def register_page(request: Request):
-    return templates.TemplateResponse(request, "register.html")
+    return get_templates().TemplateResponse(request, "register.html")
 
 
 # IMPORTANT: define /books/ui before including books router to avoid /books/{id} catching it
 @app.get("/books/ui")
 def books_ui_page(request: Request):
-    return templates.TemplateResponse(request, "books_ui.html")
+    return get_templates().TemplateResponse(request, "books_ui.html")
 
 
 @app.get("/books/add")
 def add_book_page(request: Request):
-    return templates.TemplateResponse(request, "add_book.html")
+    return get_templates().TemplateResponse(request, "add_book.html")
 
 
 @app.get("/books/manage")
 def manage_books_page(request: Request):
-    return templates.TemplateResponse(request, "manage_books.html")
+    return get_templates().TemplateResponse(request, "manage_books.html")
 
 
 # include routers after specific pages
+app.include_router(admin.router)
 app.include_router(auth.router)
 app.include_router(books.router)
+app.include_router(covers.router)
+app.include_router(loans.router)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+"""
+Memory diagnostics for long-lived workers.
+
+Metrics: a collector adds per-worker gauges (labelled with ``pid``) to /metrics
+next to the default process_* / python_gc_* ones. It runs only when /metrics is
+scraped, so an idle worker pays nothing:
+
+  * librarylite_worker_rss_bytes
+  * librarylite_worker_gc_pending_objects{generation} - allocations since that generation's
+    last collection (gc.get_count())
+  * librarylite_worker_gc_tracked_objects - len(gc.get_objects()), refreshed at most every
+    MEMORY_OBJECT_COUNT_INTERVAL seconds because walking the heap is not free
+  * librarylite_worker_tracemalloc_traced_bytes - while tracing
+
+tracemalloc is off unless MEMORY_TRACEMALLOC_FRAMES > 0 at startup or an admin
+starts it through /admin/memory/tracemalloc (tracing slows allocations, so it
+is meant for diagnosis, not for leaving on). Snapshots are kept in the worker
+(last MEMORY_MAX_SNAPSHOTS) and diffed by file, line or traceback.
+"""
+
+import gc
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from itertools import count
+
+from prometheus_client import REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+MEMORY_TRACEMALLOC_FRAMES = int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", "0"))
+MEMORY_MAX_SNAPSHOTS = int(os.getenv("MEMORY_MAX_SNAPSHOTS", "4"))
+MEMORY_OBJECT_COUNT_INTERVAL = float(os.getenv("MEMORY_OBJECT_COUNT_INTERVAL", "60"))
+
+# allocations made by tracemalloc itself or the import machinery are noise in a diff
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        # only the peak is available here: ru_maxrss is bytes on macOS, KiB elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryCollector:
+    """Prometheus collector evaluated on scrape."""
+
+    def __init__(self, object_count_interval: float = MEMORY_OBJECT_COUNT_INTERVAL) -> None:
+        self.object_count_interval = object_count_interval
+        self._objects = 0
+        self._objects_at = float("-inf")
+
+    def tracked_objects(self) -> int:
+        now = time.monotonic()
+        if now - self._objects_at >= self.object_count_interval:
+            self._objects = len(gc.get_objects())
+            self._objects_at = now
+        return self._objects
+
+    def collect(self):
+        pid = str(os.getpid())
+        rss = GaugeMetricFamily(
+            "librarylite_worker_rss_bytes", "Resident set size of this worker", labels=["pid"]
+        )
+        rss.add_metric([pid], rss_bytes())
+        yield rss
+
+        pending = GaugeMetricFamily(
+            "librarylite_worker_gc_pending_objects",
+            "Allocations minus deallocations since the generation was last collected",
+            labels=["pid", "generation"],
+        )
+        for generation, value in enumerate(gc.get_count()):
+            pending.add_metric([pid, str(generation)], value)
+        yield pending
+
+        tracked = GaugeMetricFamily(
+            "librarylite_worker_gc_tracked_objects",
+            "Objects tracked by the garbage collector (sampled)",
+            labels=["pid"],
+        )
+        tracked.add_metric([pid], self.tracked_objects())
+        yield tracked
+
+        if tracemalloc.is_tracing():
+            traced = GaugeMetricFamily(
+                "librarylite_worker_tracemalloc_traced_bytes",
+                "Memory currently traced by tracemalloc",
+                labels=["pid"],
+            )
+            traced.add_metric([pid], tracemalloc.get_traced_memory()[0])
+            yield traced
+
+
+class SnapshotStore:
+    """The worker's last few tracemalloc snapshots, by id."""
+
+    def __init__(self, max_snapshots: int = MEMORY_MAX_SNAPSHOTS) -> None:
+        self.max_snapshots = max_snapshots
+        # id -> (taken_at, traced bytes at that moment, snapshot)
+        self._snapshots: OrderedDict[int, tuple[float, int, tracemalloc.Snapshot]] = OrderedDict()
+        self._ids = count(1)
+        self._lock = threading.Lock()
+
+    def take(self) -> int:
+        """Snapshot now (tracemalloc must be tracing); evicts the oldest beyond the limit."""
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        traced = tracemalloc.get_traced_memory()[0]
+        with self._lock:
+            snapshot_id = next(self._ids)
+            self._snapshots[snapshot_id] = (time.time(), traced, snapshot)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    def get(self, snapshot_id: int) -> tracemalloc.Snapshot | None:
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+        return None if entry is None else entry[2]
+
+    def previous(self, snapshot_id: int) -> int | None:
+        with self._lock:
+            earlier = [i for i in self._snapshots if i < snapshot_id]
+        return earlier[-1] if earlier else None
+
+    def list(self) -> list[dict]:
+        with self._lock:
+            entries = list(self._snapshots.items())
+        return [
+            {"id": snapshot_id, "taken_at": taken_at, "traced_bytes": traced}
+            for snapshot_id, (taken_at, traced, _) in entries
+        ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+
+snapshots = SnapshotStore()
+
+
+def _trace_location(stat) -> str | list[str]:
+    frames = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+    return frames if len(frames) > 1 else frames[0]
+
+
+def top_stats(snapshot: tracemalloc.Snapshot, group_by: str, limit: int) -> list[dict]:
+    stats = snapshot.statistics(group_by)[:limit]
+    return [
+        {"location": _trace_location(stat), "size": stat.size, "count": stat.count}
+        for stat in stats
+    ]
+
+
+def diff_stats(
+    snapshot: tracemalloc.Snapshot, base: tracemalloc.Snapshot, group_by: str, limit: int
+) -> list[dict]:
+    """Biggest changes first (Snapshot.compare_to orders by absolute size difference)."""
+    stats = snapshot.compare_to(base, group_by)[:limit]
+    return [
+        {
+            "location": _trace_location(stat),
+            "size": stat.size,
+            "size_diff": stat.size_diff,
+            "count": stat.count,
+            "count_diff": stat.count_diff,
+        }
+        for stat in stats
+    ]
+
+
+def start_tracing(frames: int) -> None:
+    if tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() != frames:
+        tracemalloc.stop()  # the traceback limit can only be set when starting
+        snapshots.clear()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing() -> None:
+    tracemalloc.stop()
+    snapshots.clear()
+
+
+def summary() -> dict:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": rss_bytes(),
+        "gc_pending_objects": list(gc.get_count()),
+        "gc_tracked_objects": len(gc.get_objects()),
+        "tracemalloc": {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+            "traced_bytes": current,
+            "peak_traced_bytes": peak,
+        },
+        "snapshots": snapshots.list(),
+    }
+
+
+REGISTRY.register(MemoryCollector())
+if MEMORY_TRACEMALLOC_FRAMES > 0:
+    start_tracing(MEMORY_TRACEMALLOC_FRAMES)
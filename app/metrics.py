@@ -0,0 +1,43 @@
+"""
+HTTP metrics setup: Instrumentator defaults plus SLO-tuned per-route latency histograms.
+
+The SLO constants here are mirrored by prometheus/recording_rules.yml and
+prometheus/alerts.yml; tests/test_prometheus_rules.py keeps them in sync.
+"""
+
+from prometheus_fastapi_instrumentator import Instrumentator, metrics
+
+# Availability SLO: fraction of requests that must not fail with 5xx
+SLO_AVAILABILITY = 0.999
+# Latency SLO: fraction of requests that must complete within SLO_LATENCY_SECONDS
+SLO_LATENCY_TARGET = 0.99
+SLO_LATENCY_SECONDS = 0.3
+
+# Dense around the 300 ms threshold so p95/p99 interpolate accurately near the SLO
+SLO_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.25, 0.3,
+    0.4, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0,
+)  # fmt: skip
+
+SLO_METRIC_NAME = "http_request_slo_duration_seconds"
+
+
+def build_instrumentator() -> Instrumentator:
+    """Instrumentator with the default metrics, per-route SLO histogram and in-flight gauge."""
+    instrumentator = Instrumentator(
+        should_instrument_requests_inprogress=True,
+        inprogress_labels=True,
+        excluded_handlers=["/metrics"],
+    )
+    instrumentator.add(metrics.default())
+    instrumentator.add(
+        metrics.latency(
+            metric_name=SLO_METRIC_NAME,
+            metric_doc="Request latency by handler and method with buckets tuned to the SLO",
+            should_include_handler=True,
+            should_include_method=True,
+            should_include_status=True,
+            buckets=SLO_LATENCY_BUCKETS,
+        )
+    )
+    return instrumentator
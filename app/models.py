@@ -3,8 +3,20 @@ SQLAlchemy models for the application.
 Behavior unchanged; comments/docstrings added for clarity.
 """
 
-from sqlalchemy import Column, Integer, String, UniqueConstraint
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    Float,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    false,
+    func,
+)
 
+from .config import settings
 from .database import Base
 
 
@@ -14,10 +26,166 @@ class Book(Base):
     __tablename__ = "books"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    tenant_id = Column(String(64), nullable=False, default=settings.DEFAULT_TENANT)
     title = Column(String(200), nullable=False)
     author = Column(String(200), nullable=False)
     description = Column(String(500), nullable=True)
     year = Column(Integer, nullable=True)
+    # content-addressed key ("<sha256>.<ext>") of the uploaded cover, see app/covers.py
+    cover = Column(String(80), nullable=True)
+    # ISBN-13; entered by users or filled in by app/enrichment.py with page_count and subjects
+    isbn = Column(String(13), nullable=True)
+    page_count = Column(Integer, nullable=True)
+    subjects = Column(JSON, nullable=True)
+    # last enrichment attempt that got an answer (found or not); NULL = never, see the bulk command
+    enriched_at = Column(Float, nullable=True)
+
+    # every query is scoped by tenant; on Postgres this is also the partitioned PK (app/tenancy.py)
+    __table_args__ = (Index("ix_books_tenant_id_id", "tenant_id", "id"),)
+
+
+class BookStat(Base):
+    """Incrementally maintained catalog aggregate per tenant/dimension/key (see app/stats.py)."""
+
+    __tablename__ = "book_stats"
+
+    tenant_id = Column(String(64), primary_key=True)
+    dimension = Column(String(16), primary_key=True)
+    key = Column(String(200), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    # the books_total gauge sums the "total" rows across tenants
+    __table_args__ = (Index("ix_book_stats_dimension", "dimension"),)
+
+
+class BookCopy(Base):
+    """Lendable copy of a book; status is available, on_loan or held (see app/lending.py)."""
+
+    __tablename__ = "book_copies"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tenant_id = Column(String(64), nullable=False)
+    book_id = Column(Integer, nullable=False)
+    status = Column(String(16), nullable=False, default="available")
+    added_at = Column(Float, nullable=False)
+
+    # checkout claims the first available copy of a title through this index
+    __table_args__ = (Index("ix_book_copies_tenant_book_status", "tenant_id", "book_id", "status"),)
+
+
+class Loan(Base):
+    """A copy lent to a borrower; open while returned_at is NULL."""
+
+    __tablename__ = "loans"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tenant_id = Column(String(64), nullable=False)
+    book_id = Column(Integer, nullable=False)
+    copy_id = Column(Integer, nullable=False)
+    borrower = Column(String(150), nullable=False)
+    loaned_at = Column(Float, nullable=False)
+    due_at = Column(Float, nullable=False)
+    returned_at = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_loans_tenant_borrower", "tenant_id", "borrower"),
+        # at most one open loan per copy: a double lend fails in the database
+        Index(
+            "uq_loans_open_copy",
+            "copy_id",
+            unique=True,
+            postgresql_where=returned_at.is_(None),
+            sqlite_where=returned_at.is_(None),
+        ),
+    )
+
+
+class Reservation(Base):
+    """Place in a title's FIFO queue (by id): waiting, ready (holding copy_id), then closed."""
+
+    __tablename__ = "reservations"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tenant_id = Column(String(64), nullable=False)
+    book_id = Column(Integer, nullable=False)
+    borrower = Column(String(150), nullable=False)
+    # waiting | ready | fulfilled | cancelled | expired
+    status = Column(String(16), nullable=False, default="waiting")
+    created_at = Column(Float, nullable=False)
+    copy_id = Column(Integer, nullable=True)
+    ready_until = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_reservations_queue", "tenant_id", "book_id", "status", "id"),
+        # one active place in the queue per borrower and title
+        Index(
+            "uq_reservations_active",
+            "tenant_id",
+            "book_id",
+            "borrower",
+            unique=True,
+            postgresql_where=status.in_(("waiting", "ready")),
+            sqlite_where=status.in_(("waiting", "ready")),
+        ),
+    )
+
+
+class RevokedToken(Base):
+    """Revoked JWT id, kept until the token's own expiry (see app/revocation.py)."""
+
+    __tablename__ = "revoked_tokens"
+
+    # other workers poll by id; ids are assigned at insert, not in commit order, so a lower
+    # id can become visible after a higher one (app/revocation.py re-polls such gaps)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    jti = Column(String(64), nullable=False, unique=True)
+    expires_at = Column(Integer, nullable=False, index=True)
+
+
+class OutboxEvent(Base):
+    """Side effect of a write, stored in the write's transaction and drained by app/outbox.py."""
+
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tenant_id = Column(String(64), nullable=False)
+    topic = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(Float, nullable=False)
+    # claim/retry time: a worker's lease or the next backoff attempt pushes it forward
+    available_at = Column(Float, nullable=False, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(500), nullable=True)
+
+
+class OutboxDeadLetter(Base):
+    """Outbox event that kept failing after OUTBOX_MAX_ATTEMPTS deliveries."""
+
+    __tablename__ = "outbox_dead_letters"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_id = Column(Integer, nullable=False)
+    tenant_id = Column(String(64), nullable=False)
+    topic = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(Float, nullable=False)
+    failed_at = Column(Float, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(String(500), nullable=True)
+
+
+class AuditRecord(Base):
+    """Audit event written in batches when AUDIT_SINK=database (see app/audit.py)."""
+
+    __tablename__ = "audit_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ts = Column(Float, nullable=False, index=True)
+    tenant_id = Column(String(64), nullable=False)
+    actor = Column(String(255), nullable=True)
+    action = Column(String(64), nullable=False)
+    target = Column(String(64), nullable=True)
+    details = Column(JSON, nullable=True)
 
 
 class User(Base):
@@ -26,11 +194,17 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    tenant_id = Column(String(64), nullable=False, default=settings.DEFAULT_TENANT)
     username = Column(String(150), nullable=False, unique=True, index=True)
     email = Column(String(255), nullable=False, unique=True, index=True)
     hashed_password = Column(String(255), nullable=False)
+    # granted in the database only; tokens carry it as the ADMIN_CLAIM (see app/auth.py)
+    is_admin = Column(Boolean, nullable=False, default=False, server_default=false())
 
     __table_args__ = (
         UniqueConstraint("username", name="uq_users_username"),
         UniqueConstraint("email", name="uq_users_email"),
+        Index("ix_users_tenant_id_id", "tenant_id", "id"),
+        # login matches lower(email), so case variants can't register twice either
+        Index("uq_users_email_lower", func.lower(email), unique=True),
     )
@@ -0,0 +1,320 @@
+"""
+Transactional outbox for side effects of book writes.
+
+Write handlers call enqueue() before committing, so an event row exists if
+and only if the book change committed. Workers drain the table in batches
+and hand each event to every registered handler whose pattern matches its
+topic (``book.created``, ``book.updated``, ``book.deleted``; lending adds
+``loan.checked_out``, ``loan.returned`` and ``reservation.ready``):
+
+    from app.outbox import registry
+
+    @registry.handler("book.*")
+    def purge_cache(event): ...
+
+Delivery is at-least-once: a batch is claimed by pushing ``available_at``
+forward by OUTBOX_LEASE_SECONDS (with FOR UPDATE SKIP LOCKED on Postgres, so
+concurrent workers take disjoint batches). Delivered events are deleted;
+a failed event is retried with exponential backoff and moved to
+``outbox_dead_letters`` after OUTBOX_MAX_ATTEMPTS. A worker that dies mid-batch
+leaves its events to be picked up again once the lease runs out, so handlers
+must be idempotent.
+
+Workers run inside the app (OUTBOX_WORKER_ENABLED; woken right after local
+writes via notify(), otherwise polling every OUTBOX_POLL_INTERVAL) and/or
+standalone:
+
+    python -m app.outbox                  # drain forever
+    python -m app.outbox --once           # drain what is due and exit
+    python -m app.outbox --requeue-dead   # move dead letters back to the outbox
+
+OUTBOX_HANDLERS lists modules imported at startup to register handlers
+(comma-separated, e.g. ``myplugins.webhooks,myplugins.search``).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import fnmatch
+import importlib
+import os
+import random
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal
+
+OUTBOX_WORKER_ENABLED = os.getenv("OUTBOX_WORKER_ENABLED", "true").lower() == "true"
+OUTBOX_HANDLERS = os.getenv("OUTBOX_HANDLERS", "")
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BASE_BACKOFF = float(os.getenv("OUTBOX_BASE_BACKOFF", "1"))
+OUTBOX_MAX_BACKOFF = float(os.getenv("OUTBOX_MAX_BACKOFF", "300"))
+
+OUTBOX_EVENTS = Counter(
+    "librarylite_outbox_events_total", "Outbox events processed by outcome", ["outcome"]
+)  # delivered | retried | dead_lettered
+OUTBOX_DELIVERY_LAG = Histogram(
+    "librarylite_outbox_delivery_lag_seconds",
+    "Time from commit of the write to successful delivery of its event",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 15, 60, 300, 1800),
+)
+OUTBOX_OLDEST_AGE = Gauge(
+    "librarylite_outbox_oldest_event_age_seconds",
+    "Age of the oldest undelivered outbox event as of the last drain (0 when empty)",
+)
+
+
+@dataclass(frozen=True)
+class OutboxMessage:
+    """What handlers receive; ``attempts`` counts this delivery."""
+
+    id: int
+    tenant_id: str
+    topic: str
+    payload: dict
+    created_at: float
+    attempts: int
+
+
+Handler = Callable[[OutboxMessage], None]
+
+
+class HandlerRegistry:
+    """Topic pattern (fnmatch, e.g. ``book.*``) -> handlers, in registration order."""
+
+    def __init__(self) -> None:
+        self._handlers: list[tuple[str, Handler]] = []
+
+    def register(self, pattern: str, handler: Handler) -> None:
+        self._handlers.append((pattern, handler))
+
+    def handler(self, pattern: str) -> Callable[[Handler], Handler]:
+        def decorator(fn: Handler) -> Handler:
+            self.register(pattern, fn)
+            return fn
+
+        return decorator
+
+    def for_topic(self, topic: str) -> list[Handler]:
+        return [fn for pattern, fn in self._handlers if fnmatch.fnmatchcase(topic, pattern)]
+
+
+registry = HandlerRegistry()
+
+# set by the in-process worker loop so request threads can wake it up
+_wakeup: asyncio.Event | None = None
+_wakeup_loop: asyncio.AbstractEventLoop | None = None
+
+
+def load_handlers(spec: str = OUTBOX_HANDLERS) -> None:
+    """Import the configured handler modules; they register themselves on import."""
+    for module_name in filter(None, (name.strip() for name in spec.split(","))):
+        importlib.import_module(module_name)
+
+
+def enqueue(db: Session, tenant_id: str, topic: str, payload: dict) -> None:
+    """Add an event to the caller's transaction; it is delivered only if that commits."""
+    now = time.time()
+    db.add(
+        models.OutboxEvent(
+            tenant_id=tenant_id,
+            topic=topic,
+            payload=payload,
+            created_at=now,
+            available_at=now,
+            attempts=0,
+        )
+    )
+
+
+def notify() -> None:
+    """Wake the in-process worker after a commit that enqueued events (no-op without one)."""
+    loop, event = _wakeup_loop, _wakeup
+    if loop is not None and event is not None:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # loop already closed (shutdown)
+
+
+def backoff(attempts: int) -> float:
+    """Delay before retry number ``attempts``: exponential, capped, with equal jitter."""
+    cap = min(OUTBOX_MAX_BACKOFF, OUTBOX_BASE_BACKOFF * 2 ** (attempts - 1))
+    return cap / 2 + random.uniform(0, cap / 2)
+
+
+def _claim(db: Session, batch_size: int, now: float) -> list[OutboxMessage]:
+    due = (
+        select(models.OutboxEvent.id)
+        .where(models.OutboxEvent.available_at <= now)
+        .order_by(models.OutboxEvent.id)
+        .limit(batch_size)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        due = due.with_for_update(skip_locked=True)
+    event = models.OutboxEvent
+    rows = db.execute(
+        update(event)
+        .where(event.id.in_(due.scalar_subquery()))
+        .values(available_at=now + OUTBOX_LEASE_SECONDS, attempts=event.attempts + 1)
+        .returning(
+            event.id, event.tenant_id, event.topic, event.payload, event.created_at, event.attempts
+        )
+    ).all()
+    db.commit()
+    return sorted((OutboxMessage(*row) for row in rows), key=lambda m: m.id)
+
+
+def _deliver(message: OutboxMessage, handlers: HandlerRegistry) -> str | None:
+    """Run every matching handler; return the first error (as text) or None."""
+    for handler in handlers.for_topic(message.topic):
+        try:
+            handler(message)
+        except Exception as e:
+            return f"{getattr(handler, '__name__', handler)}: {e!r}"[:500]
+    return None
+
+
+def drain_once(
+    handlers: HandlerRegistry | None = None,
+    session_factory=SessionLocal,
+    batch_size: int = OUTBOX_BATCH_SIZE,
+) -> int:
+    """Claim and process one batch of due events; returns how many were claimed."""
+    handlers = handlers or registry
+    with session_factory() as db:
+        messages = _claim(db, batch_size, time.time())
+        if not messages:
+            _publish_oldest_age(db)
+            return 0
+
+        delivered: list[int] = []
+        for message in messages:
+            error = _deliver(message, handlers)
+            now = time.time()
+            if error is None:
+                delivered.append(message.id)
+                OUTBOX_DELIVERY_LAG.observe(max(0.0, now - message.created_at))
+                OUTBOX_EVENTS.labels("delivered").inc()
+            elif message.attempts >= OUTBOX_MAX_ATTEMPTS:
+                db.add(
+                    models.OutboxDeadLetter(
+                        event_id=message.id,
+                        tenant_id=message.tenant_id,
+                        topic=message.topic,
+                        payload=message.payload,
+                        created_at=message.created_at,
+                        failed_at=now,
+                        attempts=message.attempts,
+                        last_error=error,
+                    )
+                )
+                delivered.append(message.id)
+                OUTBOX_EVENTS.labels("dead_lettered").inc()
+                print(f"[OUTBOX] Event {message.id} ({message.topic}) dead-lettered: {error}")
+            else:
+                db.execute(
+                    update(models.OutboxEvent)
+                    .where(models.OutboxEvent.id == message.id)
+                    .values(available_at=now + backoff(message.attempts), last_error=error)
+                )
+                OUTBOX_EVENTS.labels("retried").inc()
+        if delivered:
+            db.execute(delete(models.OutboxEvent).where(models.OutboxEvent.id.in_(delivered)))
+        db.commit()
+        _publish_oldest_age(db)
+        return len(messages)
+
+
+def _publish_oldest_age(db: Session) -> None:
+    oldest = db.execute(
+        select(models.OutboxEvent.created_at).order_by(models.OutboxEvent.id).limit(1)
+    ).scalar()
+    OUTBOX_OLDEST_AGE.set(0 if oldest is None else max(0.0, time.time() - oldest))
+
+
+def requeue_dead_letters(session_factory=SessionLocal) -> int:
+    """Move every dead letter back into the outbox with a fresh attempt budget."""
+    with session_factory() as db:
+        now = time.time()
+        dead = db.query(models.OutboxDeadLetter).all()
+        for row in dead:
+            db.add(
+                models.OutboxEvent(
+                    tenant_id=row.tenant_id,
+                    topic=row.topic,
+                    payload=row.payload,
+                    created_at=row.created_at,
+                    available_at=now,
+                    attempts=0,
+                )
+            )
+            db.delete(row)
+        db.commit()
+        return len(dead)
+
+
+async def run_outbox_loop(
+    handlers: HandlerRegistry | None = None, interval: float = OUTBOX_POLL_INTERVAL
+) -> None:
+    """Background task: drain in worker threads whenever notified or every ``interval``."""
+    global _wakeup, _wakeup_loop
+    _wakeup, _wakeup_loop = asyncio.Event(), asyncio.get_running_loop()
+    claimed = 0
+    try:
+        while True:
+            # a full batch likely means more is waiting
+            if claimed < OUTBOX_BATCH_SIZE:
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(_wakeup.wait(), interval)
+            _wakeup.clear()
+            try:
+                claimed = await asyncio.to_thread(drain_once, handlers)
+            except Exception as e:
+                print(f"[OUTBOX] Drain failed: {e}")
+                claimed = 0
+    finally:
+        _wakeup = _wakeup_loop = None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Outbox worker")
+    parser.add_argument("--once", action="store_true", help="drain due events and exit")
+    parser.add_argument(
+        "--requeue-dead", action="store_true", help="move dead letters back to the outbox"
+    )
+    args = parser.parse_args(argv)
+
+    if args.requeue_dead:
+        print(f"Requeued {requeue_dead_letters()} dead-lettered events")
+        return 0
+
+    load_handlers()
+    if args.once:
+        total = 0
+        while claimed := drain_once():
+            total += claimed
+            if claimed < OUTBOX_BATCH_SIZE:
+                break
+        print(f"Processed {total} outbox events")
+        return 0
+
+    try:
+        asyncio.run(run_outbox_loop())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
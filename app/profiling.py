@@ -0,0 +1,287 @@
+"""
+Opt-in per-request profiling for production diagnosis.
+
+A request is profiled when either
+  * it carries ``X-Profile: 1`` and a Bearer token for the admin user, or
+  * it is picked by random sampling (PROFILE_SAMPLE_RATE, 0 disables).
+
+While a request is profiled a sampler thread records wall-clock stacks and
+on-CPU stacks (threads whose CPU clock advanced since the previous sample) of
+the request's own threads only: the event loop while it runs the request's
+task, and threadpool threads from the request's first SQL statement on them
+until the request ends (other requests' statements hand the thread over).
+SQL statements executed in the request context are recorded with timings.
+Reports are JSON files in a bounded on-disk ring (PROFILE_DIR), served by
+the admin router. Unprofiled requests only pay for a header scan.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from pathlib import Path
+
+from app.database import add_query_observer
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "./data/profiles"))
+PROFILE_MAX_REPORTS = int(os.getenv("PROFILE_MAX_REPORTS", "50"))
+PROFILE_MAX_DEPTH = 64
+
+REPORT_ID_RE = re.compile(r"^[0-9]{13}-[0-9a-f]{8}$")
+
+# Frames that mean "this thread is idle", so its samples are skipped
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "runners.py")
+
+_active_profile: ContextVar["RequestProfile | None"] = ContextVar("active_profile", default=None)
+# thread ident -> profile of the request whose SQL the thread ran last (see _record_sql)
+_thread_profiles: dict[int, "RequestProfile"] = {}
+
+
+def _fold(frame) -> str:
+    """Render a frame chain as a root-first, semicolon-separated (flamegraph) stack."""
+    parts = []
+    while frame is not None and len(parts) < PROFILE_MAX_DEPTH:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def _thread_cpu(ident: int) -> float | None:
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+
+class _StackSampler(threading.Thread):
+    """Background thread sampling the stacks of the threads ``owns`` accepts at a fixed interval."""
+
+    def __init__(self, interval_s: float, owns) -> None:
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval_s = interval_s
+        self.owns = owns
+        self.wall: Counter[str] = Counter()
+        self.cpu: Counter[str] = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._last_cpu: dict[int, float] = {}
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop_event.wait(self.interval_s):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                if not self.owns(ident):
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = f"{names.get(ident, ident)};{_fold(frame)}"
+                self.wall[stack] += 1
+                cpu = _thread_cpu(ident)
+                if cpu is not None:
+                    previous = self._last_cpu.get(ident)
+                    self._last_cpu[ident] = cpu
+                    # count as on-CPU if the thread burned at least half the interval
+                    if previous is not None and cpu - previous >= self.interval_s / 2:
+                        self.cpu[stack] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfile:
+    """Collects stacks and SQL timings for a single request."""
+
+    def __init__(self, method: str, path: str, reason: str) -> None:
+        self.id = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.status: int | None = None
+        self.sql: list[dict] = []
+        self._sampler = _StackSampler(PROFILE_INTERVAL_MS / 1000, self._owns)
+
+    def _owns(self, ident: int) -> bool:
+        if ident == self._thread:
+            # the event loop thread also runs other requests' tasks
+            return self._loop is None or asyncio.current_task(self._loop) is self._task
+        return _thread_profiles.get(ident) is self
+
+    def start(self) -> None:
+        """Start sampling; call it from the request's task (or any thread outside an event loop)."""
+        self._thread = threading.get_ident()
+        try:
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.current_task()
+        except RuntimeError:
+            self._loop = self._task = None
+        self.started_at = datetime.now(UTC).isoformat()
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._sampler.stop()
+        for ident, profile in list(_thread_profiles.items()):
+            if profile is self:
+                _thread_profiles.pop(ident, None)
+        self.wall_ms = (time.perf_counter() - self._t0) * 1000
+        self.process_cpu_ms = (time.process_time() - self._cpu0) * 1000
+
+    def record_sql(self, statement: str, duration_s: float) -> None:
+        self.sql.append({"statement": statement, "duration_ms": round(duration_s * 1000, 3)})
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "reason": self.reason,
+            "started_at": self.started_at,
+            "wall_ms": round(self.wall_ms, 3),
+            "process_cpu_ms": round(self.process_cpu_ms, 3),
+            "sample_interval_ms": PROFILE_INTERVAL_MS,
+            "samples": self._sampler.samples,
+            "wall_stacks": dict(self._sampler.wall.most_common()),
+            "cpu_stacks": dict(self._sampler.cpu.most_common()),
+            "sql_count": len(self.sql),
+            "sql_ms": round(sum(q["duration_ms"] for q in self.sql), 3),
+            "sql": self.sql,
+        }
+
+
+# --- report ring ---
+def save_report(profile: RequestProfile, directory: Path | None = None) -> Path:
+    """Write a report atomically and drop the oldest ones beyond PROFILE_MAX_REPORTS."""
+    directory = directory or PROFILE_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{profile.id}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(profile.to_dict()), encoding="utf-8")
+    os.replace(tmp, path)
+
+    reports = sorted(directory.glob("*.json"))
+    for old in reports[: max(0, len(reports) - PROFILE_MAX_REPORTS)]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+def list_reports(directory: Path | None = None) -> list[dict]:
+    """Summaries of stored reports, newest first."""
+    directory = directory or PROFILE_DIR
+    summaries = []
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        summaries.append(
+            {
+                key: data.get(key)
+                for key in ("id", "method", "path", "status", "started_at", "wall_ms", "sql_count")
+            }
+        )
+    return summaries
+
+
+def report_path(report_id: str, directory: Path | None = None) -> Path | None:
+    """Resolve a report id to its file, rejecting anything that is not a report id."""
+    if not REPORT_ID_RE.match(report_id):
+        return None
+    path = (directory or PROFILE_DIR) / f"{report_id}.json"
+    return path if path.is_file() else None
+
+
+# --- SQL capture (observer on the engine hooks in app/database.py) ---
+def _record_sql(statement: str, duration_s: float, route: str) -> None:
+    profile = _active_profile.get()
+    if profile is not None:
+        # the thread now works for this request, so the sampler takes its stacks
+        _thread_profiles[threading.get_ident()] = profile
+        profile.record_sql(statement, duration_s)
+    elif _thread_profiles:
+        _thread_profiles.pop(threading.get_ident(), None)
+
+
+add_query_observer(_record_sql)
+
+
+# --- middleware ---
+def _is_admin_token(authorization: bytes | None) -> bool:
+    """Same check as the admin router's dependency; blocking (revocation and user lookup)."""
+    from app.auth import is_admin, verify_claims
+
+    if not authorization or not authorization.lower().startswith(b"bearer "):
+        return False
+    return is_admin(verify_claims(authorization[7:].decode("latin-1")))
+
+
+def _finish(profile: RequestProfile) -> None:
+    profile.stop()
+    save_report(profile)
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware; profiling is decided before the app is called."""
+
+    def __init__(self, app, sample_rate: float | None = None) -> None:
+        self.app = app
+        self.sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        reason = None
+        flag = authorization = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                flag = value
+            elif name == b"authorization":
+                authorization = value
+        if (
+            flag is not None
+            and flag != b"0"
+            and await asyncio.to_thread(_is_admin_token, authorization)
+        ):
+            reason = "header"
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            reason = "sampled"
+        if reason is None:
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"], reason)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _active_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _active_profile.reset(token)
+            # joining the sampler and writing the report would block the event loop
+            await asyncio.to_thread(_finish, profile)
@@ -0,0 +1,465 @@
+"""
+Columnar per-worker read model of the books table, serving filtered GET /books/.
+
+With READ_MODEL_ENABLED=true (needs NumPy) each worker loads the books into
+compact columns per tenant: NumPy arrays for id and year, and dictionary-encoded
+("interned") titles and authors, i.e. an int32 code per book into a table of
+distinct values. Filters and sorts are evaluated on whole columns, with no
+database round trip and no ORM objects:
+
+  * ``author``: case-insensitive equality; the distinct authors are matched
+    once, then one gather over the code column
+  * ``title``: case-insensitive substring; searched in a NUL-separated blob of
+    the distinct lowercased titles, so a common title is scanned once
+  * ``year_min`` / ``year_max``: comparisons on the year column
+  * ``sort``: id, year or title, ascending or descending (books without a
+    year come last either way)
+
+The write handlers in app/routers/books.py apply their own changes right away.
+Changes committed by other workers, and enrichment results, arrive with the next
+full reload, every READ_MODEL_RELOAD_INTERVAL seconds in the background. Writes
+made during a reload are replayed onto the new snapshot before it is swapped in.
+The snapshot's age is exported as ``librarylite_read_model_age_seconds`` and
+sent with each response it serves in ``X-Read-Model-Age``. Once it is older
+than READ_MODEL_MAX_STALENESS (e.g. reloads keep failing), or when a request
+sends ``Cache-Control: no-cache``, the listing is read from the database again.
+"""
+
+import asyncio
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import select
+
+from app import models
+from app.database import SessionLocal
+
+try:
+    import numpy as np
+except ImportError:  # in requirements.txt; without it GET /books/ always reads the database
+    np = None
+
+READ_MODEL_ENABLED = os.getenv("READ_MODEL_ENABLED", "false").lower() == "true"
+READ_MODEL_RELOAD_INTERVAL = float(os.getenv("READ_MODEL_RELOAD_INTERVAL", "300"))
+READ_MODEL_MAX_STALENESS = float(os.getenv("READ_MODEL_MAX_STALENESS", "900"))
+
+NO_YEAR = -(2**31)  # int32 stand-in for NULL years
+SORTS = ("id", "-id", "year", "-year", "title", "-title")
+_SEPARATOR = "\x00"
+
+READ_MODEL_AGE = Gauge(
+    "librarylite_read_model_age_seconds",
+    "Seconds since this worker's books read model was loaded (-1 when not loaded)",
+)
+READ_MODEL_BYTES = Gauge(
+    "librarylite_read_model_bytes", "Approximate memory used by this worker's books read model"
+)
+READ_MODEL_BOOKS = Gauge("librarylite_read_model_books", "Books held by this worker's read model")
+BOOK_LISTINGS = Counter(
+    "librarylite_book_listings_total",
+    "GET /books/ requests by where they were served from",
+    ["source"],
+)  # read_model | database
+
+
+@dataclass(frozen=True)
+class BookQuery:
+    """Filters, sort and page of a GET /books/ request."""
+
+    author: str | None = None
+    title: str | None = None
+    year_min: int | None = None
+    year_max: int | None = None
+    sort: str = "id"
+    limit: int | None = None
+    offset: int = 0
+
+
+def _fields(book) -> tuple:
+    """The columns the read model keeps, from an ORM object or a result row."""
+    return (
+        book.id,
+        book.title,
+        book.author,
+        book.description,
+        book.year,
+        book.cover,
+        book.isbn,
+        book.page_count,
+        book.subjects,
+    )
+
+
+class _Strings:
+    """Dictionary-encoded strings: a code per distinct value, searchable lowercased.
+
+    Lowercased values are kept in NUL-separated blobs that only grow. New
+    values are sealed into a blob at the next search, and blobs are merged like
+    a binary counter, so the newest is never larger than half of the one before.
+    """
+
+    def __init__(self) -> None:
+        self.values: list[str] = []
+        self._codes: dict[str, int] = {}
+        self._by_lower: dict[str, list[int]] = {}
+        self._blobs: list[tuple[int, str, object]] = []  # (first code, text, start offsets)
+        self._sealed = 0
+        self._blob_chars = 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+            self._by_lower.setdefault(value.lower(), []).append(code)
+        return code
+
+    def equal(self, value: str) -> list[int]:
+        return self._by_lower.get(value.lower(), [])
+
+    def containing(self, needle: str) -> "np.ndarray":
+        """Codes of the values containing ``needle`` (case-insensitive)."""
+        self._seal()
+        pattern = re.compile(re.escape(needle.lower().replace(_SEPARATOR, "")))
+        found = []
+        for first, text, starts in self._blobs:
+            positions = [m.start() for m in pattern.finditer(text)]
+            if positions:
+                # a match never spans a separator, so it lies inside the value starting before it
+                found.append(first + np.searchsorted(starts, positions, side="right") - 1)
+        # a value matching twice appears twice; callers only use the codes as a hit table
+        return np.concatenate(found) if found else np.empty(0, np.int64)
+
+    def _seal(self) -> None:
+        if self._sealed == len(self.values):
+            return
+        lowered = [value.lower() for value in self.values[self._sealed :]]
+        lengths = np.fromiter((len(v) + 1 for v in lowered), np.int64, len(lowered))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        text = _SEPARATOR.join(lowered) + _SEPARATOR
+        self._blobs.append((self._sealed, text, starts))
+        self._sealed = len(self.values)
+        while len(self._blobs) > 1 and 2 * len(self._blobs[-1][1]) >= len(self._blobs[-2][1]):
+            first_b, text_b, starts_b = self._blobs.pop()
+            first_a, text_a, starts_a = self._blobs.pop()
+            self._blobs.append(
+                (first_a, text_a + text_b, np.concatenate((starts_a, starts_b + len(text_a))))
+            )
+        self._blob_chars = sum(len(text) for _, text, _ in self._blobs)
+
+    def memory_bytes(self) -> int:
+        return (
+            sum(sys.getsizeof(v) for v in self.values)
+            + sys.getsizeof(self.values)
+            + sys.getsizeof(self._codes)
+            + sys.getsizeof(self._by_lower)
+            + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in self._by_lower.items())
+            + self._blob_chars
+            + sum(starts.nbytes for _, _, starts in self._blobs)
+        )
+
+
+class TenantColumns:
+    """One tenant's books as parallel columns; row order is load/insert order."""
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.lock = threading.Lock()
+        self.n = 0
+        self.ids = np.zeros(capacity, np.int64)
+        self.years = np.full(capacity, NO_YEAR, np.int32)
+        self.title_codes = np.zeros(capacity, np.int32)
+        self.author_codes = np.zeros(capacity, np.int32)
+        self.live = np.zeros(capacity, bool)
+        self.titles = _Strings()
+        self.authors = _Strings()
+        self.descriptions: list[str | None] = []
+        # rarely set columns, keyed by row: (cover, isbn, page_count, subjects)
+        self.extras: dict[int, tuple] = {}
+        # rows [0, sorted_rows) are in id order and found by bisection; later ones via the dict
+        self.sorted_rows = 0
+        self._unsorted: dict[int, int] = {}
+        self.deleted = 0
+
+    def __len__(self) -> int:
+        return self.n - self.deleted
+
+    @classmethod
+    def build(cls, rows: list[tuple]) -> "TenantColumns":
+        """Columns from ``_fields()`` tuples in id order, filled a column at a time."""
+        columns = cls(capacity=max(len(rows), 1024))
+        n = len(rows)
+        if not n:
+            return columns
+        ids, titles, authors, descriptions, years, *extras = zip(*rows, strict=True)
+        columns.ids[:n] = ids
+        columns.years[:n] = [NO_YEAR if year is None else year for year in years]
+        columns.title_codes[:n] = [columns.titles.code(title) for title in titles]
+        columns.author_codes[:n] = [columns.authors.code(author) for author in authors]
+        columns.live[:n] = True
+        columns.descriptions = list(descriptions)
+        columns.extras = {
+            row: values
+            for row, values in enumerate(zip(*extras, strict=True))
+            if any(value is not None for value in values)
+        }
+        columns.n = columns.sorted_rows = n
+        columns.titles._seal()  # here rather than in the first title search after a reload
+        return columns
+
+    # --- writes (caller holds the lock) ---
+    def upsert(self, fields: tuple) -> None:
+        book_id, title, author, description, year, *extras = fields
+        row = self._find(book_id)
+        if row is None:
+            row = self._append(book_id)
+            self.descriptions.append(description)
+        else:
+            self.descriptions[row] = description
+        self.years[row] = NO_YEAR if year is None else year
+        self.title_codes[row] = self.titles.code(title)
+        self.author_codes[row] = self.authors.code(author)
+        if any(value is not None for value in extras):
+            self.extras[row] = tuple(extras)
+        else:
+            self.extras.pop(row, None)
+
+    def remove(self, book_id: int) -> None:
+        row = self._find(book_id)
+        if row is not None:
+            self.live[row] = False
+            self.descriptions[row] = None
+            self.extras.pop(row, None)
+            self._unsorted.pop(book_id, None)
+            self.deleted += 1
+
+    def _find(self, book_id: int) -> int | None:
+        row = int(np.searchsorted(self.ids[: self.sorted_rows], book_id))
+        if row < self.sorted_rows and self.ids[row] == book_id and self.live[row]:
+            return row
+        return self._unsorted.get(book_id)
+
+    def _append(self, book_id: int) -> int:
+        if self.n == len(self.ids):
+            grow = max(1024, self.n)
+            self.ids = np.concatenate((self.ids, np.zeros(grow, np.int64)))
+            self.years = np.concatenate((self.years, np.full(grow, NO_YEAR, np.int32)))
+            self.title_codes = np.concatenate((self.title_codes, np.zeros(grow, np.int32)))
+            self.author_codes = np.concatenate((self.author_codes, np.zeros(grow, np.int32)))
+            self.live = np.concatenate((self.live, np.zeros(grow, bool)))
+        row = self.n
+        self.ids[row] = book_id
+        self.live[row] = True
+        if self.sorted_rows == row and (row == 0 or self.ids[row - 1] < book_id):
+            self.sorted_rows += 1
+        else:
+            self._unsorted[book_id] = row
+        self.n += 1
+        return row
+
+    # --- reads ---
+    def query(self, q: BookQuery) -> list[dict]:
+        with self.lock:
+            n = self.n
+            mask = self.live[:n].copy()
+            if q.year_min is not None or q.year_max is not None:
+                years = self.years[:n]
+                mask &= years != NO_YEAR
+                if q.year_min is not None:
+                    mask &= years >= q.year_min
+                if q.year_max is not None:
+                    mask &= years <= q.year_max
+            if q.author is not None:
+                mask &= self._matching(
+                    self.author_codes[:n], self.authors.equal(q.author), self.authors
+                )
+            if q.title is not None:
+                codes = self.titles.containing(q.title)
+                mask &= self._matching(self.title_codes[:n], codes, self.titles)
+            rows = self._ordered(np.flatnonzero(mask), q.sort)
+            end = None if q.limit is None else q.offset + q.limit
+            return [self._row(row) for row in rows[q.offset : end].tolist()]
+
+    @staticmethod
+    def _matching(column, codes, strings: _Strings):
+        hit = np.zeros(len(strings), bool)
+        hit[codes] = True
+        return hit[column]
+
+    def _ordered(self, rows, sort: str):
+        field, descending = sort.lstrip("-"), sort.startswith("-")
+        if self.sorted_rows != self.n:
+            rows = rows[np.argsort(self.ids[rows], kind="stable")]
+        # rows are in id order now, so stable sorts below break ties by id
+        if field == "id":
+            return rows[::-1] if descending else rows
+        if field == "year":
+            years = self.years[rows].astype(np.int64)
+            key = -years if descending else years
+            missing = years == NO_YEAR
+            key[missing] = key[~missing].max(initial=0) + 1  # books without a year go last
+            if len(key) and key.max() - key.min() < 1 << 16:
+                key = (key - key.min()).astype(np.uint16)  # radix-sorted, several times faster
+            return rows[np.argsort(key, kind="stable")]
+        # title: string compares only for the matched rows
+        rows = rows.tolist()
+        values, codes = self.titles.values, self.title_codes
+        rows.sort(key=lambda row: values[codes[row]], reverse=descending)
+        return np.array(rows, np.int64)
+
+    def _row(self, row: int) -> dict:
+        year = int(self.years[row])
+        cover, isbn, page_count, subjects = self.extras.get(row, (None, None, None, None))
+        return {
+            "id": int(self.ids[row]),
+            "title": self.titles.values[self.title_codes[row]],
+            "author": self.authors.values[self.author_codes[row]],
+            "description": self.descriptions[row],
+            "year": None if year == NO_YEAR else year,
+            "cover": cover,
+            "isbn": isbn,
+            "page_count": page_count,
+            "subjects": subjects,
+        }
+
+    def memory_bytes(self) -> int:
+        arrays = (self.ids, self.years, self.title_codes, self.author_codes, self.live)
+        return (
+            sum(a.nbytes for a in arrays)
+            + self.titles.memory_bytes()
+            + self.authors.memory_bytes()
+            + sys.getsizeof(self.descriptions)
+            + sum(sys.getsizeof(d) for d in self.descriptions if d is not None)
+            + sys.getsizeof(self.extras)
+            + sum(sys.getsizeof(e) for e in self.extras.values())
+            + sys.getsizeof(self._unsorted)
+        )
+
+
+def _write(columns: TenantColumns, op: str, arg) -> None:
+    if op == "upsert":
+        columns.upsert(arg)
+    else:
+        columns.remove(arg)
+
+
+class BooksReadModel:
+    """Per-tenant columns, the load/reload cycle and the staleness bookkeeping."""
+
+    def __init__(
+        self,
+        enabled: bool = READ_MODEL_ENABLED,
+        max_staleness: float = READ_MODEL_MAX_STALENESS,
+    ) -> None:
+        self.enabled = enabled and np is not None
+        self.max_staleness = max_staleness
+        self.loaded_at: float | None = None
+        self._tenants: dict[str, TenantColumns] = {}
+        self._lock = threading.Lock()
+        self._replay: list[tuple[str, str, object]] | None = None  # set while reloading
+
+    @property
+    def age(self) -> float | None:
+        return None if self.loaded_at is None else time.time() - self.loaded_at
+
+    def __len__(self) -> int:
+        return sum(len(columns) for columns in list(self._tenants.values()))
+
+    def load(self, session_factory=SessionLocal, batch_size: int = 10_000) -> int:
+        """(Re)load every tenant's books from a streaming scan; returns how many."""
+        started = time.time()
+        with self._lock:
+            self._replay = []
+        try:
+            tenants: dict[str, TenantColumns] = {}
+            book = models.Book
+            with session_factory() as db:
+                rows = db.execute(
+                    select(
+                        book.tenant_id,
+                        book.id,
+                        book.title,
+                        book.author,
+                        book.description,
+                        book.year,
+                        book.cover,
+                        book.isbn,
+                        book.page_count,
+                        book.subjects,
+                    )
+                    .order_by(book.tenant_id, book.id)
+                    .execution_options(yield_per=batch_size)
+                )
+                # rows arrive grouped by tenant: build each tenant's columns when it ends
+                for tenant, group in itertools.groupby(rows, key=lambda row: row.tenant_id):
+                    tenants[tenant] = TenantColumns.build([_fields(row) for row in group])
+            with self._lock:
+                # writes this worker committed while the scan ran may be missing from it
+                for op, tenant, arg in self._replay:
+                    _write(tenants.setdefault(tenant, TenantColumns()), op, arg)
+                self._tenants = tenants
+                self._replay = None
+                self.loaded_at = started
+        finally:
+            with self._lock:
+                self._replay = None
+        self.publish_metrics()
+        return len(self)
+
+    def upsert(self, tenant: str, book: models.Book) -> None:
+        """Apply a book this worker just created or changed (after the commit)."""
+        self._apply("upsert", tenant, _fields(book))
+
+    def remove(self, tenant: str, book_id: int) -> None:
+        self._apply("remove", tenant, book_id)
+
+    def _apply(self, op: str, tenant: str, arg) -> None:
+        if self.loaded_at is None and self._replay is None:
+            return
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((op, tenant, arg))
+            columns = self._tenants.get(tenant)
+            if columns is None:
+                columns = self._tenants.setdefault(tenant, TenantColumns())
+        with columns.lock:
+            _write(columns, op, arg)
+
+    def query(self, tenant: str, q: BookQuery) -> tuple[list[dict], float] | None:
+        """(books, snapshot age) or None when the database has to answer."""
+        age = self.age
+        if not self.enabled or age is None or age > self.max_staleness:
+            return None
+        columns = self._tenants.get(tenant)
+        return ([] if columns is None else columns.query(q)), age
+
+    def memory_bytes(self) -> int:
+        return sum(columns.memory_bytes() for columns in list(self._tenants.values()))
+
+    def publish_metrics(self) -> None:
+        READ_MODEL_BYTES.set(self.memory_bytes())
+        READ_MODEL_BOOKS.set(len(self))
+
+
+read_model = BooksReadModel()
+READ_MODEL_AGE.set_function(lambda: -1 if read_model.age is None else read_model.age)
+
+
+async def run_reload_loop(model: BooksReadModel, interval: float = READ_MODEL_RELOAD_INTERVAL):
+    """Background task: load now, then reload every ``interval`` seconds."""
+    while True:
+        try:
+            started = time.perf_counter()
+            count = await asyncio.to_thread(model.load)
+            print(f"[READMODEL] Loaded {count} books in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            print(f"[READMODEL] Load failed: {e}")
+        await asyncio.sleep(interval)
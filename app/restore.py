@@ -0,0 +1,268 @@
+"""
+Restore a backup written by app/backup.py into DATABASE_URL.
+
+    python -m app.restore ./backups/2026-10-19              # every table in the backup
+    python -m app.restore ./backups/2026-10-19 --tables books --replace
+    python -m app.restore ./backups/2026-10-19 --check      # verify segments, touch nothing
+
+Run it before the app starts (the app's startup inserts sample books into an
+empty catalog). Every selected segment's checksum is verified before the
+target is touched. Target tables must be empty unless ``--replace`` deletes
+their rows first; missing tables are created (books partitioned by tenant on
+Postgres, as at startup). A table's secondary indexes are dropped before the
+load and built once it is done, which is far cheaper than maintaining them row
+by row. RESTORE_JOBS threads each read a segment and insert it: one plain
+executemany on SQLite, where the inserts take turns as it has a single writer,
+and batched multi-row INSERTs on Postgres. Afterwards Postgres serial
+sequences are moved past the restored ids and the planner statistics are
+refreshed.
+
+If the load fails part way (a lost connection, a full disk), the indexes are
+still built but the tables hold only some of the rows: restore again with
+``--replace``.
+
+Columns the backup has but the model doesn't are an error; model columns the
+backup lacks (an older backup) are left NULL.
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+
+from sqlalchemy import (
+    JSON,
+    Index,
+    Table,
+    Text,
+    bindparam,
+    cast,
+    create_engine,
+    delete,
+    insert,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from app.backup import BackupError, check_segment, read_manifest, read_segment, select_tables
+from app.database import engine as default_engine
+from app.tenancy import create_partitioned_table
+
+RESTORE_JOBS = int(os.getenv("RESTORE_JOBS", "4"))
+
+
+def _index_names(conn: Connection, table: Table) -> set[str]:
+    if conn.dialect.name == "sqlite":
+        sql = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t"
+    else:
+        sql = (
+            "SELECT indexname FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = :t"
+        )
+    return set(conn.execute(text(sql), {"t": table.name}).scalars())
+
+
+def _prepare(conn: Connection, table: Table, replace: bool) -> None:
+    """Create or empty ``table`` and drop its indexes (restore() builds all of them later)."""
+    if not create_partitioned_table(conn, table):
+        table.create(conn, checkfirst=True)
+    if replace:
+        conn.execute(delete(table))
+    elif conn.execute(select(1).select_from(table).limit(1)).first() is not None:
+        raise BackupError(f"{table.name} is not empty (use --replace to overwrite it)")
+    existing = _index_names(conn, table)
+    for index in table.indexes:
+        if index.name in existing:
+            index.drop(conn)
+
+
+def _insert(conn: Connection, table: Table, columns: list[str], rows: list[list]) -> None:
+    if conn.dialect.name == "sqlite":
+        # the values need no conversion, and SQLAlchemy's per-row parameter processing
+        # would cost more than the inserts themselves
+        quote = conn.dialect.identifier_preparer.quote
+        sql = (
+            f"INSERT INTO {quote(table.name)} ({', '.join(quote(name) for name in columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        conn.exec_driver_sql(sql, [tuple(row) for row in rows])
+        return
+    # Postgres: batched multi-row INSERTs; JSON columns arrive as JSON text
+    values = {}
+    for name in columns:
+        column_type = table.c[name].type
+        if isinstance(column_type, JSON):
+            values[name] = cast(bindparam(f"b_{name}", type_=Text()), column_type)
+        else:
+            values[name] = bindparam(f"b_{name}", type_=column_type)
+    keys = [f"b_{name}" for name in columns]
+    conn.execute(insert(table).values(values), [dict(zip(keys, row, strict=True)) for row in rows])
+
+
+def _load_segment(
+    engine: Engine, table: Table, columns: list[str], directory: Path, segment: dict, lock
+) -> int:
+    rows = read_segment(directory, segment)
+    with lock, engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            # a crash mid-restore means restoring again, so skip the per-commit fsync
+            conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        _insert(conn, table, columns, rows)
+    return len(rows)
+
+
+def _reset_sequences(conn: Connection, table: Table) -> None:
+    for column in table.primary_key.columns:
+        if column.autoincrement is True:
+            conn.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence(:t, :c), "
+                    f"coalesce(max({column.name}), 1), max({column.name}) IS NOT NULL) "
+                    f"FROM {table.name}"
+                ),
+                {"t": table.name, "c": column.name},
+            )
+
+
+def verify(directory: str | Path) -> int:
+    """Check every segment of a backup; returns the number of rows it holds."""
+    manifest = read_manifest(Path(directory))
+    return sum(
+        len(read_segment(Path(directory), segment))
+        for entry in manifest["tables"].values()
+        for segment in entry["segments"]
+    )
+
+
+def restore(
+    directory: str | Path,
+    engine: Engine = default_engine,
+    tables: list[str] | None = None,
+    jobs: int = RESTORE_JOBS,
+    replace: bool = False,
+) -> dict[str, int]:
+    """Load a backup's segments into ``engine``; returns rows restored per table."""
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    selected = [t for t in select_tables(tables) if t.name in manifest["tables"]]
+    for table in selected:
+        unknown = set(manifest["tables"][table.name]["columns"]) - set(table.c.keys())
+        if unknown:
+            raise BackupError(f"{table.name}: columns not in the model: {sorted(unknown)}")
+
+    # sqlite has one writer: threads still overlap reading, checksums and decoding
+    lock = threading.Lock() if engine.dialect.name == "sqlite" else contextlib.nullcontext()
+
+    def build(index: Index) -> None:
+        with lock, engine.begin() as conn:
+            index.create(conn)
+
+    restored = dict.fromkeys((table.name for table in selected), 0)
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="restore") as pool:
+        # a bad segment is refused here, while the target is still untouched
+        started = time.perf_counter()
+        segments = [s for table in selected for s in manifest["tables"][table.name]["segments"]]
+        for _ in pool.map(partial(check_segment, directory), segments):
+            pass
+        print(f"[RESTORE] Checked {len(segments)} segments in {time.perf_counter() - started:.1f}s")
+
+        with engine.begin() as conn:
+            for table in selected:
+                _prepare(conn, table, replace)
+
+        started = time.perf_counter()
+        loads = []
+        loaded = False
+        try:
+            for table in selected:
+                entry = manifest["tables"][table.name]
+                loads += [
+                    (
+                        table.name,
+                        pool.submit(
+                            _load_segment, engine, table, entry["columns"], directory, segment, lock
+                        ),
+                    )
+                    for segment in entry["segments"]
+                ]
+            for name, future in loads:
+                restored[name] += future.result()
+            loaded = True
+            print(
+                f"[RESTORE] Loaded {sum(restored.values())} rows "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+        finally:
+            if not loaded:
+                for _, future in loads:
+                    future.cancel()
+                wait([future for _, future in loads])
+            # every missing index, not only the ones dropped above: a failed earlier run may
+            # have left some out (SQLAlchemy's checkfirst can't see expression indexes)
+            started = time.perf_counter()
+            with engine.connect() as conn:
+                existing = {table.name: _index_names(conn, table) for table in selected}
+            builds = [
+                pool.submit(build, index)
+                for table in selected
+                for index in table.indexes
+                if index.name not in existing[table.name]
+            ]
+            for future in builds:
+                future.result()
+            print(f"[RESTORE] Built indexes in {time.perf_counter() - started:.1f}s")
+            if not loaded:
+                print(
+                    "[RESTORE] Load failed: the tables are partly restored, "
+                    "restore again with --replace",
+                    file=sys.stderr,
+                )
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            for table in selected:
+                _reset_sequences(conn, table)
+        conn.exec_driver_sql("ANALYZE")
+    return restored
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Restore a backup written by app.backup")
+    parser.add_argument("directory")
+    parser.add_argument("--tables", nargs="+", help="only these tables (default: all)")
+    parser.add_argument("--jobs", type=int, default=RESTORE_JOBS)
+    parser.add_argument("--replace", action="store_true", help="delete existing rows first")
+    parser.add_argument("--check", action="store_true", help="only verify the segments")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        if args.check:
+            print(f"[RESTORE] Backup OK: {verify(args.directory)} rows")
+            return 0
+        # not the app's engine, whose slow-query log would report every segment insert
+        sqlite = default_engine.dialect.name == "sqlite"
+        target = create_engine(
+            default_engine.url, connect_args={"check_same_thread": False} if sqlite else {}
+        )
+        restored = restore(
+            args.directory, target, tables=args.tables, jobs=args.jobs, replace=args.replace
+        )
+        target.dispose()
+    except BackupError as e:
+        print(f"[RESTORE] {e}", file=sys.stderr)
+        return 1
+    for name, rows in restored.items():
+        print(f"[RESTORE] {name}: {rows} rows")
+    print(f"[RESTORE] Done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+JWT revocation (logout) with an in-memory hot path.
+
+get_current_user checks every token's ``jti`` against a Bloom filter; only on a
+(possible) hit is the exact jti -> exp map consulted, so the common "not
+revoked" answer costs a few bit probes and no I/O. Entries are dropped once
+the token itself has expired.
+
+Revocations are shared between workers through a pluggable backend
+(REVOCATION_BACKEND):
+
+  * ``database`` (default) - rows in ``revoked_tokens``; each worker polls for
+    new rows every REVOCATION_SYNC_INTERVAL seconds, so another worker may
+    accept a revoked token for at most that long. Ids are handed out at insert
+    but become visible at commit, so on Postgres a lower id can appear after a
+    higher one was read: ids skipped that way are polled again for
+    REVOCATION_GAP_SECONDS.
+  * ``memory`` - single-process only, no sharing.
+  * ``package.module:ClassName`` - any class implementing publish/fetch_since/purge.
+"""
+
+import asyncio
+import hashlib
+import heapq
+import importlib
+import math
+import os
+import threading
+import time
+from typing import Any, Protocol
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+from app.database import SessionLocal
+
+REVOCATION_BACKEND = os.getenv("REVOCATION_BACKEND", "database")
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "2"))
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = 0.001
+REVOCATION_GAP_SECONDS = float(os.getenv("REVOCATION_GAP_SECONDS", "60"))
+# more missing ids than this are purged or rolled-back rows, not commits in flight
+REVOCATION_MAX_GAPS = 1000
+
+
+def _hash_pair(key: str) -> tuple[int, int]:
+    """Two 64-bit hashes for double hashing; uuid4 hex jtis are already random bits."""
+    if len(key) == 32:
+        try:
+            h = int(key, 16)
+            return h & 0xFFFFFFFFFFFFFFFF, (h >> 64) | 1
+        except ValueError:
+            pass
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over a bytearray (no deletes; rebuild to shrink)."""
+
+    def __init__(self, capacity: int, error_rate: float = REVOCATION_BLOOM_ERROR_RATE) -> None:
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        optimal = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        # power-of-two size so positions are a mask instead of a modulo
+        self.size = 1 << max(6, (optimal - 1).bit_length())
+        self.hashes = max(1, round(optimal / capacity * math.log(2)))
+        self._mask = self.size - 1
+        self.bits = bytearray(self.size >> 3)
+
+    def add(self, key: str) -> None:
+        h1, h2 = _hash_pair(key)
+        mask = self._mask
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) & mask
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        h1, h2 = _hash_pair(key)
+        bits, mask = self.bits, self._mask
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) & mask
+            if not bits[pos >> 3] >> (pos & 7) & 1:
+                return False
+        return True
+
+
+class RevocationBackend(Protocol):
+    def publish(self, jti: str, expires_at: int) -> None: ...
+
+    def fetch_since(self, cursor: Any) -> tuple[list[tuple[str, int]], Any]: ...
+
+    def purge(self, now: int) -> None: ...
+
+
+class MemoryBackend:
+    """No sharing: revocations are only visible to the current process."""
+
+    def publish(self, jti: str, expires_at: int) -> None:
+        return None
+
+    def fetch_since(self, cursor: Any) -> tuple[list[tuple[str, int]], Any]:
+        return [], cursor
+
+    def purge(self, now: int) -> None:
+        return None
+
+
+class DatabaseBackend:
+    """Shares revocations through the revoked_tokens table, polled by id.
+
+    The cursor is ``(high, gaps)``: the highest id read so far and the lower ids
+    that were missing when it was read, each with the monotonic time it was first
+    missed. Every poll asks for ids above ``high`` and for the gaps.
+    """
+
+    def __init__(self, session_factory=SessionLocal, batch_size: int = 10_000) -> None:
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+
+    def publish(self, jti: str, expires_at: int) -> None:
+        with self.session_factory() as db:
+            db.add(models.RevokedToken(jti=jti, expires_at=expires_at))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()  # already revoked (e.g. double logout)
+
+    def fetch_since(
+        self, cursor: tuple[int, dict[int, float]] | None
+    ) -> tuple[list[tuple[str, int]], tuple[int, dict[int, float]]]:
+        high, gaps = cursor or (0, {})
+        now = time.monotonic()
+        gaps = {id_: seen for id_, seen in gaps.items() if now - seen < REVOCATION_GAP_SECONDS}
+        token = models.RevokedToken
+        newer = token.id > high
+        with self.session_factory() as db:
+            rows = (
+                db.query(token.id, token.jti, token.expires_at)
+                .filter(or_(newer, token.id.in_(list(gaps))) if gaps else newer)
+                .filter(token.expires_at > int(time.time()))
+                .order_by(token.id)
+                .limit(self.batch_size)
+                .all()
+            )
+        for row in rows:
+            if row.id <= high:
+                del gaps[row.id]
+                continue
+            # the first poll starts wherever the table does
+            if cursor is not None and row.id - high - 1 <= REVOCATION_MAX_GAPS:
+                gaps.update(dict.fromkeys(range(high + 1, row.id), now))
+            high = row.id
+        if len(gaps) > REVOCATION_MAX_GAPS:
+            gaps = dict(sorted(gaps.items())[-REVOCATION_MAX_GAPS:])
+        return [(row.jti, row.expires_at) for row in rows], (high, gaps)
+
+    def purge(self, now: int) -> None:
+        with self.session_factory() as db:
+            db.query(models.RevokedToken).filter(models.RevokedToken.expires_at <= now).delete()
+            db.commit()
+
+
+class RevocationStore:
+    """Bloom filter in front of an exact jti -> exp map, fed locally and by the backend."""
+
+    def __init__(self, backend: RevocationBackend, capacity: int = REVOCATION_BLOOM_CAPACITY):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._expiry: dict[str, int] = {}
+        self._by_expiry: list[tuple[int, str]] = []  # min-heap for cheap pruning
+        self._bloom = BloomFilter(capacity)
+        self._cursor: Any = None
+        self.last_sync: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def is_revoked(self, jti: str) -> bool:
+        """Hot path: O(k) bit probes; the exact map is only touched on a Bloom hit."""
+        if jti not in self._bloom:
+            return False
+        return jti in self._expiry
+
+    def revoke(self, jti: str, expires_at: int) -> None:
+        """Revoke locally right away and publish to the other workers."""
+        if expires_at <= time.time():
+            return  # token is already unusable
+        self._add_many([(jti, expires_at)])
+        self.backend.publish(jti, expires_at)
+
+    def sync(self) -> int:
+        """Pull revocations published by other workers; returns how many were added."""
+        added = 0
+        while True:
+            entries, cursor = self.backend.fetch_since(self._cursor)
+            self._cursor = cursor
+            if not entries:
+                break
+            self._add_many(entries)
+            added += len(entries)
+        self.prune()
+        self.last_sync = time.monotonic()
+        return added
+
+    def prune(self, now: float | None = None) -> int:
+        """Drop expired entries and rebuild the Bloom filter when many bits are stale."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = []
+            while self._by_expiry and self._by_expiry[0][0] <= now:
+                _, jti = heapq.heappop(self._by_expiry)
+                if self._expiry.pop(jti, None) is not None:
+                    expired.append(jti)
+            if expired and len(expired) >= len(self._expiry):
+                self._rebuild(self._bloom.capacity)
+        return len(expired)
+
+    def _add_many(self, entries: list[tuple[str, int]]) -> None:
+        with self._lock:
+            for jti, exp in entries:
+                if jti in self._expiry:
+                    continue
+                self._expiry[jti] = exp
+                heapq.heappush(self._by_expiry, (exp, jti))
+                self._bloom.add(jti)
+            if len(self._expiry) > self._bloom.capacity:
+                self._rebuild(self._bloom.capacity * 2)
+
+    def _rebuild(self, capacity: int) -> None:
+        bloom = BloomFilter(capacity)
+        for jti in self._expiry:
+            bloom.add(jti)
+        self._bloom = bloom  # single reference swap; readers see old or new filter
+
+
+def build_backend(name: str = REVOCATION_BACKEND) -> RevocationBackend:
+    if name == "memory":
+        return MemoryBackend()
+    if name == "database":
+        return DatabaseBackend()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown REVOCATION_BACKEND: {name!r}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+revocation_store = RevocationStore(build_backend())
+
+
+async def run_sync_loop(store: RevocationStore, interval: float = REVOCATION_SYNC_INTERVAL):
+    """Background task: poll the backend and occasionally purge expired rows."""
+    last_purge = 0.0
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(store.sync)
+            if time.monotonic() - last_purge > 300:
+                await asyncio.to_thread(store.backend.purge, int(time.time()))
+                last_purge = time.monotonic()
+        except Exception as e:
+            print(f"[AUTH] Revocation sync failed: {e}")
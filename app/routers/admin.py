@@ -0,0 +1,98 @@
+"""
+Admin router: diagnostics endpoints restricted to admins (users.is_admin, carried
+as the `adm` token claim and re-checked against the database).
+"""
+
+import tracemalloc
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app import memory
+from app.auth import get_admin_user
+from app.profiling import list_reports, report_path
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(get_admin_user)])
+
+
+@router.get("/profiles")
+def list_profiles():
+    """List stored request profiles, newest first."""
+    return list_reports()
+
+
+@router.get("/profiles/{report_id}")
+def download_profile(report_id: str):
+    """Download a single profile report as JSON."""
+    path = report_path(report_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=path.name)
+
+
+# Memory endpoints answer for the worker that serves the request (see "pid" in the response).
+GroupBy = Literal["lineno", "filename", "traceback"]
+
+
+@router.get("/memory")
+def memory_summary():
+    """RSS, GC and tracemalloc state of this worker plus its stored snapshots."""
+    return memory.summary()
+
+
+@router.post("/memory/tracemalloc")
+def start_tracemalloc(frames: int = Query(1, ge=1, le=64)):
+    """Start tracing allocations, keeping ``frames`` frames per traceback."""
+    memory.start_tracing(frames)
+    return memory.summary()["tracemalloc"]
+
+
+@router.delete("/memory/tracemalloc", status_code=204)
+def stop_tracemalloc():
+    """Stop tracing and drop this worker's snapshots."""
+    memory.stop_tracing()
+    return None
+
+
+@router.post("/memory/snapshots", status_code=201)
+def take_snapshot(
+    group_by: GroupBy = "lineno",
+    limit: int = Query(20, ge=1, le=500),
+):
+    """Take a snapshot; returns its id, the top allocations and the diff to the previous one."""
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="tracemalloc is not running")
+    snapshot_id = memory.snapshots.take()
+    snapshot = memory.snapshots.get(snapshot_id)
+    previous = memory.snapshots.previous(snapshot_id)
+    return {
+        "id": snapshot_id,
+        "top": memory.top_stats(snapshot, group_by, limit),
+        "previous": previous,
+        "diff": (
+            None
+            if previous is None
+            else memory.diff_stats(snapshot, memory.snapshots.get(previous), group_by, limit)
+        ),
+    }
+
+
+@router.get("/memory/snapshots/{snapshot_id}/diff")
+def diff_snapshots(
+    snapshot_id: int,
+    base: int | None = Query(None, description="snapshot to compare against (default: previous)"),
+    group_by: GroupBy = "lineno",
+    limit: int = Query(20, ge=1, le=500),
+):
+    """Allocation changes between two snapshots, biggest first."""
+    base = base if base is not None else memory.snapshots.previous(snapshot_id)
+    snapshot = memory.snapshots.get(snapshot_id)
+    base_snapshot = None if base is None else memory.snapshots.get(base)
+    if snapshot is None or base_snapshot is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return {
+        "id": snapshot_id,
+        "base": base,
+        "diff": memory.diff_stats(snapshot, base_snapshot, group_by, limit),
+    }
@@ -5,22 +5,34 @@ Behavior unchanged; added docstrings/comments for clarity and maintainability.
 
 from datetime import timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.audit import audit_log
 from app.auth import (
+    ADMIN_CLAIM,
+    ADMIN_USERNAME,
+    AUTH_DEMO_FALLBACK,
     JWT_EXPIRE_MINUTES,
+    TENANT_CLAIM,
     authenticate_demo_user,
     create_access_token,
     get_current_user,
+    get_token_claims,
     hash_password,
+    normalize_email,
+    oauth2_scheme,
+    revoke_token,
     verify_password,
 )
 from app.database import SessionLocal
 from app.models import User
 from app.schemas import TokenResponse, UserCreate
+from app.tenancy import DEFAULT_TENANT, get_tenant
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -50,42 +62,94 @@ def get_db():
         db.close()
 
 
+def find_login_user(db: Session, email: str):
+    """Columns needed to authenticate, looked up through the lower(email) index (or None)."""
+    return (
+        db.query(User.username, User.tenant_id, User.hashed_password, User.is_admin)
+        .filter(func.lower(User.email) == normalize_email(email))
+        .first()
+    )
+
+
+def insert_user(db: Session, tenant: str, username: str, email: str, hashed_password: str):
+    """Insert a user in one INSERT ... RETURNING and commit; uniqueness is left to the DB.
+
+    Raises IntegrityError on a duplicate username or email (after rolling back).
+    """
+    stmt = (
+        insert(User)
+        .values(
+            tenant_id=tenant,
+            username=username,
+            email=normalize_email(email),
+            hashed_password=hashed_password,
+        )
+        .returning(User.id, User.username, User.email)
+    )
+    try:
+        row = db.execute(stmt).one()
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+    return row
+
+
+def _duplicate_field(exc: IntegrityError) -> str | None:
+    """Which unique field an IntegrityError is about (Postgres constraint name / SQLite message)."""
+    diag = getattr(exc.orig, "diag", None)
+    source = getattr(diag, "constraint_name", None) or str(exc.orig)
+    for field in ("username", "email"):
+        if field in source:
+            return field
+    return None
+
+
+def _issue_token(username: str, tenant: str, admin: bool = False) -> TokenResponse:
+    claims = {"sub": username, TENANT_CLAIM: tenant}
+    if admin:
+        claims[ADMIN_CLAIM] = True
+    access_token = create_access_token(
+        data=claims,
+        expires_delta=timedelta(minutes=JWT_EXPIRE_MINUTES),
+    )
+    return TokenResponse(access_token=access_token)
+
+
 @router.post("/token", response_model=TokenResponse)
-async def login(
+def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
 ):
-    """Issue access token for valid credentials (DB-first by email, demo fallback)."""
-    # Try DB-backed authentication first - search by email (form_data.username contains email)
-    user_in_db = db.query(User).filter(User.email == form_data.username).first()
-    print(f"[AUTH] Login attempt for '{form_data.username}': found_in_db={bool(user_in_db)}")
-    if user_in_db:
-        ok = verify_password(form_data.password, user_in_db.hashed_password)
-        print(f"[AUTH] Password verify for '{form_data.username}': {ok}")
-        if ok:
-            access_token_expires = timedelta(minutes=JWT_EXPIRE_MINUTES)
-            access_token = create_access_token(
-                data={"sub": user_in_db.username},
-                expires_delta=access_token_expires,
+    """Issue access token for valid credentials (DB users by email, optional demo fallback)."""
+    client_ip = request.client.host if request.client else None
+    user_in_db = None
+    # DB users sign in with their email; anything else can't match, so skip the query
+    if "@" in form_data.username:
+        user_in_db = find_login_user(db, form_data.username)
+        print(f"[AUTH] Login attempt for '{form_data.username}': found_in_db={bool(user_in_db)}")
+        if user_in_db and verify_password(form_data.password, user_in_db.hashed_password):
+            audit_log.record(
+                "auth.login", user_in_db.username, user_in_db.tenant_id, ip=client_ip, ok=True
             )
-            return TokenResponse(access_token=access_token)
-
-    # Fallback to demo admin (to keep existing tests passing)
-    user = authenticate_demo_user(form_data.username, form_data.password)
-    print(
-        f"[AUTH] Fallback demo auth for '{form_data.username}': {'success' if user else 'failed'}"
+            return _issue_token(user_in_db.username, user_in_db.tenant_id, user_in_db.is_admin)
+
+    # Demo admin only when no DB user matched, so failed DB logins stop here
+    if user_in_db is None and AUTH_DEMO_FALLBACK:
+        user = authenticate_demo_user(form_data.username, form_data.password)
+        if user:
+            audit_log.record("auth.login", user, DEFAULT_TENANT, ip=client_ip, ok=True)
+            return _issue_token(user, DEFAULT_TENANT, admin=True)
+
+    print(f"[AUTH] Login failed for '{form_data.username}'")
+    tenant = user_in_db.tenant_id if user_in_db else DEFAULT_TENANT
+    audit_log.record("auth.login", form_data.username, tenant, ip=client_ip, ok=False)
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid credentials",
+        headers={"WWW-Authenticate": "Bearer"},
     )
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    access_token_expires = timedelta(minutes=JWT_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": user}, expires_delta=access_token_expires)
-
-    return TokenResponse(access_token=access_token)
 
 
 @router.get("/me")
@@ -94,25 +158,46 @@ async def read_current_user(current_user: str = Depends(get_current_user)):
     return {"username": current_user}
 
 
+@router.post("/logout", status_code=204)
+def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: str = Depends(get_current_user),
+    claims: dict = Depends(get_token_claims),
+):
+    """Revoke the presented access token; it is rejected everywhere until it expires.
+
+    Sync, so the revocation's database commit runs in the threadpool.
+    """
+    if not revoke_token(token):
+        raise HTTPException(status_code=400, detail="Token cannot be revoked")
+    print(f"[AUTH] Logged out '{current_user}'")
+    audit_log.record("auth.logout", current_user, claims.get(TENANT_CLAIM, DEFAULT_TENANT))
+    return None
+
+
 @router.post("/register", response_model=RegisterResponse, status_code=201)
-async def register(payload: UserCreate, db: Session = Depends(get_db)):
-    """Create a new user with hashed password and unique username/email."""
-    # Uniqueness checks
-    if db.query(User).filter(User.username == payload.username).first():
-        raise HTTPException(status_code=400, detail="Username already exists")
-    if db.query(User).filter(User.email == payload.email).first():
-        raise HTTPException(status_code=400, detail="Email already exists")
-
-    # Create user with hashed password
-    user = User(
-        username=payload.username.strip(),
-        email=str(payload.email),
-        hashed_password=hash_password(payload.password),
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+def register(payload: UserCreate, db: Session = Depends(get_db), tenant: str = Depends(get_tenant)):
+    """Create a new user of the request's tenant with hashed password and unique username/email."""
+    # the demo admin's name stays unclaimable, even with the demo login turned off
+    if payload.username.strip().lower() == ADMIN_USERNAME.lower():
+        raise HTTPException(status_code=400, detail="Username is reserved")
+    try:
+        user = insert_user(
+            db,
+            tenant,
+            payload.username.strip(),
+            str(payload.email),
+            hash_password(payload.password),
+        )
+    except IntegrityError as e:
+        field = _duplicate_field(e)
+        if field == "username":
+            raise HTTPException(status_code=400, detail="Username already exists") from e
+        if field == "email":
+            raise HTTPException(status_code=400, detail="Email already exists") from e
+        raise
     print(f"[AUTH] Registered user id={user.id} username='{user.username}' email='{user.email}'")
+    audit_log.record("auth.registered", user.username, tenant, user.id)
 
     return RegisterResponse(
         message="Registered successfully",
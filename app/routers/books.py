@@ -1,9 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app import models, schemas
+from app.admission import step_deadline
+from app.audit import audit_log
 from app.auth import get_current_user
+from app.covers import COVER_MAX_BYTES, schedule_thumbnail, store_upload
 from app.database import SessionLocal
+from app.outbox import enqueue, notify
+from app.readmodel import BOOK_LISTINGS, BookQuery, read_model
+from app.similar import similar_index
+from app.stats import read_stats, record_book_change
+from app.suggest import suggest_index
+from app.tenancy import get_tenant
 
 router = APIRouter(prefix="/books", tags=["books"])
 
@@ -16,9 +27,77 @@ def get_db():
         db.close()
 
 
+def _book_payload(book: models.Book) -> dict:
+    return {
+        "id": book.id,
+        "title": book.title,
+        "author": book.author,
+        "description": book.description,
+        "year": book.year,
+        "isbn": book.isbn,
+    }
+
+
+def _load_book(db: Session, tenant: str, id: int) -> models.Book:
+    # other tenants' books are indistinguishable from missing ones
+    book = (
+        db.query(models.Book).filter(models.Book.tenant_id == tenant, models.Book.id == id).first()
+    )
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return book
+
+
+_SQL_ORDER = {
+    "id": (models.Book.id,),
+    "-id": (models.Book.id.desc(),),
+    # books without a year last, in both directions (as the read model sorts them)
+    "year": (models.Book.year.is_(None), models.Book.year, models.Book.id),
+    "-year": (models.Book.year.is_(None), models.Book.year.desc(), models.Book.id),
+    "title": (models.Book.title, models.Book.id),
+    "-title": (models.Book.title.desc(), models.Book.id),
+}
+
+
+def _query_books(db: Session, tenant: str, q: BookQuery) -> list[models.Book]:
+    query = db.query(models.Book).filter(models.Book.tenant_id == tenant)
+    if q.author is not None:
+        query = query.filter(func.lower(models.Book.author) == q.author.lower())
+    if q.title is not None:
+        query = query.filter(
+            func.lower(models.Book.title).contains(q.title.lower(), autoescape=True)
+        )
+    if q.year_min is not None:
+        query = query.filter(models.Book.year >= q.year_min)
+    if q.year_max is not None:
+        query = query.filter(models.Book.year <= q.year_max)
+    return query.order_by(*_SQL_ORDER[q.sort]).offset(q.offset).limit(q.limit).all()
+
+
 @router.get("/", response_model=list[schemas.Book])
-def list_books(db: Session = Depends(get_db)):
-    return db.query(models.Book).all()
+def list_books(
+    response: Response,
+    author: str | None = Query(None, max_length=200, description="exact, case-insensitive"),
+    title: str | None = Query(None, min_length=1, max_length=200, description="substring"),
+    year_min: int | None = None,
+    year_max: int | None = None,
+    sort: str = Query("id", pattern="^-?(id|year|title)$"),
+    limit: int | None = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    cache_control: str | None = Header(None),
+    db: Session = Depends(get_db),
+    tenant: str = Depends(get_tenant),
+):
+    """Books of the tenant, filtered and sorted; from the read model when it is loaded."""
+    q = BookQuery(author, title, year_min, year_max, sort, limit, offset)
+    served = None if cache_control == "no-cache" else read_model.query(tenant, q)
+    if served is not None:
+        books, age = served
+        response.headers["X-Read-Model-Age"] = f"{age:.3f}"
+        BOOK_LISTINGS.labels("read_model").inc()
+        return books
+    BOOK_LISTINGS.labels("database").inc()
+    return _query_books(db, tenant, q)
 
 
 @router.post("/", response_model=schemas.Book, status_code=201)
@@ -26,28 +105,76 @@ def create_book(
     book: schemas.BookCreate,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
+    tenant: str = Depends(get_tenant),
 ):
     if not book.title or not book.author:
         raise HTTPException(status_code=400, detail="title and author are required")
 
     obj = models.Book(
+        tenant_id=tenant,
         title=book.title,
         author=book.author,
         description=book.description,
         year=book.year,
+        isbn=book.isbn,
     )
     db.add(obj)
+    db.flush()  # assigns obj.id for the outbox event; same INSERT commit would have run
+    record_book_change(db, tenant, None, (obj.author, obj.year))
+    enqueue(db, tenant, "book.created", _book_payload(obj))
     db.commit()
+    notify()
     db.refresh(obj)
+    suggest_index.add(tenant, obj.id, obj.title, obj.author)
+    read_model.upsert(tenant, obj)
+    audit_log.record("book.created", current_user, tenant, obj.id)
     return obj
 
 
+# Must stay above /{id}, otherwise "stats"/"suggest" is parsed as a book id
+@router.get("/stats", response_model=schemas.BookStats)
+def book_stats(db: Session = Depends(get_db), tenant: str = Depends(get_tenant)):
+    """Counts per author/year/decade read from the incrementally maintained summary."""
+    return read_stats(db, tenant)
+
+
+@router.get("/suggest", response_model=list[schemas.BookSuggestion])
+def suggest_books(
+    prefix: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    tenant: str = Depends(get_tenant),
+):
+    """Typeahead over titles and authors, served from the in-memory prefix index."""
+    return suggest_index.search(tenant, prefix, limit)
+
+
 @router.get("/{id}", response_model=schemas.Book)
-def get_book(id: int, db: Session = Depends(get_db)):
-    book = db.query(models.Book).filter(models.Book.id == id).first()
-    if not book:
+def get_book(id: int, db: Session = Depends(get_db), tenant: str = Depends(get_tenant)):
+    return _load_book(db, tenant, id)
+
+
+@router.get("/{id}/similar", response_model=list[schemas.SimilarBook])
+def similar_books(
+    id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    tenant: str = Depends(get_tenant),
+):
+    """Precomputed neighbours from the similar-books index (empty until it is built)."""
+    neighbours = similar_index.lookup(id)[:limit]
+    # one query checks the book and fetches its neighbours; deleted ones drop out
+    wanted = [id] + [other for other, _ in neighbours]
+    rows = db.query(models.Book.id, models.Book.title, models.Book.author).filter(
+        models.Book.tenant_id == tenant, models.Book.id.in_(wanted)
+    )
+    books = {row.id: row for row in rows}
+    if id not in books:
         raise HTTPException(status_code=404, detail="Book not found")
-    return book
+    return [
+        {"id": other, "title": books[other].title, "author": books[other].author, "score": score}
+        for other, score in neighbours
+        if other in books
+    ]
 
 
 @router.patch("/{id}", response_model=schemas.Book)
@@ -56,30 +183,97 @@ def update_book(
     book_update: schemas.BookUpdate,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
+    tenant: str = Depends(get_tenant),
 ):
-    book = db.query(models.Book).filter(models.Book.id == id).first()
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
+    book = _load_book(db, tenant, id)
 
+    old = (book.author, book.year)
     update_data = book_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(book, field, value)
 
+    record_book_change(db, tenant, old, (book.author, book.year))
+    enqueue(db, tenant, "book.updated", {**_book_payload(book), "changed": sorted(update_data)})
+    db.commit()
+    notify()
+    db.refresh(book)
+    suggest_index.update(tenant, book.id, book.title, book.author)
+    read_model.upsert(tenant, book)
+    audit_log.record("book.updated", current_user, tenant, book.id, changed=sorted(update_data))
+    return book
+
+
+def _check_book(db: Session, tenant: str, id: int) -> None:
+    """404 unless the book exists; ends the transaction, so no connection idles meanwhile."""
+    try:
+        _load_book(db, tenant, id)
+    finally:
+        db.rollback()
+
+
+def _set_cover(db: Session, tenant: str, id: int, key: str) -> models.Book:
+    book = _load_book(db, tenant, id)
+    book.cover = key
     db.commit()
     db.refresh(book)
     return book
 
 
+@router.post(
+    "/{id}/cover",
+    response_model=schemas.Book,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"image/*": {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+async def upload_cover(
+    id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    tenant: str = Depends(get_tenant),
+):
+    """Attach a cover image sent as the raw request body (not multipart).
+
+    The body is streamed to disk as it arrives; the thumbnail is rendered later
+    by the cover worker pool.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > COVER_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Cover image too large")
+
+    # DB work stays off the event loop; check the book before accepting any bytes, and
+    # reload it afterwards rather than holding a transaction open during the upload.
+    # The upload isn't time-boxed (app/admission.py), each database step is.
+    with step_deadline(request.url.path):
+        await run_in_threadpool(_check_book, db, tenant, id)
+    key = await store_upload(request.stream())
+    with step_deadline(request.url.path):
+        book = await run_in_threadpool(_set_cover, db, tenant, id, key)
+    read_model.upsert(tenant, book)
+    schedule_thumbnail(key)
+    audit_log.record("book.cover_uploaded", current_user, tenant, id, cover=key)
+    return book
+
+
 @router.delete("/{id}", status_code=204)
 def delete_book(
     id: int,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
+    tenant: str = Depends(get_tenant),
 ):
-    book = db.query(models.Book).filter(models.Book.id == id).first()
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
+    book = _load_book(db, tenant, id)
 
     db.delete(book)
+    record_book_change(db, tenant, (book.author, book.year), None)
+    enqueue(db, tenant, "book.deleted", {"id": id})
     db.commit()
+    notify()
+    suggest_index.remove(tenant, id)
+    read_model.remove(tenant, id)
+    audit_log.record("book.deleted", current_user, tenant, id)
     return None
@@ -0,0 +1,52 @@
+"""
+Covers router: serves content-addressed cover images and their thumbnails.
+"""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from app.covers import (
+    COVER_KEY_RE,
+    IMMUTABLE_CACHE,
+    media_type,
+    original_path,
+    schedule_thumbnail,
+    thumbnail_path,
+)
+
+router = APIRouter(prefix="/covers", tags=["covers"])
+
+
+def _checked_key(key: str) -> str:
+    # the key becomes a path on disk: only accept exactly what store_upload produces
+    if not COVER_KEY_RE.match(key):
+        raise HTTPException(status_code=404, detail="Cover not found")
+    return key
+
+
+@router.get("/thumbs/{key}")
+def get_thumbnail(key: str):
+    """JPEG thumbnail; until it is rendered the original is served without long-lived caching."""
+    key = _checked_key(key)
+    thumb = thumbnail_path(key)
+    if thumb.exists():
+        return FileResponse(
+            thumb, media_type="image/jpeg", headers={"Cache-Control": IMMUTABLE_CACHE}
+        )
+    original = original_path(key)
+    if not original.exists():
+        raise HTTPException(status_code=404, detail="Cover not found")
+    schedule_thumbnail(key)
+    return FileResponse(original, media_type=media_type(key), headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/{key}")
+def get_cover(key: str):
+    """Original upload (FileResponse: Range requests, sendfile via ASGI pathsend when available)."""
+    key = _checked_key(key)
+    path = original_path(key)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Cover not found")
+    return FileResponse(
+        path, media_type=media_type(key), headers={"Cache-Control": IMMUTABLE_CACHE}
+    )
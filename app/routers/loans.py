@@ -0,0 +1,107 @@
+"""
+Lending router: copies, checkout/return and the reservation queue (logic in app/lending.py).
+"""
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app import lending, schemas
+from app.audit import audit_log
+from app.auth import get_admin_user, get_current_user, get_token_claims, is_admin
+from app.outbox import notify
+from app.routers.books import get_db
+from app.tenancy import get_tenant
+
+router = APIRouter(tags=["lending"])
+
+
+@router.post("/books/{id}/copies", response_model=schemas.CopiesAdded, status_code=201)
+def add_copies(
+    id: int,
+    body: schemas.CopiesCreate,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_admin_user),
+    tenant: str = Depends(get_tenant),
+):
+    copy_ids = lending.add_copies(db, tenant, id, body.count)
+    notify()
+    audit_log.record("book.copies_added", current_user, tenant, id, copies=copy_ids)
+    return {"copy_ids": copy_ids}
+
+
+@router.get("/books/{id}/availability", response_model=schemas.Availability)
+def availability(id: int, db: Session = Depends(get_db), tenant: str = Depends(get_tenant)):
+    return lending.availability(db, tenant, id)
+
+
+@router.post("/books/{id}/checkout", response_model=schemas.Loan, status_code=201)
+def checkout(
+    id: int,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    tenant: str = Depends(get_tenant),
+):
+    loan = lending.checkout(db, tenant, id, current_user)
+    notify()
+    audit_log.record("loan.checked_out", current_user, tenant, loan.id, book=id, copy=loan.copy_id)
+    return loan
+
+
+@router.post("/books/{id}/reservations", response_model=schemas.Reservation, status_code=201)
+def reserve(
+    id: int,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    tenant: str = Depends(get_tenant),
+):
+    reservation = lending.reserve(db, tenant, id, current_user)
+    audit_log.record("reservation.created", current_user, tenant, reservation["id"], book=id)
+    return reservation
+
+
+@router.get("/loans", response_model=list[schemas.Loan])
+def my_loans(
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    tenant: str = Depends(get_tenant),
+):
+    """The caller's open loans."""
+    return lending.open_loans(db, tenant, current_user)
+
+
+@router.post("/loans/{loan_id}/return", response_model=schemas.Loan)
+def return_loan(
+    loan_id: int,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    claims: dict = Depends(get_token_claims),
+    tenant: str = Depends(get_tenant),
+):
+    """Return a loan; admins (the librarian desk) may return anyone's."""
+    loan = lending.return_loan(db, tenant, loan_id, current_user, librarian=is_admin(claims))
+    notify()
+    audit_log.record("loan.returned", current_user, tenant, loan_id, copy=loan.copy_id)
+    return loan
+
+
+@router.get("/reservations", response_model=list[schemas.Reservation])
+def my_reservations(
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    tenant: str = Depends(get_tenant),
+):
+    """The caller's waiting and ready reservations."""
+    return lending.active_reservations(db, tenant, current_user)
+
+
+@router.delete("/reservations/{reservation_id}", status_code=204)
+def cancel_reservation(
+    reservation_id: int,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    tenant: str = Depends(get_tenant),
+):
+    lending.cancel_reservation(db, tenant, reservation_id, current_user)
+    notify()
+    audit_log.record("reservation.cancelled", current_user, tenant, reservation_id)
+    return None
@@ -3,7 +3,18 @@ Pydantic schemas for Books and Users.
 Behavior unchanged; added docstrings and minor comments to improve clarity.
 """
 
-from pydantic import BaseModel, ConfigDict, EmailStr, field_validator
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, computed_field, field_validator
+
+from app.isbn import normalize_isbn
+
+
+def _valid_isbn(v: str | None) -> str | None:
+    if v is None:
+        return None
+    isbn = normalize_isbn(v)
+    if isbn is None:
+        raise ValueError("isbn must be a valid ISBN-10 or ISBN-13")
+    return isbn
 
 
 class BookBase(BaseModel):
@@ -13,6 +24,7 @@ class BookBase(BaseModel):
     author: str
     description: str | None = None
     year: int | None = None
+    isbn: str | None = None
 
 
 class BookCreate(BookBase):
@@ -32,6 +44,11 @@ class BookCreate(BookBase):
             raise ValueError("year must be >= 0")
         return v
 
+    @field_validator("isbn")
+    @classmethod
+    def validate_isbn(cls, v: str | None) -> str | None:
+        return _valid_isbn(v)
+
 
 class BookUpdate(BaseModel):
     """Partial update payload for an existing book."""
@@ -40,6 +57,7 @@ class BookUpdate(BaseModel):
     author: str | None = None
     description: str | None = None
     year: int | None = None
+    isbn: str | None = None
 
     @field_validator("title")
     @classmethod
@@ -55,14 +73,106 @@ class BookUpdate(BaseModel):
             raise ValueError("year must be >= 0")
         return v
 
+    @field_validator("isbn")
+    @classmethod
+    def validate_isbn(cls, v: str | None) -> str | None:
+        return _valid_isbn(v)
+
 
 class Book(BookBase):
     """Response schema for a stored book (includes id)."""
 
     id: int
+    cover: str | None = None
+    # filled in by enrichment, see app/enrichment.py
+    page_count: int | None = None
+    subjects: list[str] | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
+    @computed_field
+    @property
+    def cover_url(self) -> str | None:
+        return f"/covers/{self.cover}" if self.cover else None
+
+    @computed_field
+    @property
+    def thumbnail_url(self) -> str | None:
+        return f"/covers/thumbs/{self.cover}" if self.cover else None
+
+
+class BookSuggestion(BaseModel):
+    """Typeahead hit returned by /books/suggest; ``match`` names the matched field."""
+
+    id: int
+    title: str
+    author: str
+    match: str
+
+
+class SimilarBook(BaseModel):
+    """Neighbour returned by /books/{id}/similar; ``score`` is the cosine similarity."""
+
+    id: int
+    title: str
+    author: str
+    score: float
+
+
+class BookStats(BaseModel):
+    """Catalog aggregates returned by /books/stats (keys are authors, years, decades)."""
+
+    total: int
+    by_author: dict[str, int]
+    by_year: dict[str, int]
+    by_decade: dict[str, int]
+
+
+# --- Lending schemas ---
+class CopiesCreate(BaseModel):
+    """Number of copies to add to a book's inventory."""
+
+    count: int = Field(1, ge=1, le=100)
+
+
+class CopiesAdded(BaseModel):
+    copy_ids: list[int]
+
+
+class Availability(BaseModel):
+    """Copies of a title by status plus the length of its reservation queue."""
+
+    book_id: int
+    copies: int
+    available: int
+    on_loan: int
+    held: int
+    waiting: int
+
+
+class Loan(BaseModel):
+    id: int
+    book_id: int
+    copy_id: int
+    borrower: str
+    loaned_at: float
+    due_at: float
+    returned_at: float | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class Reservation(BaseModel):
+    """Active reservation; ``position`` is the place in the queue while waiting."""
+
+    id: int
+    book_id: int
+    status: str
+    position: int | None = None
+    created_at: float
+    copy_id: int | None = None
+    ready_until: float | None = None
+
 
 # --- User schemas ---
 class UserBase(BaseModel):
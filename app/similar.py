@@ -0,0 +1,790 @@
+"""
+"Similar books": every book's top-k neighbours by TF-IDF cosine similarity, precomputed.
+
+GET /books/{id}/similar never computes similarity. It reads one row of a
+neighbour file that a batch job builds and each worker memory-maps, so the
+pages are shared by all processes on a host:
+
+    python -m app.similar build      # full rebuild into SIMILAR_PATH (atomic rename)
+    python -m app.similar show 42    # book 42's neighbours
+
+Build: per tenant, title and description words plus the author (as one token)
+become sublinear TF-IDF vectors, L2-normalized. Terms found in more than
+SIMILAR_MAX_DF of a tenant's books (and in at least 100 books) are dropped:
+they say little and would make the products dense. With NumPy and SciPy
+installed the neighbours come from blocked sparse products (SIMILAR_BLOCK_ROWS
+books against the whole tenant at a time, which bounds memory); without them
+a pure-Python postings walk computes the same rows, fast enough for small
+catalogs. They are imported by the build only, so the API never loads them.
+
+Incremental: book.created/updated/deleted outbox events are folded in between
+rebuilds. A fold scores the changed book against the file's postings (and
+earlier folds), rewrites its row and the rows it now enters, and appends the
+change to SIMILAR_PATH + ".delta", which every worker tails. Folds use the IDF
+of the last build, so rebuild periodically (e.g. nightly); a rebuild keeps only
+the delta entries newer than its snapshot.
+"""
+
+import argparse
+import bisect
+import fcntl
+import heapq
+import importlib.util
+import itertools
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from prometheus_client import Gauge
+from sqlalchemy import select
+
+from app import models
+from app.database import SessionLocal
+from app.outbox import OutboxMessage, registry
+from app.suggest import normalize
+
+SIMILAR_PATH = os.getenv("SIMILAR_PATH", "./data/similar/neighbours.bin")
+SIMILAR_K = int(os.getenv("SIMILAR_K", "10"))
+SIMILAR_BLOCK_ROWS = int(os.getenv("SIMILAR_BLOCK_ROWS", "2048"))
+SIMILAR_MAX_DF = float(os.getenv("SIMILAR_MAX_DF", "0.2"))
+SIMILAR_RELOAD_INTERVAL = float(os.getenv("SIMILAR_RELOAD_INTERVAL", "1"))
+# a fold offers the changed book to at most this many of its best matches' rows
+SIMILAR_FOLD_FANOUT = int(os.getenv("SIMILAR_FOLD_FANOUT", "1000"))
+
+MAGIC = b"LLSIM\x00\x00\x01"
+_PREFIX = struct.Struct("<8sQ")  # magic, length of the JSON header that follows
+_MIN_DF_LIMIT = 100
+
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the to with".split()
+)
+
+Row = list[tuple[int, float]]
+
+SIMILAR_INDEX_AGE = Gauge(
+    "librarylite_similar_index_age_seconds",
+    "Seconds since the neighbour file loaded by this worker was built (-1 when none)",
+)
+SIMILAR_OVERLAY_ROWS = Gauge(
+    "librarylite_similar_overlay_rows",
+    "Neighbour rows this worker serves from the delta instead of the file",
+)
+
+
+def terms(title: str, author: str, description: str | None) -> dict[str, int]:
+    """Term counts of one book; the author is a single ``@``-prefixed term."""
+    counts: dict[str, int] = defaultdict(int)
+    for text in (title, description or ""):
+        for word in _WORD_RE.findall(normalize(text)):
+            if len(word) > 1 and word not in _STOPWORDS:
+                counts[word] += 1
+    author_key = normalize(author)
+    if author_key:
+        counts["@" + author_key] += 1
+    return counts
+
+
+def _idf(df: int, n: int) -> float:
+    return math.log((1 + n) / (1 + df)) + 1.0
+
+
+def _df_limit(n: int, max_df: float) -> int:
+    return max(int(max_df * n), _MIN_DF_LIMIT)
+
+
+def _order_key(item: tuple[int, float]) -> tuple[float, int]:
+    # best score first, lower id first on ties (the same order for both build paths)
+    return (-item[1], item[0])
+
+
+# --- build ---
+class _Corpus:
+    """One tenant's books as raw term counts in CSR layout."""
+
+    def __init__(self, tenant: str) -> None:
+        self.tenant = tenant
+        self.ids = array("q")
+        self.indptr = array("q", [0])
+        self.cols = array("i")
+        self.tfs = array("f")
+        self.vocab: dict[str, int] = {}
+        self.df = array("q")
+
+    def add(self, book_id: int, counts: dict[str, int]) -> None:
+        self.ids.append(book_id)
+        for term, tf in counts.items():
+            col = self.vocab.get(term)
+            if col is None:
+                col = self.vocab[term] = len(self.vocab)
+                self.df.append(0)
+            self.df[col] += 1
+            self.cols.append(col)
+            self.tfs.append(tf)
+        self.indptr.append(len(self.cols))
+
+
+class _Part(NamedTuple):
+    """Build output for one tenant, ready to be written."""
+
+    tenant: str
+    ids: object  # int64 sequence sorted ascending (array or ndarray)
+    neighbours: object  # int64, len(ids) * k, 0-padded
+    scores: object  # float32, len(ids) * k
+    keys: list[bytes]  # b"<tenant>\t<term>", sorted
+    df: object  # int64 per key
+    posting_indptr: object  # int64, len(keys) + 1
+    posting_ids: object  # int64
+    posting_weights: object  # float32
+
+
+def _compute_python(corpus: _Corpus, k: int, max_df: float) -> _Part:
+    n = len(corpus.ids)
+    limit = _df_limit(n, max_df)
+    idf = [_idf(df, n) if df <= limit else 0.0 for df in corpus.df]
+    postings: list[list[tuple[int, float]]] = [[] for _ in corpus.vocab]
+    docs: list[list[tuple[int, float]]] = []
+    for row in range(n):
+        lo, hi = corpus.indptr[row], corpus.indptr[row + 1]
+        vec = [
+            (col, (1 + math.log(tf)) * idf[col])
+            for col, tf in zip(corpus.cols[lo:hi], corpus.tfs[lo:hi], strict=True)
+            if idf[col]
+        ]
+        norm = math.sqrt(sum(w * w for _, w in vec))
+        vec = [(col, w / norm) for col, w in vec] if norm else []
+        docs.append(vec)
+        for col, w in vec:
+            postings[col].append((row, w))
+
+    ids = corpus.ids
+    neighbours = array("q", bytes(8 * n * k))
+    scores = array("f", bytes(4 * n * k))
+    for row, vec in enumerate(docs):
+        acc: dict[int, float] = defaultdict(float)
+        for col, w in vec:
+            for other, w2 in postings[col]:
+                acc[other] += w * w2
+        acc.pop(row, None)
+        best = heapq.nsmallest(k, ((ids[r], s) for r, s in acc.items()), key=_order_key)
+        for j, (book_id, score) in enumerate(best):
+            neighbours[row * k + j] = book_id
+            scores[row * k + j] = score
+
+    terms_by_key = sorted(
+        ((f"{corpus.tenant}\t{term}".encode(), col) for term, col in corpus.vocab.items())
+    )
+    posting_indptr = array("q", [0])
+    posting_ids = array("q")
+    posting_weights = array("f")
+    for _, col in terms_by_key:
+        for row, w in postings[col]:
+            posting_ids.append(ids[row])
+            posting_weights.append(w)
+        posting_indptr.append(len(posting_ids))
+    return _Part(
+        corpus.tenant,
+        ids,
+        neighbours,
+        scores,
+        [key for key, _ in terms_by_key],
+        array("q", (corpus.df[col] for _, col in terms_by_key)),
+        posting_indptr,
+        posting_ids,
+        posting_weights,
+    )
+
+
+def _has_numpy() -> bool:
+    """NumPy and SciPy are installed (checked without importing them)."""
+    return all(importlib.util.find_spec(name) is not None for name in ("numpy", "scipy"))
+
+
+def _compute_numpy(corpus: _Corpus, k: int, max_df: float, block_rows: int) -> _Part:
+    import numpy as np
+    from scipy import sparse
+
+    n, n_terms = len(corpus.ids), len(corpus.vocab)
+    ids = np.frombuffer(corpus.ids, dtype=np.int64)
+    cols = np.frombuffer(corpus.cols, dtype=np.int32)
+    df = np.frombuffer(corpus.df, dtype=np.int64)
+    idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+    idf[df > _df_limit(n, max_df)] = 0
+    weights = (1 + np.log(np.frombuffer(corpus.tfs, dtype=np.float32))) * idf[cols]
+    x = sparse.csr_matrix(
+        (weights, cols, np.frombuffer(corpus.indptr, dtype=np.int64)), shape=(n, n_terms)
+    )
+    x.eliminate_zeros()
+    norms = np.sqrt(np.asarray(x.multiply(x).sum(axis=1), dtype=np.float32).ravel())
+    norms[norms == 0] = 1
+    x = sparse.csr_matrix(sparse.diags(1 / norms) @ x, dtype=np.float32)
+    xt = x.T.tocsr()
+
+    neighbours = np.zeros(n * k, dtype=np.int64)
+    scores = np.zeros(n * k, dtype=np.float32)
+    for start in range(0, n, block_rows):
+        # block_rows x n similarities; sparse, so memory follows the matches, not n
+        block = (x[start : start + block_rows] @ xt).tocsr()
+        for i in range(block.shape[0]):
+            lo, hi = block.indptr[i], block.indptr[i + 1]
+            others, values = block.indices[lo:hi], block.data[lo:hi]
+            keep = others != start + i
+            others, values = ids[others[keep]], values[keep]
+            if len(values) > 8 * k:
+                top = np.argpartition(-values, k)[: 2 * k]
+                others, values = others[top], values[top]
+            order = np.lexsort((others, -values))[:k]
+            row = (start + i) * k
+            neighbours[row : row + len(order)] = others[order]
+            scores[row : row + len(order)] = values[order]
+
+    terms_by_key = sorted(
+        (f"{corpus.tenant}\t{term}".encode(), col) for term, col in corpus.vocab.items()
+    )
+    order = np.fromiter((col for _, col in terms_by_key), dtype=np.int64, count=n_terms)
+    postings = xt[order]
+    return _Part(
+        corpus.tenant,
+        ids,
+        neighbours,
+        scores,
+        [key for key, _ in terms_by_key],
+        df[order],
+        postings.indptr.astype(np.int64),
+        ids[postings.indices],
+        postings.data.astype(np.float32),
+    )
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _write(path: str, parts: list[_Part], k: int, meta: dict) -> None:
+    """Write the neighbour file: prefix, JSON header, then 8-byte aligned sections."""
+    parts = sorted(parts, key=lambda p: p.tenant.encode())
+    n = sum(len(p.ids) for p in parts)
+    n_terms = sum(len(p.keys) for p in parts)
+    n_postings = sum(len(p.posting_ids) for p in parts)
+    blob_size = sum(len(key) for p in parts for key in p.keys)
+    sizes = {
+        "ids": 8 * n,
+        "neighbours": 8 * n * k,
+        "scores": 4 * n * k,
+        "term_offsets": 8 * (n_terms + 1),
+        "term_df": 8 * n_terms,
+        "posting_offsets": 8 * (n_terms + 1),
+        "posting_ids": 8 * n_postings,
+        "posting_weights": 4 * n_postings,
+        "term_blob": blob_size,
+    }
+    sections, offset = {}, 0
+    for name, size in sizes.items():
+        sections[name] = offset
+        offset = _align(offset + size)
+    header = json.dumps(
+        {**meta, "k": k, "rows": n, "terms": n_terms, "postings": n_postings, "sections": sections}
+    ).encode()
+    base = _align(_PREFIX.size + len(header))
+
+    def keyed(index: int, part: _Part):
+        return ((int(book_id), index, row) for row, book_id in enumerate(part.ids))
+
+    def rows_in_order():
+        # each tenant's ids are sorted; merge them into global id order
+        streams = [keyed(index, part) for index, part in enumerate(parts)]
+        for _, index, row in heapq.merge(*streams):
+            yield parts[index], row
+
+    with open(path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+
+        def seek(name: str) -> None:
+            f.write(bytes(base + sections[name] - f.tell()))
+
+        for name, width in (("ids", 1), ("neighbours", k), ("scores", k)):
+            seek(name)
+            if len(parts) == 1:
+                f.write(memoryview(getattr(parts[0], name)))
+                continue
+            for part, row in rows_in_order():
+                f.write(memoryview(getattr(part, name))[row * width : (row + 1) * width])
+
+        seek("term_offsets")
+        lengths = (len(key) for part in parts for key in part.keys)
+        f.write(array("q", itertools.accumulate(lengths, initial=0)))
+        seek("term_df")
+        for part in parts:
+            f.write(memoryview(part.df))
+        seek("posting_offsets")
+        f.write(array("q", [0]))
+        done = 0
+        for part in parts:
+            f.write(
+                array("q", (done + int(v) for v in itertools.islice(part.posting_indptr, 1, None)))
+            )
+            done += int(part.posting_indptr[-1])
+        for name in ("posting_ids", "posting_weights"):
+            seek(name)
+            for part in parts:
+                f.write(memoryview(getattr(part, name)))
+        seek("term_blob")
+        for part in parts:
+            f.write(b"".join(part.keys))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _stream_books(rows):
+    """Group (tenant, id, title, author, description) rows, ordered by tenant, into corpora."""
+    for tenant, group in itertools.groupby(rows, key=lambda row: row[0]):
+        corpus = _Corpus(tenant)
+        for _, book_id, title, author, description in group:
+            corpus.add(book_id, terms(title, author, description))
+        yield corpus
+
+
+def build_from_rows(
+    rows,
+    path: str = SIMILAR_PATH,
+    k: int = SIMILAR_K,
+    block_rows: int = SIMILAR_BLOCK_ROWS,
+    max_df: float = SIMILAR_MAX_DF,
+    backend: str = "auto",
+    snapshot_at: float | None = None,
+) -> dict:
+    """Build and atomically install the neighbour file from rows sorted by (tenant, id).
+
+    ``backend`` is ``numpy`` (needs NumPy and SciPy), ``python`` or ``auto``.
+    Returns timings and sizes.
+    """
+    if backend == "auto":
+        backend = "numpy" if _has_numpy() else "python"
+    if backend == "numpy" and not _has_numpy():
+        raise RuntimeError("the numpy backend needs numpy and scipy installed")
+    snapshot_at = time.time() if snapshot_at is None else snapshot_at
+    timings = {"vectorize": 0.0, "neighbours": 0.0}
+    parts, tenants = [], {}
+    started = time.perf_counter()
+    corpora = _stream_books(rows)
+    while True:
+        t0 = time.perf_counter()
+        corpus = next(corpora, None)
+        timings["vectorize"] += time.perf_counter() - t0
+        if corpus is None:
+            break
+        t0 = time.perf_counter()
+        if backend == "numpy":
+            parts.append(_compute_numpy(corpus, k, max_df, block_rows))
+        else:
+            parts.append(_compute_python(corpus, k, max_df))
+        timings["neighbours"] += time.perf_counter() - t0
+        tenants[corpus.tenant] = len(corpus.ids)
+
+    t0 = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    meta = {
+        "built_at": time.time(),
+        "snapshot_at": snapshot_at,
+        "max_df": max_df,
+        "backend": backend,
+        "tenants": tenants,
+    }
+    _write(tmp, parts, k, meta)
+    with _delta_lock(path):
+        _compact_delta(path, snapshot_at)
+        os.replace(tmp, path)
+    timings["write"] = time.perf_counter() - t0
+    return {
+        "backend": backend,
+        "books": sum(tenants.values()),
+        "tenants": len(tenants),
+        "bytes": os.path.getsize(path),
+        "seconds": time.perf_counter() - started,
+        **{f"{name}_seconds": value for name, value in timings.items()},
+    }
+
+
+def build(session_factory=SessionLocal, path: str = SIMILAR_PATH, **options) -> dict:
+    """Rebuild the neighbour file from a streaming scan of the books table."""
+    snapshot_at = time.time()
+    book = models.Book
+    with session_factory() as db:
+        rows = db.execute(
+            select(book.tenant_id, book.id, book.title, book.author, book.description)
+            .order_by(book.tenant_id, book.id)
+            .execution_options(yield_per=10_000)
+        )
+        return build_from_rows(rows, path, snapshot_at=snapshot_at, **options)
+
+
+# --- delta log ---
+@contextmanager
+def _delta_lock(path: str):
+    """Cross-process lock for appending to / replacing the delta file."""
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _compact_delta(path: str, snapshot_at: float) -> None:
+    """Keep only delta entries newer than the build's snapshot (the caller holds the lock)."""
+    delta = f"{path}.delta"
+    kept = []
+    try:
+        with open(delta, "rb") as f:
+            kept = [
+                line for line in f if line.endswith(b"\n") and json.loads(line)["ts"] >= snapshot_at
+            ]
+    except FileNotFoundError:
+        pass
+    with open(f"{delta}.tmp", "wb") as f:
+        f.writelines(kept)
+    os.replace(f"{delta}.tmp", delta)
+
+
+# --- lookup ---
+class NeighbourFile:
+    """Read-only memory map of a neighbour file built by build_from_rows()."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = _PREFIX.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a neighbour file")
+        self.meta = json.loads(self._mm[_PREFIX.size : _PREFIX.size + header_size])
+        base = _align(_PREFIX.size + header_size)
+        self.k = self.meta["k"]
+        n, n_terms, n_postings = self.meta["rows"], self.meta["terms"], self.meta["postings"]
+        view = memoryview(self._mm)
+
+        def section(name: str, fmt: str, count: int) -> memoryview:
+            start = base + self.meta["sections"][name]
+            return view[start : start + struct.calcsize(fmt) * count].cast(fmt)
+
+        self.ids = section("ids", "q", n)
+        self._neighbours = section("neighbours", "q", n * self.k)
+        self._scores = section("scores", "f", n * self.k)
+        self._term_offsets = section("term_offsets", "q", n_terms + 1)
+        self._term_df = section("term_df", "q", n_terms)
+        self._posting_offsets = section("posting_offsets", "q", n_terms + 1)
+        self._posting_ids = section("posting_ids", "q", n_postings)
+        self._posting_weights = section("posting_weights", "f", n_postings)
+        self._blob = section("term_blob", "B", self._term_offsets[-1])
+        self.n_terms = n_terms
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def neighbours(self, book_id: int) -> Row | None:
+        """The book's row (best first), or None when it was not part of the build."""
+        i = bisect.bisect_left(self.ids, book_id)
+        if i == len(self.ids) or self.ids[i] != book_id:
+            return None
+        k = self.k
+        row = zip(
+            self._neighbours[i * k : (i + 1) * k].tolist(),
+            self._scores[i * k : (i + 1) * k].tolist(),
+            strict=True,
+        )
+        return [(other, score) for other, score in row if other]
+
+    def _term(self, key: bytes) -> int | None:
+        offsets, blob = self._term_offsets, self._blob
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(blob[offsets[mid] : offsets[mid + 1]]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_terms and bytes(blob[offsets[lo] : offsets[lo + 1]]) == key:
+            return lo
+        return None
+
+    def postings(self, key: bytes) -> tuple[int, memoryview, memoryview] | None:
+        """(document frequency, book ids, weights) of a ``tenant\tterm`` key."""
+        t = self._term(key)
+        if t is None:
+            return None
+        lo, hi = self._posting_offsets[t], self._posting_offsets[t + 1]
+        return self._term_df[t], self._posting_ids[lo:hi], self._posting_weights[lo:hi]
+
+
+def _stat(path: str) -> tuple[int, int, int] | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class SimilarIndex:
+    """The mapped neighbour file plus the delta entries folded in since it was built.
+
+    Files are re-checked at most every ``reload_interval`` seconds, so a lookup
+    is normally a bisection over the mapped ids and one row slice.
+    """
+
+    def __init__(self, path: str = SIMILAR_PATH, reload_interval: float = SIMILAR_RELOAD_INTERVAL):
+        self.path = path
+        self.delta_path = f"{path}.delta"
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._file: NeighbourFile | None = None
+        self._file_stat = None
+        self._delta_inode = None
+        self._delta_offset = 0
+        self._checked_at = float("-inf")
+        self._reset_overlay()
+
+    def _reset_overlay(self) -> None:
+        self._rows: dict[int, Row] = {}
+        self._removed: set[int] = set()
+        # folded books: id -> (tenant, vector); their postings in the file are stale
+        self._vectors: dict[int, tuple[str, dict[str, float]]] = {}
+        self._postings: dict[str, dict[int, float]] = defaultdict(dict)
+
+    @property
+    def built_at(self) -> float | None:
+        return self._file.meta["built_at"] if self._file is not None else None
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            self._reload(now)
+
+    def _reload(self, now: float) -> None:
+        """Pick up a rebuilt file and new delta entries (the caller holds self._lock)."""
+        self._checked_at = now
+        file_stat = _stat(self.path)
+        delta_stat = _stat(self.delta_path)
+        delta_inode = delta_stat[0] if delta_stat else None
+        if file_stat != self._file_stat or delta_inode != self._delta_inode:
+            self._file = NeighbourFile(self.path) if file_stat else None
+            self._file_stat, self._delta_inode = file_stat, delta_inode
+            self._delta_offset = 0
+            self._reset_overlay()
+        if delta_stat and delta_stat[2] > self._delta_offset:
+            self._read_delta()
+        SIMILAR_OVERLAY_ROWS.set(len(self._rows))
+
+    def _read_delta(self) -> None:
+        if self._file is None:
+            return
+        snapshot_at = self._file.meta["snapshot_at"]
+        with open(self.delta_path, "rb") as f:
+            f.seek(self._delta_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # a line still being written is read next time
+        for line in data[:end].splitlines():
+            entry = json.loads(line)
+            if entry["ts"] >= snapshot_at:
+                self._apply(entry)
+        self._delta_offset += end
+
+    def _drop_vector(self, book_id: int) -> None:
+        folded = self._vectors.pop(book_id, None)
+        if folded is not None:
+            tenant, vec = folded
+            for term in vec:
+                self._postings[f"{tenant}\t{term}"].pop(book_id, None)
+
+    def _apply(self, entry: dict) -> None:
+        book_id = entry["id"]
+        self._drop_vector(book_id)
+        if entry["op"] == "upsert":
+            tenant, vec = entry["tenant"], entry["vec"]
+            self._vectors[book_id] = (tenant, vec)
+            for term, weight in vec.items():
+                self._postings[f"{tenant}\t{term}"][book_id] = weight
+            self._removed.discard(book_id)
+        else:
+            self._removed.add(book_id)
+            self._rows.pop(book_id, None)
+        for key, row in entry["rows"].items():
+            self._rows[int(key)] = [(other, score) for other, score in row]
+
+    def _row(self, book_id: int) -> Row:
+        row = self._rows.get(book_id)
+        if row is None:
+            if self._file is None or book_id in self._removed:
+                return []
+            row = self._file.neighbours(book_id) or []
+        return row
+
+    def lookup(self, book_id: int) -> Row:
+        """Neighbours of a book, best first (empty when unknown or nothing was built)."""
+        self.refresh()
+        row = self._row(book_id)
+        removed = self._removed
+        return [item for item in row if item[0] not in removed] if removed else row
+
+    # --- folding (runs in the outbox worker) ---
+    def _vector(self, tenant: str, counts: dict[str, int]) -> dict[str, float]:
+        meta = self._file.meta
+        n = meta["tenants"].get(tenant, 0)
+        limit = _df_limit(n, meta["max_df"])
+        vec = {}
+        for term, tf in counts.items():
+            hit = self._file.postings(f"{tenant}\t{term}".encode())
+            df = hit[0] if hit else 0
+            if df <= limit:
+                vec[term] = (1 + math.log(tf)) * _idf(df, n)
+        norm = math.sqrt(sum(w * w for w in vec.values()))
+        return {term: w / norm for term, w in vec.items()} if norm else {}
+
+    def _scores(self, tenant: str, vec: dict[str, float]) -> dict[int, float]:
+        scores: dict[int, float] = defaultdict(float)
+        stale, removed = self._vectors, self._removed
+        for term, weight in vec.items():
+            key = f"{tenant}\t{term}"
+            hit = self._file.postings(key.encode())
+            if hit:
+                for other, w in zip(hit[1].tolist(), hit[2].tolist(), strict=True):
+                    if other not in stale and other not in removed:
+                        scores[other] += weight * w
+            for other, w in self._postings.get(key, {}).items():
+                scores[other] += weight * w
+        return scores
+
+    @contextmanager
+    def _folding(self):
+        """
+        Serialize folds across workers (file lock) and threads (self._lock). Rows are
+        computed from the overlay, so the refresh, the computation and the append must
+        all happen under both locks or concurrent folds overwrite each other's rows.
+        """
+        with _delta_lock(self.path), self._lock:
+            self._reload(time.monotonic())
+            yield
+
+    def _append(self, entry: dict) -> None:
+        """Append to the delta and apply it (the caller is inside _folding())."""
+        with open(self.delta_path, "a") as f:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._reload(time.monotonic())
+
+    def fold(
+        self, tenant: str, book_id: int, title: str, author: str, description: str | None, ts: float
+    ) -> bool:
+        """Fold a created/updated book into the index; False when no file has been built yet."""
+        with self._folding():
+            if self._file is None:
+                return False
+            k = self._file.k
+            vec = self._vector(tenant, terms(title, author, description))
+            scores = self._scores(tenant, vec)
+            scores.pop(book_id, None)
+            ranked = heapq.nsmallest(SIMILAR_FOLD_FANOUT, scores.items(), key=_order_key)
+            rows: dict[int, Row] = {book_id: ranked[:k]}
+            candidates = {other for other, _ in ranked}
+            for other, score in ranked:
+                current = self._row(other)
+                merged = sorted(
+                    [item for item in current if item[0] != book_id] + [(book_id, score)],
+                    key=_order_key,
+                )[:k]
+                if merged != current:
+                    rows[other] = merged
+            # rows that listed the book but no longer rank it lose it
+            for other, _ in self._row(book_id):
+                if other not in candidates:
+                    current = self._row(other)
+                    if any(item[0] == book_id for item in current):
+                        rows[other] = [item for item in current if item[0] != book_id]
+            entry = {"ts": ts, "op": "upsert", "tenant": tenant, "id": book_id, "vec": vec}
+            self._append({**entry, "rows": rows})
+            return True
+
+    def remove(self, book_id: int, ts: float) -> bool:
+        with self._folding():
+            if self._file is None:
+                return False
+            rows = {}
+            for other, _ in self._row(book_id):
+                current = self._row(other)
+                if any(item[0] == book_id for item in current):
+                    rows[other] = [item for item in current if item[0] != book_id]
+            self._append({"ts": ts, "op": "delete", "id": book_id, "rows": rows})
+            return True
+
+
+similar_index = SimilarIndex()
+SIMILAR_INDEX_AGE.set_function(
+    lambda: -1 if similar_index.built_at is None else time.time() - similar_index.built_at
+)
+
+_TEXT_FIELDS = {"title", "author", "description"}
+
+
+@registry.handler("book.*")
+def fold_book_change(message: OutboxMessage) -> None:
+    """Keep the neighbour file current between rebuilds (no-op until the first build)."""
+    payload = message.payload
+    if message.topic == "book.deleted":
+        similar_index.remove(payload["id"], message.created_at)
+    elif message.topic == "book.created" or _TEXT_FIELDS & set(payload.get("changed", ())):
+        similar_index.fold(
+            message.tenant_id,
+            payload["id"],
+            payload["title"],
+            payload["author"],
+            payload.get("description"),
+            message.created_at,
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Build or inspect the similar-books index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="full rebuild from the books table")
+    build_cmd.add_argument("--k", type=int, default=SIMILAR_K)
+    build_cmd.add_argument("--block-rows", type=int, default=SIMILAR_BLOCK_ROWS)
+    build_cmd.add_argument("--backend", choices=("auto", "numpy", "python"), default="auto")
+    show_cmd = sub.add_parser("show", help="print a book's neighbours")
+    show_cmd.add_argument("book_id", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        stats = build(k=args.k, block_rows=args.block_rows, backend=args.backend)
+        print(
+            f"[SIMILAR] {stats['books']} books in {stats['tenants']} tenants, "
+            f"{stats['backend']} backend: {stats['seconds']:.1f}s, {stats['bytes']} bytes"
+        )
+        return 0
+
+    row = similar_index.lookup(args.book_id)
+    with SessionLocal() as db:
+        titles = dict(
+            db.execute(
+                select(models.Book.id, models.Book.title).where(
+                    models.Book.id.in_([other for other, _ in row])
+                )
+            ).all()
+        )
+    for other, score in row:
+        print(f"{score:.3f}  {other:>8}  {titles.get(other, '(deleted)')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Catalog statistics (books per author, year and decade) kept in the book_stats summary table.
+
+Write handlers call record_book_change() inside their own transaction, so the
+summary is updated atomically with the book row and stays correct across
+workers. GET /books/stats then reads a handful of summary rows of the caller's
+tenant instead of running GROUP BY over the books table.
+
+Drift check / repair:
+
+    python -m app.stats            # exit code 1 when the summary disagrees with books
+    python -m app.stats --repair   # rebuild the summary from a full recompute
+"""
+
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from prometheus_client import Gauge
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal
+
+TOTAL_KEY = ("total", "")
+# the librarylite_books_total gauge re-reads the summary at most this often per worker
+BOOKS_TOTAL_CACHE_SECONDS = float(os.getenv("BOOKS_TOTAL_CACHE_SECONDS", "15"))
+UNKNOWN = "unknown"
+
+
+def _stat_keys(author: str, year: int | None) -> list[tuple[str, str]]:
+    """Summary rows a single book contributes to."""
+    if year is None:
+        return [TOTAL_KEY, ("author", author), ("year", UNKNOWN), ("decade", UNKNOWN)]
+    return [TOTAL_KEY, ("author", author), ("year", str(year)), ("decade", f"{year // 10 * 10}s")]
+
+
+def _upsert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return pg_insert(models.BookStat)
+    if dialect == "sqlite":
+        return sqlite_insert(models.BookStat)
+    raise RuntimeError(f"Unsupported database dialect for stats upsert: {dialect}")
+
+
+def record_book_change(
+    db: Session,
+    tenant_id: str,
+    old: tuple[str, int | None] | None,
+    new: tuple[str, int | None] | None,
+) -> None:
+    """Apply the summary delta for a tenant's book going from ``old`` to ``new`` (author, year).
+
+    Pass ``old=None`` for a create and ``new=None`` for a delete. Runs as a single
+    multi-row upsert in the caller's transaction; the caller commits.
+    """
+    delta: Counter[tuple[str, str]] = Counter()
+    if old is not None:
+        delta.subtract(_stat_keys(*old))
+    if new is not None:
+        delta.update(_stat_keys(*new))
+    # a fixed row order: concurrent upserts on the same rows lock them in the same
+    # order, so they queue instead of deadlocking (Postgres)
+    rows = [
+        {"tenant_id": tenant_id, "dimension": dim, "key": key, "count": change}
+        for (dim, key), change in sorted(delta.items())
+        if change
+    ]
+    if not rows:
+        return
+
+    stmt = _upsert(db).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tenant_id", "dimension", "key"],
+        set_={"count": models.BookStat.count + stmt.excluded.count},
+    )
+    db.execute(stmt)
+
+
+def read_stats(db: Session, tenant_id: str) -> dict:
+    """Return a tenant's summary as {"total", "by_author", "by_year", "by_decade"}."""
+    result: dict = {"total": 0, "by_author": {}, "by_year": {}, "by_decade": {}}
+    rows = db.query(models.BookStat).filter(
+        models.BookStat.tenant_id == tenant_id, models.BookStat.count > 0
+    )
+    for row in rows:
+        if row.dimension == "total":
+            result["total"] = row.count
+        else:
+            result[f"by_{row.dimension}"][row.key] = row.count
+    return result
+
+
+def compute_stats(db: Session) -> Counter:
+    """Full recompute from the books table (GROUP BY); used for rebuild and verification.
+
+    Keys are (tenant_id, dimension, key), matching the summary's primary key.
+    """
+    expected: Counter[tuple[str, str, str]] = Counter()
+    book = models.Book
+    grouped = db.query(book.tenant_id, book.author, book.year, func.count(book.id)).group_by(
+        book.tenant_id, book.author, book.year
+    )
+    for tenant_id, author, year, n in grouped:
+        for dim, key in _stat_keys(author, year):
+            expected[(tenant_id, dim, key)] += n
+    return expected
+
+
+def find_drift(db: Session) -> list[dict]:
+    """Compare the summary table against a full recompute; return mismatching rows."""
+    expected = compute_stats(db)
+    actual = Counter(
+        {(row.tenant_id, row.dimension, row.key): row.count for row in db.query(models.BookStat)}
+    )
+    drift = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected[key] != actual[key]:
+            tenant_id, dim, value = key
+            drift.append(
+                {
+                    "tenant_id": tenant_id,
+                    "dimension": dim,
+                    "key": value,
+                    "expected": expected[key],
+                    "actual": actual[key],
+                }
+            )
+    return drift
+
+
+def rebuild_stats(db: Session) -> None:
+    """Replace the summary table contents with a full recompute and commit."""
+    expected = compute_stats(db)
+    db.query(models.BookStat).delete()
+    db.add_all(
+        models.BookStat(tenant_id=tenant_id, dimension=dim, key=key, count=n)
+        for (tenant_id, dim, key), n in expected.items()
+    )
+    db.commit()
+
+
+def stats_stale(db: Session) -> bool:
+    """True when the summary's per-tenant totals disagree with the books table.
+
+    Catches a never-populated summary as well as books written around it; one
+    GROUP BY over the (tenant_id, id) index instead of the full recompute.
+    """
+    book, stat = models.Book, models.BookStat
+    counts = dict(db.query(book.tenant_id, func.count(book.id)).group_by(book.tenant_id).all())
+    totals = dict(
+        db.query(stat.tenant_id, stat.count).filter(
+            stat.dimension == TOTAL_KEY[0], stat.key == TOTAL_KEY[1], stat.count != 0
+        )
+    )
+    return counts != totals
+
+
+_total_cache: tuple[float, float] = (-math.inf, math.nan)  # (read at, value)
+_total_lock = threading.Lock()
+
+
+def _read_total() -> float:
+    """Gauge callback: sums one "total" row per tenant, at most every BOOKS_TOTAL_CACHE_SECONDS.
+
+    Every worker is scraped, so without the cache each scrape costs each worker a query.
+    """
+    global _total_cache
+    with _total_lock:
+        read_at, value = _total_cache
+        if time.monotonic() - read_at < BOOKS_TOTAL_CACHE_SECONDS:
+            return value
+        try:
+            with SessionLocal() as db:
+                total = (
+                    db.query(func.sum(models.BookStat.count))
+                    .filter(models.BookStat.dimension == TOTAL_KEY[0])
+                    .scalar()
+                )
+            value = float(total or 0)
+        except Exception:
+            value = math.nan
+        _total_cache = (time.monotonic(), value)
+        return value
+
+
+BOOKS_TOTAL = Gauge("librarylite_books_total", "Number of books across all tenant catalogs")
+BOOKS_TOTAL.set_function(_read_total)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Verify book_stats against the books table")
+    parser.add_argument("--repair", action="store_true", help="rebuild the summary on drift")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        drift = find_drift(db)
+        for row in drift:
+            print(
+                f"drift [{row['tenant_id']}] {row['dimension']}={row['key']!r}: "
+                f"expected={row['expected']} actual={row['actual']}"
+            )
+        if not drift:
+            print("book_stats is consistent with books")
+            return 0
+        if args.repair:
+            rebuild_stats(db)
+            print(f"book_stats rebuilt ({len(drift)} rows were off)")
+            return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+In-memory prefix index powering title/author typeahead (GET /books/suggest).
+
+Normalized titles and authors are kept in one sorted list so that a prefix
+lookup is two bisections plus a short scan, with no database round trip.
+Each tenant gets its own index, so a lookup never scans other catalogs. The
+indexes are built at startup from a streaming scan and kept current by the
+write handlers in app/routers/books.py. Each worker process holds its own copy,
+so writes handled by other workers only show up after the next full rebuild,
+every SUGGEST_REBUILD_INTERVAL seconds in the background.
+
+A write is an insert or delete in the sorted keys and refs: O(n) element
+moves, about 2 ms at a million titles (benchmarks/bench_suggest.py). That is
+fine for catalog edits, not for bulk loads, which should rebuild instead.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from prometheus_client import Gauge
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal
+
+SUGGEST_REBUILD_INTERVAL = float(os.getenv("SUGGEST_REBUILD_INTERVAL", "300"))
+
+FIELD_TITLE = 0
+FIELD_AUTHOR = 1
+FIELD_NAMES = ("title", "author")
+
+# Upper sentinel appended to a prefix to find the end of its range
+_PREFIX_END = "\U0010ffff"
+
+SUGGEST_INDEX_BYTES = Gauge(
+    "librarylite_suggest_index_bytes",
+    "Approximate memory used by the in-memory typeahead prefix index",
+)
+SUGGEST_INDEX_ENTRIES = Gauge(
+    "librarylite_suggest_index_entries",
+    "Number of keys stored in the in-memory typeahead prefix index",
+)
+
+
+def normalize(text: str) -> str:
+    """Casefold, strip accents and collapse whitespace for prefix matching."""
+    if text.isascii():
+        return " ".join(text.lower().split())
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def _display_size(title: str, author: str) -> int:
+    return sys.getsizeof((title, author)) + sys.getsizeof(title) + sys.getsizeof(author)
+
+
+class PrefixIndex:
+    """Sorted array of normalized keys with packed (book id, field) references.
+
+    ``_keys`` and ``_refs`` are parallel: ``_refs[i]`` is ``book_id * 2 + field``
+    for the key at ``_keys[i]``. Display values live in ``_books``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._keys: list[str] = []
+        self._refs = array("q")
+        self._books: dict[int, tuple[str, str]] = {}
+        self._key_bytes = 0
+        self._display_bytes = 0
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def build(self, rows) -> None:
+        """Replace the index contents from an iterable of (id, title, author)."""
+        entries: list[tuple[str, int]] = []
+        books: dict[int, tuple[str, str]] = {}
+        for book_id, title, author in rows:
+            books[book_id] = (title, author)
+            entries.append((normalize(title), book_id * 2 + FIELD_TITLE))
+            entries.append((normalize(author), book_id * 2 + FIELD_AUTHOR))
+        entries.sort()
+
+        keys = [key for key, _ in entries]
+        refs = array("q", (ref for _, ref in entries))
+        key_bytes = sum(sys.getsizeof(k) for k in keys)
+        display_bytes = sum(_display_size(title, author) for title, author in books.values())
+
+        with self._lock:
+            self._keys = keys
+            self._refs = refs
+            self._books = books
+            self._key_bytes = key_bytes
+            self._display_bytes = display_bytes
+            self.ready = True
+
+    def add(self, book_id: int, title: str, author: str) -> None:
+        """Index a newly created book."""
+        with self._lock:
+            self._insert(book_id, title, author)
+
+    def update(self, book_id: int, title: str, author: str) -> None:
+        """Re-index a book whose title or author may have changed."""
+        with self._lock:
+            if self._books.get(book_id) == (title, author):
+                return
+            self._delete(book_id)
+            self._insert(book_id, title, author)
+
+    def remove(self, book_id: int) -> None:
+        """Drop a deleted book from the index."""
+        with self._lock:
+            self._delete(book_id)
+
+    def search(self, prefix: str, limit: int = 10) -> list[dict]:
+        """Return up to ``limit`` distinct books whose title or author starts with prefix."""
+        needle = normalize(prefix)
+        if not needle:
+            return []
+
+        results: list[dict] = []
+        seen: set[int] = set()
+        with self._lock:
+            keys = self._keys
+            lo = bisect_left(keys, needle)
+            hi = bisect_left(keys, needle + _PREFIX_END, lo)
+            for i in range(lo, hi):
+                ref = self._refs[i]
+                book_id = ref >> 1
+                if book_id in seen:
+                    continue
+                seen.add(book_id)
+                title, author = self._books[book_id]
+                results.append(
+                    {
+                        "id": book_id,
+                        "title": title,
+                        "author": author,
+                        "match": FIELD_NAMES[ref & 1],
+                    }
+                )
+                if len(results) >= limit:
+                    break
+        return results
+
+    def memory_bytes(self) -> int:
+        """Approximate footprint: key strings, list/array storage and display values."""
+        return (
+            self._key_bytes
+            + self._display_bytes
+            + sys.getsizeof(self._keys)
+            + self._refs.itemsize * len(self._refs)
+            + sys.getsizeof(self._books)
+        )
+
+    # --- internal helpers (caller holds the lock) ---
+    def _insert(self, book_id: int, title: str, author: str) -> None:
+        self._books[book_id] = (title, author)
+        self._display_bytes += _display_size(title, author)
+        for field, value in ((FIELD_TITLE, title), (FIELD_AUTHOR, author)):
+            key = normalize(value)
+            ref = book_id * 2 + field
+            pos = bisect_left(self._keys, key)
+            # keep equal keys ordered by ref so results stay deterministic
+            while pos < len(self._keys) and self._keys[pos] == key and self._refs[pos] < ref:
+                pos += 1
+            self._keys.insert(pos, key)
+            self._refs.insert(pos, ref)
+            self._key_bytes += sys.getsizeof(key)
+
+    def _delete(self, book_id: int) -> None:
+        current = self._books.pop(book_id, None)
+        if current is None:
+            return
+        title, author = current
+        self._display_bytes -= _display_size(title, author)
+        for field, value in ((FIELD_TITLE, title), (FIELD_AUTHOR, author)):
+            key = normalize(value)
+            ref = book_id * 2 + field
+            pos = bisect_left(self._keys, key)
+            while pos < len(self._keys) and self._keys[pos] == key:
+                if self._refs[pos] == ref:
+                    del self._keys[pos]
+                    del self._refs[pos]
+                    self._key_bytes -= sys.getsizeof(key)
+                    break
+                pos += 1
+
+
+class TenantSuggestIndex:
+    """One PrefixIndex per tenant; publishes the combined size metrics.
+
+    Writes made while a rebuild scans the table are journaled and replayed onto
+    the new indexes before they replace the old ones, so none is lost.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._indexes: dict[str, PrefixIndex] = {}
+        self._journal: list[tuple] | None = None
+        self.ready = False
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in list(self._indexes.values()))
+
+    def build(self, rows) -> None:
+        """Replace all indexes from an iterable of (tenant_id, id, title, author)."""
+        with self._lock:
+            self._journal = []
+        grouped: dict[str, list[tuple[int, str, str]]] = {}
+        for tenant_id, book_id, title, author in rows:
+            grouped.setdefault(tenant_id, []).append((book_id, title, author))
+        indexes = {}
+        for tenant_id, books in grouped.items():
+            indexes[tenant_id] = PrefixIndex()
+            indexes[tenant_id].build(books)
+        with self._lock:
+            for tenant_id, book_id, *book in self._journal:
+                index = indexes.setdefault(tenant_id, PrefixIndex())
+                if book:
+                    index.update(book_id, *book)
+                else:
+                    index.remove(book_id)
+            self._journal = None
+            self._indexes = indexes
+            self.ready = True
+        self._publish_metrics()
+
+    def add(self, tenant_id: str, book_id: int, title: str, author: str) -> None:
+        self.update(tenant_id, book_id, title, author)
+
+    def update(self, tenant_id: str, book_id: int, title: str, author: str) -> None:
+        with self._lock:
+            self._tenant(tenant_id).update(book_id, title, author)
+            if self._journal is not None:
+                self._journal.append((tenant_id, book_id, title, author))
+        self._publish_metrics()
+
+    def remove(self, tenant_id: str, book_id: int) -> None:
+        with self._lock:
+            index = self._indexes.get(tenant_id)
+            if index is not None:
+                index.remove(book_id)
+            if self._journal is not None:
+                self._journal.append((tenant_id, book_id))
+        self._publish_metrics()
+
+    def search(self, tenant_id: str, prefix: str, limit: int = 10) -> list[dict]:
+        index = self._indexes.get(tenant_id)
+        return [] if index is None else index.search(prefix, limit)
+
+    def memory_bytes(self) -> int:
+        return sum(index.memory_bytes() for index in list(self._indexes.values()))
+
+    def _tenant(self, tenant_id: str) -> PrefixIndex:
+        # caller holds the lock
+        index = self._indexes.get(tenant_id)
+        if index is None:
+            index = self._indexes[tenant_id] = PrefixIndex()
+        return index
+
+    def _publish_metrics(self) -> None:
+        SUGGEST_INDEX_BYTES.set(self.memory_bytes())
+        SUGGEST_INDEX_ENTRIES.set(len(self))
+
+
+suggest_index = TenantSuggestIndex()
+
+
+def build_suggest_index(db: Session, batch_size: int = 5000) -> TenantSuggestIndex:
+    """Populate the shared indexes from a streaming scan of the books table."""
+    book = models.Book
+    rows = db.query(book.tenant_id, book.id, book.title, book.author).yield_per(batch_size)
+    suggest_index.build((row.tenant_id, row.id, row.title, row.author) for row in rows)
+    return suggest_index
+
+
+async def run_rebuild_loop(interval: float = SUGGEST_REBUILD_INTERVAL):
+    """Background task: rebuild every ``interval`` seconds to pick up other workers' writes."""
+
+    def rebuild() -> int:
+        with SessionLocal() as db:
+            return len(build_suggest_index(db))
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            started = time.perf_counter()
+            keys = await asyncio.to_thread(rebuild)
+            print(f"[SUGGEST] Rebuilt {keys} keys in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            print(f"[SUGGEST] Rebuild failed: {e}")
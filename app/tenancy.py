@@ -0,0 +1,136 @@
+"""
+Multi-tenancy: several libraries share one deployment.
+
+Books, users and catalog stats carry a ``tenant_id``. Authenticated requests
+take the tenant from the JWT ``tid`` claim (set at login from the user's row),
+so a token only ever reads or writes its own catalog. Anonymous requests take
+it from the X-Tenant header, set by the reverse proxy per library hostname,
+falling back to DEFAULT_TENANT.
+
+Storage: books are indexed by (tenant_id, id). On Postgres the table is
+created hash-partitioned by tenant_id (TENANT_PARTITIONS partitions), so one
+tenant's queries are pruned to a single partition and its smaller indexes.
+
+Per-tenant metrics go through tenant_label(): the first
+TENANT_METRICS_MAX_LABELS tenants seen keep their own label, later ones are
+reported as "other", which bounds the number of series.
+"""
+
+import os
+import re
+import threading
+import time
+
+from fastapi import Depends, HTTPException, Request
+from prometheus_client import Counter, Histogram
+from sqlalchemy import Table, inspect
+from sqlalchemy.engine import Connection, Dialect
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from app.auth import TENANT_CLAIM, get_token_claims
+from app.config import settings
+
+DEFAULT_TENANT = settings.DEFAULT_TENANT
+TENANT_HEADER = "x-tenant"
+TENANT_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+TENANT_PARTITIONS = int(os.getenv("TENANT_PARTITIONS", "8"))
+TENANT_METRICS_MAX_LABELS = int(os.getenv("TENANT_METRICS_MAX_LABELS", "20"))
+OTHER_TENANTS = "other"
+
+TENANT_REQUESTS = Counter(
+    "librarylite_tenant_requests_total", "Requests per tenant (bounded label set)", ["tenant"]
+)
+TENANT_REQUEST_SECONDS = Histogram(
+    "librarylite_tenant_request_duration_seconds",
+    "Request latency per tenant (bounded label set)",
+    ["tenant"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+_labelled: set[str] = set()
+_label_lock = threading.Lock()
+
+
+async def get_tenant(request: Request, claims: dict | None = Depends(get_token_claims)) -> str:
+    """FastAPI dependency resolving the tenant every books query is scoped to."""
+    header = request.headers.get(TENANT_HEADER)
+    if claims is not None:
+        tenant = claims.get(TENANT_CLAIM) or DEFAULT_TENANT  # tokens issued before tenancy
+        if header and header != tenant:
+            raise HTTPException(status_code=403, detail="Token belongs to another tenant")
+    else:
+        tenant = header or DEFAULT_TENANT
+        if not TENANT_ID_RE.match(tenant):
+            raise HTTPException(status_code=400, detail="Invalid tenant")
+    # read back by TenantMetricsMiddleware once the response is sent
+    request.state.tenant_id = tenant
+    return tenant
+
+
+def tenant_label(tenant: str) -> str:
+    """Metrics label for a tenant: itself for the first N tenants seen, "other" afterwards."""
+    if tenant in _labelled:
+        return tenant
+    with _label_lock:
+        if tenant in _labelled or len(_labelled) < TENANT_METRICS_MAX_LABELS:
+            _labelled.add(tenant)
+            return tenant
+    return OTHER_TENANTS
+
+
+class TenantMetricsMiddleware:
+    """Pure ASGI middleware recording request count/latency for requests that resolved a tenant."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        state = scope.setdefault("state", {})
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            tenant = state.get("tenant_id")
+            if tenant is not None:
+                label = tenant_label(tenant)
+                TENANT_REQUESTS.labels(label).inc()
+                TENANT_REQUEST_SECONDS.labels(label).observe(time.perf_counter() - start)
+
+
+def partition_ddl(table: Table, dialect: Dialect, partitions: int = TENANT_PARTITIONS) -> list[str]:
+    """Postgres DDL creating ``table`` hash-partitioned by tenant_id, with its indexes.
+
+    Partitioned tables need the partition key in the primary key, so the PK
+    becomes (tenant_id, <model PK>) and the model's (tenant_id, id) index is
+    covered by it.
+    """
+    pk_columns = ["tenant_id"] + [c.name for c in table.primary_key if c.name != "tenant_id"]
+    columns = [str(CreateColumn(column).compile(dialect=dialect)) for column in table.columns]
+    body = ",\n  ".join([*columns, f"PRIMARY KEY ({', '.join(pk_columns)})"])
+    statements = [f"CREATE TABLE {table.name} (\n  {body}\n) PARTITION BY HASH (tenant_id)"]
+    statements += [
+        f"CREATE TABLE {table.name}_p{i} PARTITION OF {table.name} "
+        f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})"
+        for i in range(partitions)
+    ]
+    for index in sorted(table.indexes, key=lambda ix: ix.name):
+        if [c.name for c in index.columns] == pk_columns:
+            continue
+        # created on the parent, Postgres builds it on every partition
+        statements.append(str(CreateIndex(index).compile(dialect=dialect)))
+    return statements
+
+
+def create_partitioned_table(conn: Connection, table: Table) -> bool:
+    """On Postgres, create ``table`` partitioned by tenant if it doesn't exist yet.
+
+    Returns False (and does nothing) on other databases or when the table exists;
+    elsewhere create_all creates it as a plain table.
+    """
+    if conn.dialect.name != "postgresql" or inspect(conn).has_table(table.name):
+        return False
+    for statement in partition_ddl(table, conn.dialect):
+        conn.exec_driver_sql(statement)
+    return True
@@ -0,0 +1,127 @@
+"""
+Benchmark: audit log cost on the request path and sink throughput.
+
+  * record():   what a handler pays per event (buffer append only)
+  * flush:      events/s written by the file sink per AUDIT_FSYNC policy,
+                compressed bytes per event, and the same for the database sink
+                compared with one INSERT + COMMIT per event
+  * query:      one hour out of a day of segments, showing that segments
+                outside the range are skipped by name
+
+    python -m benchmarks.bench_audit --events 200000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import audit, models
+from app.audit import AuditLog, DatabaseSink, FileSink
+
+
+class NullSink:
+    def write(self, events: list[dict]) -> None:
+        return None
+
+    def close(self) -> None:
+        return None
+
+
+def fill(log: AuditLog, n: int, start_ts: float | None = None, step: float = 0.0) -> None:
+    for i in range(n):
+        log.record("book.updated", f"user{i % 100}", "default", i, changed=["year"])
+        if start_ts is not None:
+            log._buffer[-1]["ts"] = start_ts + i * step
+
+
+def bench_record(n: int) -> None:
+    log = AuditLog(NullSink(), buffer_max=n + 1)
+    start = time.perf_counter()
+    fill(log, n)
+    elapsed = time.perf_counter() - start
+    print(f"record():            {elapsed / n * 1e9:8.0f} ns/event")
+
+
+def bench_file(n: int, tmp: str) -> None:
+    for policy in ("flush", "interval", "rotate"):
+        directory = os.path.join(tmp, policy)
+        log = AuditLog(FileSink(directory, fsync=policy), buffer_max=n + 1, flush_batch=1000)
+        fill(log, n)
+        start = time.perf_counter()
+        log.flush()
+        log.sink.close()
+        elapsed = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        print(
+            f"file sink ({policy:>8}): {n / elapsed:10,.0f} events/s  {size / n:5.1f} bytes/event"
+        )
+
+
+def bench_database(n: int, tmp: str) -> None:
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'audit.db')}")
+    models.Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    log = AuditLog(DatabaseSink(session_factory), buffer_max=n + 1, flush_batch=1000)
+    fill(log, n)
+    start = time.perf_counter()
+    log.flush()
+    elapsed = time.perf_counter() - start
+    print(f"database sink:       {n / elapsed:10,.0f} events/s")
+
+    rows = min(n, 2000)
+    start = time.perf_counter()
+    for _ in range(rows):
+        with session_factory() as db:
+            db.execute(
+                insert(models.AuditRecord),
+                {"ts": time.time(), "tenant_id": "default", "action": "book.updated"},
+            )
+            db.commit()
+    elapsed = time.perf_counter() - start
+    print(f"row per request:     {rows / elapsed:10,.0f} events/s")
+    engine.dispose()
+
+
+def bench_query(n: int, tmp: str) -> None:
+    directory = os.path.join(tmp, "query")
+    day = 86_400
+    # a day of events in hourly segments
+    sink = FileSink(directory, fsync="rotate")
+    log = AuditLog(sink, buffer_max=n + 1, flush_batch=n + 1)
+    per_hour = max(1, n // 24)
+    for hour in range(24):
+        fill(log, per_hour, start_ts=1_700_000_000 + hour * 3600, step=3600 / per_hour)
+        log.flush()
+        sink.close()
+
+    start = time.perf_counter()
+    hits = sum(
+        1 for _ in audit.query(directory, 1_700_000_000 + 12 * 3600, 1_700_000_000 + 13 * 3600)
+    )
+    elapsed = time.perf_counter() - start
+    full_start = time.perf_counter()
+    total = sum(1 for _ in audit.query(directory, 1_700_000_000, 1_700_000_000 + day))
+    full = time.perf_counter() - full_start
+    print(f"query 1h of 24h:     {elapsed * 1000:8.1f} ms ({hits:,} events)")
+    print(f"query 24h:           {full * 1000:8.1f} ms ({total:,} events)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_record(args.events)
+        bench_file(args.events, tmp)
+        bench_database(args.events, tmp)
+        bench_query(args.events, tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: database work per registration and login, old vs current code path.
+
+Runs against a throwaway SQLite database with the app's schema. Password
+hashing is excluded (a fixed hash is used) so only DB time is compared:
+
+  * legacy register: SELECT by username, SELECT by email, INSERT, COMMIT, refresh SELECT
+  * register:        one INSERT ... RETURNING, COMMIT (duplicates come back as IntegrityError)
+  * legacy login:    full User row by exact email
+  * login:           three columns by lower(email) through the functional index
+
+Point --url at a Postgres database to include real network round trips.
+
+    python -m benchmarks.bench_auth --users 2000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from app import models
+from app.routers.auth import find_login_user, insert_user
+
+FAKE_HASH = "$2b$12$" + "x" * 53
+
+
+def legacy_register(db: Session, username: str, email: str):
+    if db.query(models.User).filter(models.User.username == username).first():
+        raise ValueError("Username already exists")
+    if db.query(models.User).filter(models.User.email == email).first():
+        raise ValueError("Email already exists")
+    user = models.User(username=username, email=email, hashed_password=FAKE_HASH)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def legacy_login(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+
+def run(engine, label: str, fn, args_list: list[tuple]) -> None:
+    statements = commits = 0
+
+    def on_execute(*_):
+        nonlocal statements
+        statements += 1
+
+    def on_commit(*_):
+        nonlocal commits
+        commits += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    event.listen(engine, "commit", on_commit)
+    try:
+        with Session(engine) as db:
+            start = time.perf_counter()
+            for args in args_list:
+                fn(db, *args)
+                db.expunge_all()
+            elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+        event.remove(engine, "commit", on_commit)
+    n = len(args_list)
+    print(
+        f"{label:>16}: {elapsed / n * 1e6:8.1f} us/op  "
+        f"{statements / n:.1f} statements/op  {commits / n:.1f} commits/op"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--url", default=None, help="database URL (default: temp SQLite file)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.url or f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(engine)
+        n = args.users
+
+        run(
+            engine,
+            "legacy register",
+            legacy_register,
+            [(f"old{i}", f"old{i}@x.io") for i in range(n)],
+        )
+        run(
+            engine,
+            "register",
+            insert_user,
+            [("default", f"new{i}", f"new{i}@x.io", FAKE_HASH) for i in range(n)],
+        )
+        run(engine, "legacy login", legacy_login, [(f"old{i}@x.io",) for i in range(n)])
+        run(engine, "login", find_login_user, [(f"New{i}@X.io",) for i in range(n)])
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
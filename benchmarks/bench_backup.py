@@ -0,0 +1,136 @@
+"""
+Benchmark: app.backup / app.restore throughput.
+
+Fills a throwaway SQLite database with --rows books (a few tenants, some with
+ISBN, page count and subjects) and --rows / 20 users, backs it up, restores
+the backup into a second empty database and reports rows/s and bytes for each
+step. For comparison it also times the ORM path (Session.add_all, as init_db
+inserts rows) on an --orm-sample of books and projects it to --rows.
+
+    python -m benchmarks.bench_backup --rows 10000000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import Session
+
+from app import backup, models, restore
+
+
+def _engine(path: str):
+    return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+
+def fill(engine, books: int, users: int, batch: int = 50_000) -> None:
+    rnd = random.Random(7)
+    with engine.begin() as conn:
+        for start in range(0, books, batch):
+            rows = []
+            for i in range(start, min(start + batch, books)):
+                enriched = rnd.random() < 0.3
+                rows.append(
+                    {
+                        "tenant_id": f"library-{i % 8}",
+                        "title": f"Title {i} of the collection",
+                        "author": f"Author {rnd.randrange(50_000)}",
+                        "description": "A description of moderate length." if i % 4 == 0 else None,
+                        "year": None if i % 20 == 0 else rnd.randint(1900, 2025),
+                        "isbn": f"978{i:010d}" if enriched else None,
+                        "page_count": rnd.randint(80, 900) if enriched else None,
+                        "subjects": ["Fiction", f"Subject {i % 300}"] if enriched else None,
+                        "enriched_at": 1_760_000_000.0 + i if enriched else None,
+                    }
+                )
+            conn.execute(insert(models.Book), rows)
+        for start in range(0, users, batch):
+            conn.execute(
+                insert(models.User),
+                [
+                    {
+                        "tenant_id": f"library-{i % 8}",
+                        "username": f"user{i}",
+                        "email": f"user{i}@example.org",
+                        "hashed_password": "$2b$12$" + "x" * 53,
+                    }
+                    for i in range(start, min(start + batch, users))
+                ],
+            )
+
+
+def orm_rows_per_second(engine, count: int) -> float:
+    started = time.perf_counter()
+    with Session(engine) as session:
+        session.add_all(
+            models.Book(tenant_id="orm", title=f"ORM {i}", author="Someone", year=2000)
+            for i in range(count)
+        )
+        session.commit()
+    return count / (time.perf_counter() - started)
+
+
+def _size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--jobs", type=int, default=restore.RESTORE_JOBS)
+    parser.add_argument("--segment-rows", type=int, default=backup.BACKUP_SEGMENT_ROWS)
+    parser.add_argument("--level", type=int, default=backup.BACKUP_COMPRESS_LEVEL)
+    parser.add_argument("--orm-sample", type=int, default=100_000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="librarylite-bench-backup-")
+    try:
+        source = _engine(os.path.join(tmp, "source.db"))
+        models.Base.metadata.create_all(source)
+        started = time.perf_counter()
+        fill(source, args.rows, args.rows // 20)
+        total = args.rows + args.rows // 20
+        db_bytes = os.path.getsize(os.path.join(tmp, "source.db"))
+        print(
+            f"filled {total} rows ({db_bytes / 2**20:.0f} MiB) "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        directory = os.path.join(tmp, "backup")
+        started = time.perf_counter()
+        backup.backup(
+            directory, source, segment_rows=args.segment_rows, level=args.level, jobs=args.jobs
+        )
+        elapsed = time.perf_counter() - started
+        written = _size(directory)
+        print(
+            f"backup: {elapsed:.1f}s, {total / elapsed:,.0f} rows/s, "
+            f"{written / 2**20:.0f} MiB written ({db_bytes / max(written, 1):.1f}x smaller)"
+        )
+
+        target = _engine(os.path.join(tmp, "target.db"))
+        started = time.perf_counter()
+        restored = restore.restore(directory, target, jobs=args.jobs)
+        elapsed = time.perf_counter() - started
+        print(f"restore: {elapsed:.1f}s, {sum(restored.values()) / elapsed:,.0f} rows/s")
+        with source.connect() as a, target.connect() as b:
+            count = select(func.count()).select_from(models.Book)
+            assert a.execute(count).scalar() == b.execute(count).scalar()
+        target.dispose()
+
+        scratch = _engine(os.path.join(tmp, "orm.db"))
+        models.Base.metadata.create_all(scratch)
+        rate = orm_rows_per_second(scratch, args.orm_sample)
+        print(f"ORM inserts: {rate:,.0f} rows/s, {total / rate:.0f}s projected for {total} rows")
+        scratch.dispose()
+        source.dispose()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Overhead of ProfilingMiddleware on requests that are *not* profiled.
+
+Drives a trivial ASGI app directly (no sockets) with and without the
+middleware and reports the per-request difference. Exits non-zero when the
+overhead exceeds --max-overhead-ns, so it can gate a change to the middleware.
+
+    python -m benchmarks.bench_profiling --requests 200000 --max-overhead-ns 2000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from app.profiling import ProfilingMiddleware
+
+HEADERS = [
+    (b"host", b"localhost"),
+    (b"user-agent", b"bench"),
+    (b"accept", b"application/json"),
+    (b"authorization", b"Bearer not-an-admin-token"),
+]
+
+
+async def trivial_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    return None
+
+
+async def drive(app, n: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/books/", "headers": HEADERS}
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(scope, receive, send)
+    return time.perf_counter() - start
+
+
+async def run(n: int) -> float:
+    wrapped = ProfilingMiddleware(trivial_app, sample_rate=0.0)
+    await drive(trivial_app, n // 10)  # warm-up
+    await drive(wrapped, n // 10)
+
+    bare = await drive(trivial_app, n)
+    with_mw = await drive(wrapped, n)
+    overhead_ns = (with_mw - bare) / n * 1e9
+    print(f"bare:       {bare / n * 1e9:8.0f} ns/request")
+    print(f"middleware: {with_mw / n * 1e9:8.0f} ns/request")
+    print(f"overhead:   {overhead_ns:8.0f} ns/request (profiling disabled)")
+    return overhead_ns
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--max-overhead-ns", type=float, default=2000.0)
+    args = parser.parse_args()
+    overhead_ns = asyncio.run(run(args.requests))
+    if overhead_ns > args.max_overhead_ns:
+        print(f"FAIL: overhead above {args.max_overhead_ns:.0f} ns/request")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Benchmark: filtered GET /books/ listings from the columnar read model vs SQL.
+
+Fills a throwaway SQLite database with --books synthetic books for one tenant,
+loads the read model (app/readmodel.py, needs NumPy) and reports load time,
+its memory (the model's own estimate and the process RSS growth) and, for a
+mix of filters, latency percentiles of the read model's query against the
+books router's SQL query (_query_books) on the same data. Both return what
+the endpoint serializes: dicts from the read model, ORM objects from SQL.
+
+    python -m benchmarks.bench_readmodel --books 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import models, readmodel
+from app.memory import rss_bytes
+from app.readmodel import BookQuery
+from app.routers.books import _query_books
+
+TENANT = "bench"
+WORDS = [
+    "secret", "garden", "war", "peace", "night", "city", "river", "stone", "house", "winter",
+    "summer", "shadow", "light", "empire", "ocean", "mountain", "letters", "journey", "dream",
+    "history", "modern", "art", "song", "island", "forest", "machine", "silent", "golden",
+]  # fmt: skip
+
+QUERIES = {
+    "author": BookQuery(author="author 4242", limit=50),
+    "year range": BookQuery(year_min=1990, year_max=1995, limit=50),
+    "title, rare": BookQuery(title="zephyr", limit=50),
+    "title, common": BookQuery(title="garden", limit=50),
+    "title + years, by year": BookQuery(title="night", year_min=1950, sort="-year", limit=50),
+    "author, by title": BookQuery(author="author 17", sort="title", limit=50),
+    "page 200, by year": BookQuery(sort="year", limit=50, offset=10_000),
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def fill(engine, count: int, batch: int = 50_000) -> None:
+    rnd = random.Random(42)
+    with engine.begin() as conn:
+        for start in range(0, count, batch):
+            rows = []
+            for i in range(start, min(start + batch, count)):
+                title = " ".join(rnd.choices(WORDS, k=rnd.randint(2, 4))).title()
+                if rnd.random() < 0.0005:
+                    title += " Zephyr"
+                rows.append(
+                    {
+                        "tenant_id": TENANT,
+                        "title": f"{title} {i}" if rnd.random() < 0.7 else title,
+                        "author": f"author {rnd.randrange(50_000)}",
+                        "year": None if rnd.random() < 0.05 else rnd.randint(1900, 2025),
+                        "description": (
+                            " ".join(rnd.choices(WORDS, k=12)) if rnd.random() < 0.3 else None
+                        ),
+                    }
+                )
+            conn.execute(insert(models.Book), rows)
+
+
+def timed(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    if readmodel.np is None:
+        raise SystemExit("the read model needs numpy: pip install numpy")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'books.db')}")
+        models.Base.metadata.create_all(engine)
+        factory = sessionmaker(bind=engine)
+        started = time.perf_counter()
+        fill(engine, args.books)
+        print(f"filled {args.books} books in {time.perf_counter() - started:.1f}s")
+
+        model = readmodel.BooksReadModel(enabled=True)
+        rss_before = rss_bytes()
+        started = time.perf_counter()
+        model.load(factory)
+        load_s = time.perf_counter() - started
+        per_million = 1_000_000 / max(args.books, 1)
+        print(
+            f"load: {load_s:.1f}s  model estimate {model.memory_bytes() / 2**20:.0f} MiB"
+            f" ({model.memory_bytes() * per_million / 2**20:.0f} MiB per 1M books),"
+            f" RSS +{(rss_bytes() - rss_before) / 2**20:.0f} MiB"
+        )
+
+        print(f"{'query':<24} {'matches':>8} {'model p50/p99 ms':>18} {'SQL p50/p99 ms':>18}")
+        with factory() as db:
+            for name, q in QUERIES.items():
+                unpaged = BookQuery(q.author, q.title, q.year_min, q.year_max, q.sort)
+                matches = len(model.query(TENANT, unpaged)[0])
+                fast = timed(lambda q=q: model.query(TENANT, q), args.repeat)
+                slow = timed(lambda q=q: _query_books(db, TENANT, q), max(3, args.repeat // 4))
+                db.expunge_all()
+                print(
+                    f"{name:<24} {matches:>8} "
+                    f"{statistics.median(fast):>9.2f}/{percentile(fast, 0.99):<8.2f} "
+                    f"{statistics.median(slow):>9.2f}/{percentile(slow, 0.99):<8.2f}"
+                )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
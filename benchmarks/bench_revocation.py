@@ -0,0 +1,64 @@
+"""
+Per-request cost of the token revocation check in get_current_user.
+
+Reports the bare store lookup (miss and hit) with many revoked tokens, and
+verify_token with and without the revocation check.
+
+    python -m benchmarks.bench_revocation --revoked 100000
+"""
+
+import argparse
+import time
+import uuid
+from unittest import mock
+
+from app import auth
+from app.revocation import MemoryBackend, RevocationStore
+
+
+def per_call_ns(fn, args_list) -> float:
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--revoked", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    store = RevocationStore(MemoryBackend(), capacity=args.revoked)
+    exp = int(time.time()) + 3600
+    revoked = [uuid.uuid4().hex for _ in range(args.revoked)]
+    for jti in revoked:
+        store.revoke(jti, exp)
+
+    misses = [(uuid.uuid4().hex,) for _ in range(args.lookups)]
+    hits = [(revoked[i % len(revoked)],) for i in range(args.lookups)]
+    false_positives = sum(store._bloom.__contains__(jti) for (jti,) in misses)
+
+    print(
+        f"revoked entries: {len(store)}, bloom bits: {store._bloom.size}, k={store._bloom.hashes}"
+    )
+    miss_ns = per_call_ns(store.is_revoked, misses)
+    print(f"is_revoked miss: {miss_ns:7.0f} ns")
+    print(f"is_revoked hit:  {per_call_ns(store.is_revoked, hits):7.0f} ns")
+    print(f"bloom false positive rate: {false_positives / len(misses):.4%}")
+
+    tokens = [(auth.create_access_token({"sub": "bench"}),) for _ in range(5_000)]
+    with_check, without_check = float("inf"), float("inf")
+    for _ in range(3):  # interleave and keep the best run to damp noise
+        with_check = min(with_check, per_call_ns(auth.verify_token, tokens))
+        with mock.patch.object(auth.revocation_store, "is_revoked", lambda jti: False):
+            without_check = min(without_check, per_call_ns(auth.verify_token, tokens))
+    print(f"verify_token with check:    {with_check:9.0f} ns")
+    print(f"verify_token without check: {without_check:9.0f} ns")
+    # the end-to-end difference is within run-to-run noise of the JWT decode, so the
+    # per-request overhead is reported as the miss lookup relative to verify_token
+    print(f"added per request (miss):   {miss_ns:9.0f} ns ({miss_ns / without_check:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark for the "similar books" neighbour file (app/similar.py).
+
+Builds the file from a synthetic catalog (no database needed): words drawn
+from a Zipf-distributed vocabulary, --books spread over --tenants libraries.
+Reports build time split into vectorize / neighbours / write, file size,
+lookup latency percentiles through SimilarIndex (the path the endpoint uses)
+and the cost of folding a changed book in.
+
+    python -m benchmarks.bench_similar --books 1000000
+    python -m benchmarks.bench_similar --books 50000 --backend python
+
+The numpy backend uses NumPy and SciPy from requirements.txt. Neighbour computation is
+exact all-pairs within a tenant, so it grows with the square of the largest
+tenant; --block-rows trades peak memory for fewer, larger products.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app import similar
+
+VOCABULARY = 50_000
+AUTHORS = 20_000
+
+
+def synthetic_rows(n: int, tenants: int, seed: int = 42):
+    rnd = random.Random(seed)
+    words = [f"w{rank}" for rank in range(VOCABULARY)]
+    cum_weights, total = [], 0.0
+    for rank in range(VOCABULARY):
+        total += 1 / (rank + 1) ** 1.07
+        cum_weights.append(total)
+    per_tenant = -(-n // tenants)
+    book_id = 0
+    for t in range(tenants):
+        for _ in range(min(per_tenant, n - book_id)):
+            book_id += 1
+            title = " ".join(rnd.choices(words, cum_weights=cum_weights, k=rnd.randint(2, 6)))
+            description = " ".join(
+                rnd.choices(words, cum_weights=cum_weights, k=rnd.randint(0, 30))
+            )
+            author = f"author {rnd.randrange(AUTHORS)}"
+            yield f"lib-{t:03d}", book_id, title, author, description
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--k", type=int, default=similar.SIMILAR_K)
+    parser.add_argument("--block-rows", type=int, default=similar.SIMILAR_BLOCK_ROWS)
+    parser.add_argument("--backend", choices=["auto", "numpy", "python"], default="auto")
+    parser.add_argument("--lookups", type=int, default=50_000)
+    parser.add_argument("--folds", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "neighbours.bin")
+        stats = similar.build_from_rows(
+            synthetic_rows(args.books, args.tenants),
+            path,
+            k=args.k,
+            block_rows=args.block_rows,
+            backend=args.backend,
+        )
+        print(
+            f"build ({stats['backend']}): {stats['books']} books, {stats['tenants']} tenants "
+            f"in {stats['seconds']:.1f}s  (vectorize {stats['vectorize_seconds']:.1f}s, "
+            f"neighbours {stats['neighbours_seconds']:.1f}s, write {stats['write_seconds']:.1f}s)"
+        )
+        print(
+            f"file: {stats['bytes'] / 1024 / 1024:.1f} MiB "
+            f"({stats['bytes'] / max(stats['books'], 1):.0f} bytes/book)"
+        )
+
+        index = similar.SimilarIndex(path)
+        rnd = random.Random(7)
+        ids = [rnd.randint(1, args.books) for _ in range(args.lookups)]
+        latencies_us: list[float] = []
+        for book_id in ids:
+            start = time.perf_counter()
+            index.lookup(book_id)
+            latencies_us.append((time.perf_counter() - start) * 1e6)
+        print(
+            f"lookup (k={args.k}): p50={statistics.median(latencies_us):.1f}us "
+            f"p99={percentile(latencies_us, 0.99):.1f}us"
+        )
+
+        fold_ms: list[float] = []
+        for _, book_id, title, author, description in synthetic_rows(args.folds, 1, seed=99):
+            start = time.perf_counter()
+            index.fold("lib-000", args.books + book_id, title, author, description, time.time())
+            fold_ms.append((time.perf_counter() - start) * 1000)
+        print(
+            f"fold: p50={statistics.median(fold_ms):.2f}ms p99={percentile(fold_ms, 0.99):.2f}ms"
+            f"  (delta {os.path.getsize(index.delta_path) / 1024:.0f} KiB after {args.folds})"
+        )
+
+
+if __name__ == "__main__":
+    main()
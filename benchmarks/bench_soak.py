@@ -0,0 +1,226 @@
+"""
+Soak test: drive list_books, get_book and login for a long time and fail on memory growth.
+
+By default a uvicorn worker is started on a throwaway SQLite database; use
+--url to soak a running deployment instead (admin/admin must be able to log in).
+Worker memory is read from /admin/memory every --sample-interval seconds and
+grouped by pid, so several workers behind one URL are tracked separately.
+After --warmup, a least-squares line is fitted through each worker's RSS; the
+run fails (exit status 1) when a worker grows faster than
+--max-growth-mb-per-hour and by more than --min-growth-mb overall (noise floor).
+With --tracemalloc the worker traces allocations from the end of the warmup and
+the biggest allocation changes are printed at the end.
+
+    python -m benchmarks.bench_soak --duration 4h --concurrency 8
+    python -m benchmarks.bench_soak --duration 2m --warmup 20s --tracemalloc   # smoke run
+"""
+
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_duration(value: str) -> float:
+    """Seconds from "90", "90s", "15m" or "4h"."""
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_worker(tmp: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT),
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'soak.db')}",
+        "AUDIT_DIR": os.path.join(tmp, "audit"),
+        "COVER_DIR": os.path.join(tmp, "covers"),
+        "PROFILE_DIR": os.path.join(tmp, "profiles"),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)]
+        + ["--log-level", "error"],
+        env=env,
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health/ready", timeout=0.5).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("worker did not become ready in time")
+
+
+def slope_per_hour(samples: list[tuple[float, int]]) -> float:
+    """Least-squares slope of (seconds, bytes) samples, in MB per hour."""
+    n = len(samples)
+    if n < 2:
+        return 0.0
+    mean_t = sum(t for t, _ in samples) / n
+    mean_v = sum(v for _, v in samples) / n
+    var = sum((t - mean_t) ** 2 for t, _ in samples)
+    if var == 0:
+        return 0.0
+    cov = sum((t - mean_t) * (v - mean_v) for t, v in samples)
+    return cov / var * 3600 / 1e6
+
+
+class Load:
+    """Worker threads mixing list_books, get_book and login."""
+
+    def __init__(self, client: httpx.Client, book_ids: list[int], concurrency: int) -> None:
+        self.client = client
+        self.book_ids = book_ids
+        self.concurrency = concurrency
+        self.requests = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+
+    def _run(self, seed: int) -> None:
+        rnd = random.Random(seed)
+        while not self._stop.is_set():
+            pick = rnd.random()
+            try:
+                if pick < 0.45:
+                    status = self.client.get("/books/").status_code
+                elif pick < 0.9:
+                    status = self.client.get(f"/books/{rnd.choice(self.book_ids)}").status_code
+                else:
+                    data = {"username": "admin", "password": "admin"}
+                    status = self.client.post("/auth/token", data=data).status_code
+            except httpx.HTTPError:
+                status = 0
+            with self._lock:
+                self.requests += 1
+                self.errors += not 200 <= status < 300
+
+    def start(self) -> None:
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._run, args=(i,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default=None, help="soak a running server (default: spawn one)")
+    parser.add_argument("--duration", type=parse_duration, default=parse_duration("1h"))
+    parser.add_argument("--warmup", type=parse_duration, default=parse_duration("2m"))
+    parser.add_argument("--sample-interval", type=parse_duration, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--books", type=int, default=500)
+    parser.add_argument("--max-growth-mb-per-hour", type=float, default=5.0)
+    parser.add_argument("--min-growth-mb", type=float, default=2.0)
+    parser.add_argument("--tracemalloc", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, url = (None, args.url) if args.url else start_worker(tmp)
+        try:
+            return soak(url, args)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+
+def soak(url: str, args) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+    with httpx.Client(base_url=url, limits=limits, timeout=30) as client:
+        token = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+        admin = {"Authorization": f"Bearer {token.json()['access_token']}"}
+        book_ids = [
+            client.post(
+                "/books/", json={"title": f"Soak {i}", "author": f"Author {i % 50}"}, headers=admin
+            ).json()["id"]
+            for i in range(args.books)
+        ]
+
+        load = Load(client, book_ids, args.concurrency)
+        load.start()
+        start = time.monotonic()
+        samples: dict[int, list[tuple[float, int]]] = defaultdict(list)
+        snapshot_ids: list[int] = []
+        warmed_up = False
+        last_elapsed, last_requests = 0.0, 0
+        try:
+            while time.monotonic() - start < args.duration:
+                time.sleep(args.sample_interval)
+                elapsed = time.monotonic() - start
+                requests = load.requests
+                rate = (requests - last_requests) / (elapsed - last_elapsed)
+                last_elapsed, last_requests = elapsed, requests
+                if not warmed_up and elapsed >= args.warmup:
+                    warmed_up = True
+                    if args.tracemalloc:
+                        client.post("/admin/memory/tracemalloc", headers=admin)
+                        snap = client.post("/admin/memory/snapshots", headers=admin).json()
+                        snapshot_ids.append(snap["id"])
+                info = client.get("/admin/memory", headers=admin).json()
+                if warmed_up:
+                    samples[info["pid"]].append((elapsed, info["rss_bytes"]))
+                print(
+                    f"{elapsed:8.0f}s  {rate:7.0f} req/s  errors {load.errors}"
+                    f"  pid {info['pid']} rss {info['rss_bytes'] / 1e6:7.1f} MB"
+                    f"{'' if warmed_up else '  (warmup)'}",
+                    flush=True,
+                )
+        finally:
+            load.stop()
+
+        if args.tracemalloc and snapshot_ids:
+            snap = client.post("/admin/memory/snapshots", headers=admin, params={"limit": 10})
+            print("\nbiggest allocation changes since warmup (this worker):")
+            for entry in snap.json()["diff"] or []:
+                print(f"  {entry['size_diff'] / 1e6:+9.2f} MB  {entry['location']}")
+
+    failed = False
+    print()
+    for pid, series in sorted(samples.items()):
+        rate = slope_per_hour(series)
+        growth = rate * (series[-1][0] - series[0][0]) / 3600 if len(series) > 1 else 0.0
+        leaking = rate > args.max_growth_mb_per_hour and growth > args.min_growth_mb
+        failed |= leaking
+        print(
+            f"pid {pid}: {len(series)} samples, trend {rate:+.2f} MB/h, fitted growth "
+            f"{growth:+.2f} MB -> {'FAIL' if leaking else 'ok'}"
+        )
+    if load.errors:
+        print(f"{load.errors} of {load.requests} requests failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
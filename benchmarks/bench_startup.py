@@ -0,0 +1,142 @@
+"""
+Cold-start benchmark: `import app.main` time and time-to-ready of a uvicorn worker.
+
+Each run uses a fresh interpreter and a throwaway SQLite database. Time-to-ready
+is measured from process spawn until GET /health/ready returns 200.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --importtime   # slowest imports, cumulative
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main; print((time.perf_counter() - t) * 1000)"
+)
+
+
+def _env(db_path: str, **extra: str) -> dict:
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "PYTHONPATH": str(ROOT)}
+    env.update(extra)
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(db_path: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        env=_env(db_path),
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_time_to_ready(db_path: str, timeout: float = 30.0, **extra: str) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health/ready"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "error",
+        ],
+        env=_env(db_path, **extra),
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=0.5) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.01)
+        raise RuntimeError("worker did not become ready in time")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def print_importtime(db_path: str, top: int) -> None:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=_env(db_path),
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    for cumulative_us, module in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:8.1f} ms  {module}")
+
+
+def summary(label: str, samples: list[float]) -> None:
+    print(
+        f"{label:32s} median={statistics.median(samples):7.1f} ms  "
+        f"min={min(samples):7.1f} ms  max={max(samples):7.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+        if args.importtime:
+            print_importtime(db_path, args.top)
+            return
+
+        summary("import app.main", [measure_import(db_path) for _ in range(args.runs)])
+
+        cold = []
+        for i in range(args.runs):
+            cold.append(measure_time_to_ready(os.path.join(tmp, f"cold{i}.db")))
+        summary("time-to-ready (empty db)", cold)
+
+        measure_time_to_ready(db_path)  # create schema and seed once
+        summary(
+            "time-to-ready (migrated db)",
+            [measure_time_to_ready(db_path, DB_SCHEMA_MIGRATED="true") for _ in range(args.runs)],
+        )
+
+
+if __name__ == "__main__":
+    main()
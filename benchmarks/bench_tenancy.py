@@ -0,0 +1,106 @@
+"""
+Benchmark: one tenant's query latency while other tenants' catalogs grow.
+
+Uses a throwaway SQLite database with the app's schema. Tenant "bench" keeps
+a fixed catalog; after each growth step the same scoped queries the books
+router runs (list and get by id) are timed. With the (tenant_id, id) index
+the numbers should stay flat; the last line repeats the measurement with the
+index dropped to show what it buys.
+
+    python -m benchmarks.bench_tenancy --tenant-books 1000 --steps 0,100000,500000,1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session
+
+from app import models
+
+TENANT = "bench"
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def add_books(engine, tenants: list[str], count: int, batch: int = 50_000) -> None:
+    rnd = random.Random(count)
+    with engine.begin() as conn:
+        for start in range(0, count, batch):
+            rows = [
+                {
+                    "tenant_id": rnd.choice(tenants),
+                    "title": f"Book {start + i}",
+                    "author": f"Author {rnd.randint(1, 5000)}",
+                    "year": rnd.randint(1900, 2024),
+                }
+                for i in range(min(batch, count - start))
+            ]
+            conn.execute(insert(models.Book.__table__), rows)
+
+
+def measure(engine, ids: list[int], queries: int) -> tuple[list[float], list[float]]:
+    rnd = random.Random(1)
+    list_ms, get_ms = [], []
+    with Session(engine) as db:
+        for _ in range(max(1, queries // 20)):
+            start = time.perf_counter()
+            db.query(models.Book).filter(models.Book.tenant_id == TENANT).all()
+            list_ms.append((time.perf_counter() - start) * 1000)
+            db.expunge_all()
+        for _ in range(queries):
+            book_id = rnd.choice(ids)
+            start = time.perf_counter()
+            db.query(models.Book).filter(
+                models.Book.tenant_id == TENANT, models.Book.id == book_id
+            ).first()
+            get_ms.append((time.perf_counter() - start) * 1000)
+            db.expunge_all()
+    return list_ms, get_ms
+
+
+def report(label: str, list_ms: list[float], get_ms: list[float]) -> None:
+    print(
+        f"{label:>24} | list p50 {statistics.median(list_ms):7.2f} ms"
+        f"  p99 {percentile(list_ms, 0.99):7.2f} ms"
+        f" | get p50 {statistics.median(get_ms):6.3f} ms  p99 {percentile(get_ms, 0.99):6.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tenant-books", type=int, default=1000)
+    parser.add_argument("--other-tenants", type=int, default=50)
+    parser.add_argument("--steps", default="0,100000,500000,1000000")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(engine)
+        add_books(engine, [TENANT], args.tenant_books)
+        with engine.connect() as conn:
+            ids = list(conn.execute(text("SELECT id FROM books")).scalars())
+
+        others = [f"tenant-{i}" for i in range(args.other_tenants)]
+        grown = 0
+        for step in (int(s) for s in args.steps.split(",")):
+            add_books(engine, others, step - grown)
+            grown = step
+            report(f"other tenants: {grown:,}", *measure(engine, ids, args.queries))
+
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_books_tenant_id_id"))
+        report("without tenant index", *measure(engine, ids, args.queries))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
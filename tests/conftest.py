@@ -1,8 +1,12 @@
 # Ensure project root is on sys.path so `from app...` imports work in tests
 import os
 import sys
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 
+import pytest
+
 # Add project root to sys.path
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
@@ -19,3 +23,48 @@ except Exception:
     pass
 
 os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DB_PATH}")
+# keep audit segments written by lifespan tests out of the project tree
+os.environ.setdefault("AUDIT_DIR", tempfile.mkdtemp(prefix="librarylite-audit-"))
+os.environ.setdefault(
+    "SIMILAR_PATH",
+    os.path.join(tempfile.mkdtemp(prefix="librarylite-similar-"), "neighbours.bin"),
+)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _create_schema():
+    """The app creates tables in its lifespan; most tests don't run it, so do it once here."""
+    from app import models
+    from app.database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def max_queries():
+    """Context manager asserting an upper bound on SQL statements run in its block.
+
+    Guards endpoints against N+1 regressions:
+
+        with max_queries(1):
+            client.get("/books/")
+    """
+    from app.database import add_query_observer, remove_query_observer
+
+    @contextmanager
+    def _assert_max(limit: int):
+        statements: list[str] = []
+
+        def observer(statement: str, duration: float, route: str) -> None:
+            statements.append(statement)
+
+        add_query_observer(observer)
+        try:
+            yield statements
+        finally:
+            remove_query_observer(observer)
+        assert len(statements) <= limit, (
+            f"expected at most {limit} queries, got {len(statements)}:\n" + "\n".join(statements)
+        )
+
+    return _assert_max
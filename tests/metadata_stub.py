@@ -0,0 +1,93 @@
+"""
+Local stand-in for the metadata service (the Open Library subset app/enrichment.py uses).
+
+    with MetadataStub(books={"9780441013593": {"number_of_pages": 412}}) as stub:
+        client = MetadataClient(stub.url, LookupCache(tmp_path))
+        ...
+        stub.requests        # request paths served, in order
+        stub.max_in_flight   # peak number of requests served at the same time
+
+``books`` maps ISBN-13 to an edition record, ``search`` maps a lowercased
+title to a search doc. ``delay`` holds every response that many seconds;
+``fail`` answers every request with a 503.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class MetadataStub:
+    def __init__(
+        self,
+        books: dict[str, dict] | None = None,
+        search: dict[str, dict] | None = None,
+        delay: float = 0.0,
+        fail: bool = False,
+    ) -> None:
+        self.books = books or {}
+        self.search = search or {}
+        self.delay = delay
+        self.fail = fail
+        self.requests: list[str] = []
+        self.in_flight = self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "MetadataStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _answer(self, path: str) -> tuple[int, dict]:
+        url = urlsplit(path)
+        if self.fail:
+            return 503, {"error": "unavailable"}
+        if url.path.startswith("/isbn/") and url.path.endswith(".json"):
+            record = self.books.get(url.path[len("/isbn/") : -len(".json")])
+            return (200, record) if record is not None else (404, {"error": "notfound"})
+        if url.path == "/search.json":
+            title = parse_qs(url.query).get("title", [""])[0].lower()
+            doc = self.search.get(title)
+            return 200, {"numFound": int(doc is not None), "docs": [doc] if doc else []}
+        return 404, {"error": "notfound"}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                with stub._lock:
+                    stub.requests.append(self.path)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(stub.delay)
+                    status, body = stub._answer(self.path)
+                    data = json.dumps(body).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out and hung up
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
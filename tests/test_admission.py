@@ -0,0 +1,154 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from app import admission, database
+from app.admission import AdaptiveLimiter, default_limiter
+from app.database import DeadlineExceeded, SessionLocal, engine
+from app.main import app
+
+client = TestClient(app)
+
+SLOW_DB_SECONDS = 0.25
+
+
+def test_limiter_additive_increase_multiplicative_decrease():
+    limiter = AdaptiveLimiter(initial=10, min_limit=2, max_limit=12, target_s=0.1)
+    assert limiter.try_acquire()
+    limiter.release(0.01)
+    assert 10 < limiter.limit < 10.2
+
+    limiter.try_acquire()
+    limiter.release(0.5)
+    assert limiter.limit == pytest.approx(10.1 * 0.8)
+    # a second slow completion within the same target window doesn't cut again
+    limiter.try_acquire()
+    limiter.release(0.5)
+    assert limiter.limit == pytest.approx(10.1 * 0.8)
+
+
+def test_limiter_rejects_beyond_limit():
+    limiter = AdaptiveLimiter(initial=2, min_limit=1, max_limit=2)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release(0.0)
+    assert limiter.try_acquire()
+
+
+def test_shed_request_gets_503_and_health_is_exempt(monkeypatch):
+    monkeypatch.setattr(default_limiter, "inflight", 10_000)
+    response = client.get("/books/")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/health/live").status_code == 200
+    assert "librarylite_requests_shed_total" in client.get("/metrics").text
+
+
+def test_deadline_for_uses_longest_prefix(monkeypatch):
+    monkeypatch.setattr(admission, "ROUTE_DEADLINES_MS", {"/books/": 2000, "/books/stats": 300})
+    assert admission.deadline_for("/books/stats") == pytest.approx(0.3)
+    assert admission.deadline_for("/books/7") == pytest.approx(2.0)
+    assert admission.deadline_for("/auth/token") == admission.REQUEST_DEADLINE_MS / 1000
+
+
+def test_expired_deadline_returns_504(monkeypatch):
+    monkeypatch.setattr(admission, "ROUTE_DEADLINES_MS", {"/books/": 0})
+    assert client.get("/books/").status_code == 504
+
+
+def test_statement_refused_after_deadline():
+    token = database.set_request_deadline(time.monotonic() - 1)
+    try:
+        with SessionLocal() as db, pytest.raises(DeadlineExceeded):
+            db.execute(text("SELECT 1"))
+    finally:
+        database.reset_request_deadline(token)
+
+
+def test_sqlite_statement_interrupted_at_deadline():
+    runaway = text(
+        "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c"
+    )
+    token = database.set_request_deadline(time.monotonic() + 0.1)
+    start = time.monotonic()
+    try:
+        with SessionLocal() as db, pytest.raises(OperationalError, match="interrupt"):
+            db.execute(runaway)
+    finally:
+        database.reset_request_deadline(token)
+    assert time.monotonic() - start < 2
+
+
+def test_postgres_transaction_gets_statement_timeout():
+    executed = []
+
+    class FakeConnection:
+        class dialect:
+            name = "postgresql"
+
+        def exec_driver_sql(self, sql):
+            executed.append(sql)
+
+    token = database.set_request_deadline(time.monotonic() + 1.5)
+    try:
+        database._apply_statement_timeout(None, None, FakeConnection())
+    finally:
+        database.reset_request_deadline(token)
+    assert len(executed) == 1
+    timeout_ms = int(executed[0].rsplit("=", 1)[1])
+    assert executed[0].startswith("SET LOCAL statement_timeout")
+    assert 1000 < timeout_ms <= 1500
+
+
+@pytest.fixture
+def slow_database():
+    """Inject latency into every books query to mimic a struggling Postgres."""
+
+    def stall(conn, cursor, statement, parameters, context, executemany):
+        if "FROM books" in statement:
+            time.sleep(SLOW_DB_SECONDS)
+
+    event.listen(engine, "before_cursor_execute", stall)
+    yield
+    event.remove(engine, "before_cursor_execute", stall)
+
+
+def _burst(n_clients: int) -> tuple[list[float], list[int]]:
+    barrier = threading.Barrier(n_clients)
+
+    def one(_):
+        barrier.wait()
+        start = time.perf_counter()
+        status = client.get("/books/").status_code
+        return time.perf_counter() - start, status
+
+    with ThreadPoolExecutor(max_workers=n_clients) as pool:
+        results = list(pool.map(one, range(n_clients)))
+    return [r[0] for r in results], [r[1] for r in results]
+
+
+def _p99(samples: list[float]) -> float:
+    return statistics.quantiles(samples, n=100)[98]
+
+
+def test_p99_stays_bounded_under_slow_database(slow_database, monkeypatch):
+    monkeypatch.setattr(admission, "LOAD_SHED_ENABLED", False)
+    unbounded_latencies, _ = _burst(40)
+
+    monkeypatch.setattr(admission, "LOAD_SHED_ENABLED", True)
+    monkeypatch.setattr(default_limiter, "limit", 4.0)
+    monkeypatch.setattr(default_limiter, "max_limit", 4)
+    monkeypatch.setattr(default_limiter, "min_limit", 4)
+    latencies, statuses = _burst(40)
+
+    assert 503 in statuses and 200 in statuses
+    assert set(statuses) <= {200, 503}
+    # admitted requests only pay for their own slow query, rejected ones fail fast
+    assert _p99(latencies) < 2.5 * SLOW_DB_SECONDS
+    assert _p99(latencies) < _p99(unbounded_latencies)
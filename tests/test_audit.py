@@ -0,0 +1,171 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import audit, models
+from app.audit import AuditLog, FileSink
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def audit_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit.audit_log, "sink", FileSink(tmp_path))
+    audit.audit_log._buffer.clear()
+    yield tmp_path
+    audit.audit_log.sink.close()
+
+
+def _event(ts: float, action: str = "book.created", actor: str = "alice") -> dict:
+    return {"ts": ts, "tenant": "default", "actor": actor, "action": action, "target": "1"}
+
+
+def test_api_writes_are_audited_with_actor(audit_dir):
+    token = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+    headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+    book = client.post("/books/", json={"title": "Audited", "author": "A"}, headers=headers).json()
+    client.patch(f"/books/{book['id']}", json={"year": 2001}, headers=headers)
+    client.delete(f"/books/{book['id']}", headers=headers)
+    client.post("/auth/token", data={"username": "admin", "password": "wrong"})
+
+    audit.audit_log.flush()
+    events = list(audit.query(audit_dir))
+    assert [e["action"] for e in events] == [
+        "auth.login",
+        "book.created",
+        "book.updated",
+        "book.deleted",
+        "auth.login",
+    ]
+    assert {e["actor"] for e in events} == {"admin"}
+    assert events[1]["target"] == str(book["id"])
+    assert events[2]["details"] == {"changed": ["year"]}
+    assert events[0]["details"]["ok"] is True
+    assert events[-1]["details"]["ok"] is False
+
+
+def test_segments_rotate_and_are_named_by_time_range(audit_dir):
+    sink = FileSink(audit_dir, max_bytes=100)
+    sink.write([_event(1000.0), _event(1001.5)])  # over 100 bytes -> rotated
+    sink.write([_event(1002.0)])
+    names = sorted(p.name for p in audit_dir.iterdir())
+    assert names[0].startswith("audit-0000001000000-0000001001500-")
+    assert "-open-" in names[1]
+    sink.close()
+    assert not any("-open-" in p.name for p in audit_dir.iterdir())
+    assert [e["ts"] for e in audit.query(audit_dir)] == [1000.0, 1001.5, 1002.0]
+
+
+def test_open_segment_is_readable_after_crash(audit_dir, tmp_path_factory):
+    sink = FileSink(audit_dir)
+    sink.write([_event(10.0)])
+    sink.write([_event(11.0)])
+    # copy the open segment as a crash would leave it: no gzip trailer
+    (path,) = audit_dir.iterdir()
+    crashed = tmp_path_factory.mktemp("crashed")
+    (crashed / path.name).write_bytes(path.read_bytes())
+    assert [e["ts"] for e in audit.query(crashed)] == [10.0, 11.0]
+    sink.close()
+
+
+def test_query_filters_merges_and_skips_segments(audit_dir, monkeypatch):
+    first = FileSink(audit_dir / "a")
+    second = FileSink(audit_dir / "b")
+    first.write([_event(100.0), _event(300.0, actor="bob")])
+    second.write([_event(200.0, action="auth.login"), _event(400.0)])
+    first.close()
+    second.close()
+    for path in (audit_dir / "b").iterdir():  # same pid, different first ts
+        path.rename(audit_dir / "a" / path.name)
+    old = FileSink(audit_dir / "a")
+    old.write([_event(1.0)])
+    old.close()
+
+    opened = []
+    read_segment = audit.read_segment
+    monkeypatch.setattr(audit, "read_segment", lambda p: opened.append(p) or read_segment(p))
+
+    events = list(audit.query(audit_dir / "a", since=150, until=350))
+    assert [e["ts"] for e in events] == [200.0, 300.0]
+    assert len(opened) == 2  # the segment ending at 1.0 was never decompressed
+
+    assert [e["ts"] for e in audit.query(audit_dir / "a", action="book.*")] == [1, 100, 300, 400]
+    assert [e["ts"] for e in audit.query(audit_dir / "a", actor="bob")] == [300.0]
+
+
+def test_full_buffer_drops_instead_of_blocking():
+    log = AuditLog(FileSink("unused"), buffer_max=2)
+    assert log.record("book.created", "a", "default")
+    assert log.record("book.created", "a", "default")
+    start = time.perf_counter()
+    assert not log.record("book.created", "a", "default")
+    assert time.perf_counter() - start < 0.01
+    assert len(log) == 2
+
+
+def test_failed_write_keeps_events_for_retry():
+    class FlakySink:
+        def __init__(self):
+            self.calls = 0
+            self.written = []
+
+        def write(self, events):
+            self.calls += 1
+            if self.calls == 1:
+                raise OSError("disk full")
+            self.written.extend(events)
+
+        def close(self):
+            pass
+
+    sink = FlakySink()
+    log = AuditLog(sink, flush_batch=10)
+    for i in range(3):
+        log.record("book.created", "a", "default", i)
+    assert log.flush() == 0
+    assert len(log) == 3
+    assert log.flush() == 3
+    assert [e["target"] for e in sink.written] == ["0", "1", "2"]
+
+
+def test_writer_thread_flushes_in_background(audit_dir):
+    log = AuditLog(FileSink(audit_dir), flush_interval=0.05)
+    log.start()
+    log.record("auth.login", "alice", "default")
+    deadline = time.time() + 2
+    while len(log) and time.time() < deadline:
+        time.sleep(0.01)
+    log.stop()
+    assert [e["actor"] for e in audit.query(audit_dir)] == ["alice"]
+
+
+def test_cli_prints_matching_events(audit_dir, capsys):
+    sink = FileSink(audit_dir)
+    sink.write([_event(1_700_000_000.0), _event(1_800_000_000.0)])
+    sink.close()
+    audit.main(["--dir", str(audit_dir), "--since", "2023-11-14", "--until", "2024-01-01"])
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["ts"] for line in lines] == [1_700_000_000.0]
+
+
+def test_unknown_fsync_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        FileSink(tmp_path, fsync="sometimes")
+
+
+def test_database_sink_batches_and_queries():
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        db.query(models.AuditRecord).delete()
+        db.commit()
+    log = AuditLog(audit.DatabaseSink(), flush_batch=100)
+    for i in range(5):
+        log.record("book.created", "carol", "lib-db", i)
+    assert log.flush() == 5
+    events = list(audit.query_database(actor="carol", action="book.*"))
+    assert [e["target"] for e in events] == ["0", "1", "2", "3", "4"]
+    assert {e["tenant"] for e in events} == {"lib-db"}
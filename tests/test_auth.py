@@ -166,3 +166,93 @@ class TestAuthEdgeCases:
             data={"username": "admin", "password": long_password},
         )
         assert response.status_code == 401
+
+
+class TestRegistrationAndLogin:
+    PASSWORD = "s3cret-pass"
+
+    def _register(self, username, email):
+        return client.post(
+            "/auth/register",
+            json={"username": username, "email": email, "password": self.PASSWORD},
+        )
+
+    def test_register_is_a_single_statement_and_duplicates_map_to_400(self, max_queries):
+        with max_queries(1):
+            response = self._register("single-rt", "Single.RT@Example.com")
+        assert response.status_code == 201
+        assert response.json()["email"] == "single.rt@example.com"
+
+        duplicate_name = self._register("single-rt", "other-single@example.com")
+        assert duplicate_name.status_code == 400
+        assert duplicate_name.json()["detail"] == "Username already exists"
+
+        duplicate_email = self._register("single-rt-2", "SINGLE.rt@example.com")
+        assert duplicate_email.status_code == 400
+        assert duplicate_email.json()["detail"] == "Email already exists"
+
+    def test_login_is_case_insensitive_and_one_query(self, max_queries):
+        self._register("case-login", "case.login@example.com")
+        with max_queries(1):
+            response = client.post(
+                "/auth/token",
+                data={"username": "Case.Login@EXAMPLE.com", "password": self.PASSWORD},
+            )
+        assert response.status_code == 200
+
+    def test_failed_db_login_skips_demo_fallback(self, monkeypatch):
+        import app.routers.auth as auth_router
+
+        self._register("no-fallback", "no.fallback@example.com")
+
+        def fail(*args):
+            raise AssertionError("demo fallback must not run for a known DB user")
+
+        monkeypatch.setattr(auth_router, "authenticate_demo_user", fail)
+        response = client.post(
+            "/auth/token", data={"username": "no.fallback@example.com", "password": "wrong-pass"}
+        )
+        assert response.status_code == 401
+
+    def test_demo_login_runs_no_queries_and_can_be_disabled(self, max_queries, monkeypatch):
+        import app.routers.auth as auth_router
+
+        with max_queries(0):
+            ok = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+        assert ok.status_code == 200
+
+        monkeypatch.setattr(auth_router, "AUTH_DEMO_FALLBACK", False)
+        disabled = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+        assert disabled.status_code == 401
+
+    def _login(self, email):
+        response = client.post("/auth/token", data={"username": email, "password": self.PASSWORD})
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def test_admin_name_is_reserved_and_admin_rights_come_from_the_database(self):
+        from app.auth import create_access_token
+        from app.database import SessionLocal
+        from app.models import User
+
+        for name in ("admin", " Admin "):
+            reserved = self._register(name, "would-be.admin@example.com")
+            assert reserved.status_code == 400
+            assert reserved.json()["detail"] == "Username is reserved"
+
+        self._register("role-user", "role.user@example.com")
+        user = self._login("role.user@example.com")
+        assert client.get("/admin/profiles", headers=user).status_code == 403
+        forged = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+        assert client.get("/admin/profiles", headers=forged).status_code == 403
+
+        with SessionLocal() as db:
+            db.query(User).filter(User.username == "role-user").update({"is_admin": True})
+            db.commit()
+        admin = self._login("role.user@example.com")
+        assert client.get("/admin/profiles", headers=admin).status_code == 200
+
+        with SessionLocal() as db:
+            db.query(User).filter(User.username == "role-user").update({"is_admin": False})
+            db.commit()
+        assert client.get("/admin/profiles", headers=admin).status_code == 403
@@ -0,0 +1,184 @@
+import gzip
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, select, text, update
+
+from app import backup, models, restore
+from app.auth import TENANT_CLAIM, create_access_token
+from app.backup import BackupError
+from app.database import engine
+from app.main import app
+
+client = TestClient(app)
+TENANT = "backup"
+WRITE = {"Authorization": f"Bearer {create_access_token({'sub': 'admin', TENANT_CLAIM: TENANT})}"}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def catalog():
+    for i in range(7):
+        book = {"title": f"Backup {i}", "author": "Ann", "year": 1990 + i}
+        if i % 2:
+            book["isbn"] = "9780441013593"
+        client.post("/books/", json=book, headers=WRITE)
+    with engine.begin() as conn:
+        conn.execute(
+            update(models.Book)
+            .where(models.Book.title == "Backup 1")
+            .values(page_count=412, subjects=["Science fiction"], enriched_at=1.5)
+        )
+
+
+def _target(tmp_path):
+    return create_engine(
+        f"sqlite:///{tmp_path / 'target.db'}", connect_args={"check_same_thread": False}
+    )
+
+
+def _rows(conn, table) -> list[tuple]:
+    return [tuple(row) for row in conn.execute(select(table).order_by(*table.primary_key))]
+
+
+def test_round_trip_restores_every_table_and_index(tmp_path):
+    manifest = backup.backup(tmp_path / "b", segment_rows=3, jobs=2)
+    assert set(manifest["tables"]) == set(models.Base.metadata.tables)
+    books = manifest["tables"]["books"]
+    assert len(books["segments"]) > 1 and "isbn" in books["columns"]
+    with gzip.open(tmp_path / "b" / books["segments"][0]["file"]) as f:
+        assert len(json.load(f)) == 3
+    assert not (tmp_path / "b" / backup.SNAPSHOT).exists()
+
+    target = _target(tmp_path)
+    restored = restore.restore(tmp_path / "b", target, jobs=3)
+    assert restored["books"] == books["rows"]
+    with engine.connect() as source, target.connect() as copy:
+        for table in models.Base.metadata.sorted_tables:
+            assert _rows(copy, table) == _rows(source, table), table.name
+        null_subjects = "SELECT count(*) FROM books WHERE subjects IS NULL"
+        assert (
+            copy.execute(text(null_subjects)).scalar()
+            == source.execute(text(null_subjects)).scalar()
+        )
+        indexes = set(copy.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")))
+        for table in models.Base.metadata.sorted_tables:
+            assert {(index.name,) for index in table.indexes} <= indexes
+    target.dispose()
+
+
+def test_backup_is_one_snapshot(tmp_path, monkeypatch):
+    export = backup._export
+
+    def export_after_a_write(*args):
+        # the app keeps writing while the segments are exported
+        client.post("/books/", json={"title": "Too Late", "author": "Ann"}, headers=WRITE)
+        return export(*args)
+
+    with engine.connect() as conn:
+        books = conn.execute(text("SELECT count(*) FROM books")).scalar()
+    monkeypatch.setattr(backup, "_export", export_after_a_write)
+    manifest = backup.backup(tmp_path / "b", tables=["books"])
+    assert list(manifest["tables"]) == ["books"]
+    assert manifest["tables"]["books"]["rows"] == books
+
+
+def test_bad_segments_and_non_empty_targets_are_refused(tmp_path):
+    directory = tmp_path / "b"
+    manifest = backup.backup(directory, tables=["books", "users"], segment_rows=4)
+    with pytest.raises(BackupError, match="not empty"):
+        backup.backup(directory)
+
+    target = _target(tmp_path)
+    restore.restore(directory, target)
+    with pytest.raises(BackupError, match="books is not empty"):
+        restore.restore(directory, target)
+    restored = restore.restore(directory, target, replace=True)
+    assert restored == {name: entry["rows"] for name, entry in manifest["tables"].items()}
+    target.dispose()
+
+    segment = directory / "books-000001.json.gz"
+    data = bytearray(segment.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    segment.write_bytes(data)
+    with pytest.raises(BackupError, match="books-000001.json.gz: checksum mismatch"):
+        restore.verify(directory)
+    assert restore.main([str(directory), "--check"]) == 1
+    assert restore.main([str(tmp_path)]) == 1  # no manifest
+
+
+def _index_names(target, tables) -> set[str]:
+    with target.connect() as conn:
+        return {
+            name
+            for table in tables
+            for name in restore._index_names(conn, models.Base.metadata.tables[table])
+        }
+
+
+def _backup_with_users(directory):
+    with engine.begin() as conn:
+        conn.execute(
+            insert(models.User).values(
+                tenant_id=TENANT,
+                username=f"backup-{uuid.uuid4().hex[:8]}",
+                email=f"{uuid.uuid4().hex[:8]}@backup.example.org",
+                hashed_password="x",
+            )
+        )
+    return backup.backup(directory, tables=["books", "users"], segment_rows=4)
+
+
+def test_corrupt_segment_is_refused_before_the_target_is_touched(tmp_path):
+    directory = tmp_path / "b"
+    manifest = _backup_with_users(directory)
+    target = _target(tmp_path)
+    restore.restore(directory, target)
+    with target.connect() as conn:
+        before = {
+            table: _rows(conn, models.Base.metadata.tables[table]) for table in manifest["tables"]
+        }
+    indexes = _index_names(target, manifest["tables"])
+
+    segment = directory / manifest["tables"]["users"]["segments"][-1]["file"]
+    data = bytearray(segment.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    segment.write_bytes(data)
+    with pytest.raises(BackupError, match="checksum mismatch"):
+        restore.restore(directory, target, replace=True)
+    with target.connect() as conn:
+        after = {
+            table: _rows(conn, models.Base.metadata.tables[table]) for table in manifest["tables"]
+        }
+    assert after == before
+    assert _index_names(target, manifest["tables"]) == indexes
+    target.dispose()
+
+
+def test_failed_load_still_builds_indexes_and_replace_recovers(tmp_path, monkeypatch):
+    directory = tmp_path / "b"
+    manifest = _backup_with_users(directory)
+    expected = {
+        index.name
+        for name in manifest["tables"]
+        for index in models.Base.metadata.tables[name].indexes
+    }
+    target = _target(tmp_path)
+    load = restore._insert
+
+    def disk_full_on_users(conn, table, columns, rows):
+        if table.name == "users":
+            raise OSError("No space left on device")
+        load(conn, table, columns, rows)
+
+    monkeypatch.setattr(restore, "_insert", disk_full_on_users)
+    with pytest.raises(OSError):
+        restore.restore(directory, target)
+    assert _index_names(target, manifest["tables"]) >= expected
+
+    monkeypatch.setattr(restore, "_insert", load)
+    restored = restore.restore(directory, target, replace=True)
+    assert restored == {name: entry["rows"] for name, entry in manifest["tables"].items()}
+    assert _index_names(target, manifest["tables"]) >= expected
+    target.dispose()
@@ -0,0 +1,182 @@
+import asyncio
+import io
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app import admission, covers
+from app.admission import default_limiter
+from app.database import engine
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def cover_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(covers, "COVER_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _stop_pool():
+    yield
+    covers.shutdown_thumbnail_pool()
+
+
+@pytest.fixture
+def auth_headers():
+    response = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def book_id(auth_headers):
+    response = client.post(
+        "/books/", json={"title": "Cover Book", "author": "Cover Author"}, headers=auth_headers
+    )
+    return response.json()["id"]
+
+
+def _image(fmt: str = "PNG", size: tuple[int, int] = (600, 900), color=(200, 30, 60)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, fmt)
+    return buf.getvalue()
+
+
+def _upload(book_id: int, body: bytes, headers: dict):
+    return client.post(
+        f"/books/{book_id}/cover", content=body, headers={**headers, "Content-Type": "image/png"}
+    )
+
+
+def test_upload_cover_and_serve_with_range_and_immutable_cache(book_id, auth_headers):
+    body = _image()
+    response = _upload(book_id, body, auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert covers.COVER_KEY_RE.match(data["cover"])
+    assert data["cover"].endswith(".png")
+    assert data["cover_url"] == f"/covers/{data['cover']}"
+    assert client.get(f"/books/{book_id}").json()["cover"] == data["cover"]
+
+    full = client.get(data["cover_url"])
+    assert full.status_code == 200
+    assert full.content == body
+    assert full.headers["content-type"] == "image/png"
+    assert "immutable" in full.headers["cache-control"]
+
+    partial = client.get(data["cover_url"], headers={"Range": "bytes=0-15"})
+    assert partial.status_code == 206
+    assert partial.content == body[:16]
+
+
+def test_identical_uploads_are_stored_once(book_id, auth_headers, cover_dir):
+    body = _image(color=(1, 2, 3))
+    other = client.post("/books/", json={"title": "Twin", "author": "A"}, headers=auth_headers)
+    first = _upload(book_id, body, auth_headers).json()["cover"]
+    second = _upload(other.json()["id"], body, auth_headers).json()["cover"]
+    assert first == second
+    assert len(list(cover_dir.glob("*/*.png"))) == 1
+    assert not any((cover_dir / "tmp").iterdir())
+
+
+def test_thumbnail_rendered_by_worker_pool(book_id, auth_headers):
+    key = _upload(book_id, _image("JPEG", (1200, 1800)), auth_headers).json()["cover"]
+    thumb = covers.thumbnail_path(key)
+    deadline = time.monotonic() + 60
+    while not thumb.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert thumb.exists()
+
+    response = client.get(f"/covers/thumbs/{key}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert "immutable" in response.headers["cache-control"]
+    with Image.open(io.BytesIO(response.content)) as im:
+        assert max(im.size) == covers.COVER_THUMB_SIZE
+    assert "librarylite_cover_thumbnail_seconds_count" in client.get("/metrics").text
+
+
+def test_missing_thumbnail_falls_back_to_uncached_original(book_id, auth_headers, monkeypatch):
+    monkeypatch.setattr(covers, "COVER_THUMB_QUEUE_MAX", 0)  # every job is dropped
+    body = _image(color=(9, 9, 9))
+    key = _upload(book_id, body, auth_headers).json()["cover"]
+    response = client.get(f"/covers/thumbs/{key}")
+    assert response.status_code == 200
+    assert response.content == body
+    assert response.headers["cache-control"] == "no-cache"
+
+
+def test_render_thumbnail_keeps_aspect_ratio(tmp_path):
+    src = tmp_path / "src.png"
+    src.write_bytes(_image("PNG", (400, 1000)))
+    dst = tmp_path / "out" / "thumb.jpg"
+    wait, render = covers._render_thumbnail(str(src), str(dst), 100, time.time())
+    assert render > 0
+    with Image.open(dst) as im:
+        assert im.size == (40, 100)
+        assert im.format == "JPEG"
+
+
+def test_rejects_non_images_without_leaving_files(book_id, auth_headers, cover_dir):
+    response = _upload(book_id, b"definitely not an image", auth_headers)
+    assert response.status_code == 415
+    assert list(cover_dir.rglob("*.*")) == []
+
+
+def test_upload_requires_auth_and_existing_book(book_id, auth_headers):
+    assert _upload(book_id, _image(), {}).status_code == 401
+    assert _upload(10**9, _image(), auth_headers).status_code == 404
+
+
+def test_slow_upload_holds_no_connection_and_is_neither_shed_nor_time_boxed(
+    book_id, auth_headers, monkeypatch
+):
+    monkeypatch.setattr(admission, "REQUEST_DEADLINE_MS", 100)
+    monkeypatch.setattr(default_limiter, "inflight", 10_000)  # anything admitted is shed
+    body = _image()
+    connections_during_upload = []
+
+    def slow_body():
+        connections_during_upload.append(engine.pool.checkedout())
+        time.sleep(0.3)
+        yield body
+
+    response = client.post(
+        f"/books/{book_id}/cover",
+        content=slow_body(),
+        headers={**auth_headers, "Content-Type": "image/png"},
+    )
+    assert response.status_code == 200
+    assert connections_during_upload == [0]
+    assert client.get(response.json()["cover_url"]).status_code == 200
+    assert client.get("/books/").status_code == 503
+
+
+def test_oversized_upload_is_aborted_mid_stream(cover_dir):
+    async def chunks():
+        yield b"\x89PNG\r\n\x1a\n" + b"\0" * 1000
+        yield b"\0" * 1000
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(covers.store_upload(chunks(), max_bytes=1500))
+    assert exc.value.status_code == 413
+    assert not any((cover_dir / "tmp").iterdir())
+
+
+def test_declared_length_over_limit_is_rejected_before_reading(book_id, auth_headers):
+    response = client.post(
+        f"/books/{book_id}/cover",
+        content=b"x",
+        headers={**auth_headers, "Content-Length": str(covers.COVER_MAX_BYTES + 1)},
+    )
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("key", ["../../etc/passwd", "abc.png", "a" * 64 + ".exe"])
+def test_invalid_keys_are_not_found(key):
+    assert client.get(f"/covers/{key}").status_code == 404
@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import enrichment, outbox
+from app.auth import TENANT_CLAIM, create_access_token
+from app.enrichment import Enricher, EnrichmentError, LookupCache, MetadataClient
+from app.main import app
+from tests.metadata_stub import MetadataStub
+
+client = TestClient(app)
+TENANT = "enrich"
+READ = {"X-Tenant": TENANT}
+WRITE = {"Authorization": f"Bearer {create_access_token({'sub': 'admin', TENANT_CLAIM: TENANT})}"}
+
+DUNE = "9780441013593"
+BOOKS = {DUNE: {"number_of_pages": 412, "subjects": ["Science fiction", {"name": "Arrakis"}]}}
+SEARCH = {
+    "the hobbit": {
+        "isbn": ["0261102214", "9780261102217"],
+        "number_of_pages_median": 310,
+        "subject": ["Fantasy"],
+    }
+}
+
+
+def _lookup(metadata: MetadataClient, *calls: tuple) -> list:
+    async def run():
+        try:
+            return await asyncio.gather(*(metadata.lookup(*call) for call in calls))
+        finally:
+            await metadata.aclose()
+
+    return asyncio.run(run())
+
+
+def _create(**fields) -> dict:
+    response = client.post("/books/", json={"author": "Someone", **fields}, headers=WRITE)
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_isbns_are_validated_and_normalized():
+    assert enrichment.normalize_isbn("0-441-01359-7") == DUNE
+    assert enrichment.normalize_isbn("978-0-441-01359-3") == DUNE
+    assert enrichment.normalize_isbn("080442957X") == "9780804429573"
+    assert enrichment.normalize_isbn("0441013598") is None
+
+    book = _create(title="Dune", isbn="0 441 01359 7")
+    assert (book["isbn"], book["page_count"], book["subjects"]) == (DUNE, None, None)
+    bad = client.post("/books/", json={"title": "X", "author": "Y", "isbn": "123"}, headers=WRITE)
+    assert bad.status_code == 422
+
+
+def test_lookups_are_coalesced_bounded_and_cached(tmp_path):
+    with MetadataStub(books=BOOKS, search=SEARCH, delay=0.1) as stub:
+        metadata = MetadataClient(stub.url, LookupCache(tmp_path), concurrency=3)
+        calls = [(DUNE, "Dune", "Herbert")] * 20 + [(None, f"Unknown {i}", "X") for i in range(9)]
+        results = _lookup(metadata, *calls)
+        assert stub.requests.count(f"/isbn/{DUNE}.json") == 1
+        assert stub.max_in_flight <= 3
+        assert results[0] == {
+            "isbn": DUNE,
+            "page_count": 412,
+            "subjects": ["Science fiction", "Arrakis"],
+        }
+        assert results[-1] is None
+
+        # another worker (or a later run) is answered from disk, misses included
+        served = len(stub.requests)
+        metadata = MetadataClient(stub.url, LookupCache(tmp_path))
+        assert _lookup(metadata, (DUNE, "Dune", "Herbert"), (None, "Unknown 0", "X")) == [
+            results[0],
+            None,
+        ]
+        assert len(stub.requests) == served
+
+
+def test_cache_entries_expire(tmp_path, monkeypatch):
+    cache = LookupCache(tmp_path, ttl=100, negative_ttl=10)
+    cache.put("isbn:1", {"isbn": "1"})
+    cache.put("isbn:2", None)
+    assert (cache.get("isbn:1"), cache.get("isbn:2")) == ({"isbn": "1"}, None)
+
+    real_time = time.time
+    monkeypatch.setattr(enrichment.time, "time", lambda: real_time() + 50)
+    assert cache.get("isbn:1") == {"isbn": "1"}
+    assert cache.get("isbn:2") is enrichment.MISS
+    assert cache.prune() == 1
+
+
+def test_failures_raise_and_are_not_cached(tmp_path):
+    cache = LookupCache(tmp_path)
+    with MetadataStub(books=BOOKS, delay=1.0) as slow:
+        with pytest.raises(EnrichmentError):
+            _lookup(MetadataClient(slow.url, cache, timeout=0.1), (DUNE, "Dune", "Herbert"))
+    with MetadataStub(fail=True) as down:
+        with pytest.raises(EnrichmentError):
+            _lookup(MetadataClient(down.url, cache), (DUNE, "Dune", "Herbert"))
+    assert cache.get(f"isbn:{DUNE}") is enrichment.MISS
+
+
+def test_new_books_are_enriched_off_the_request_path(tmp_path, monkeypatch):
+    while outbox.drain_once():  # earlier tests' events go to the disabled enricher
+        pass
+    with MetadataStub(books=BOOKS, search=SEARCH, delay=0.3) as stub:
+        monkeypatch.setattr(enrichment, "enricher", Enricher(stub.url, LookupCache(tmp_path)))
+        dune = _create(title="Dune", isbn=DUNE)
+        hobbit = _create(title="The Hobbit", author="Tolkien")
+        started = time.perf_counter()
+        outbox.drain_once()
+        assert time.perf_counter() - started < stub.delay
+        assert client.get(f"/books/{dune['id']}", headers=READ).json()["page_count"] is None
+
+        enrichment.enricher.stop()
+        dune = client.get(f"/books/{dune['id']}", headers=READ).json()
+        assert (dune["page_count"], dune["subjects"]) == (412, ["Science fiction", "Arrakis"])
+        hobbit = client.get(f"/books/{hobbit['id']}", headers=READ).json()
+        assert (hobbit["isbn"], hobbit["page_count"]) == ("9780261102217", 310)
+
+        # correcting the ISBN looks the book up again, by the new ISBN
+        client.patch(f"/books/{hobbit['id']}", json={"isbn": "080442957X"}, headers=WRITE)
+        outbox.drain_once()
+        enrichment.enricher.stop()
+        assert stub.requests[-1] == "/isbn/9780804429573.json"
+        # the new ISBN is unknown: the old ISBN's page count and subjects do not carry over
+        hobbit = client.get(f"/books/{hobbit['id']}", headers=READ).json()
+        assert (hobbit["isbn"], hobbit["page_count"], hobbit["subjects"]) == (
+            "9780804429573",
+            None,
+            None,
+        )
+
+
+def test_schemas_do_not_import_enrichment():
+    import subprocess
+    import sys
+
+    code = "import sys, app.schemas; print('app.enrichment' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["False"]
+
+
+def test_bulk_command_enriches_what_is_missing(tmp_path, capsys):
+    ids = [_create(title=title)["id"] for title in ("The Hobbit", "Nothing Like It")]
+    args = ["--url", "", "--cache-dir", str(tmp_path), "--tenant", TENANT]
+    with MetadataStub(search=SEARCH) as stub:
+        args[1] = stub.url
+        assert enrichment.main(args) == 0
+        assert client.get(f"/books/{ids[0]}", headers=READ).json()["page_count"] == 310
+        assert client.get(f"/books/{ids[1]}", headers=READ).json()["page_count"] is None
+        served = len(stub.requests)
+
+        assert enrichment.main(args) == 0
+        assert len(stub.requests) == served
+    assert "0 enriched, 0 not found, 0 failed" in capsys.readouterr().out
+
+    _create(title="Needs Enriching")
+    with MetadataStub(fail=True) as down:
+        args[1] = down.url
+        assert enrichment.main(args) == 1
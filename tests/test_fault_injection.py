@@ -0,0 +1,195 @@
+"""Tail-latency scenarios: the app under injected DB latency, stalls, drops and outages."""
+
+import os
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, make_url, text
+
+from app import database, models
+from app.admission import default_limiter
+from app.main import app
+from tests.faults import FaultPlan, FaultProxy, faulty_sqlite_engine, run_load
+
+client = TestClient(app)
+TENANT = {"X-Tenant": "faults"}
+
+
+def _list_books() -> int:
+    return client.get("/books/", headers=TENANT).status_code
+
+
+@pytest.fixture(autouse=True)
+def _no_shedding(monkeypatch):
+    # 503s from the DB must not shrink the shared limiter into shedding later requests
+    monkeypatch.setattr(default_limiter, "limit", float(default_limiter.max_limit))
+
+
+@pytest.fixture
+def faulty_db(tmp_path):
+    """Point the app's sessions at a fault-injected SQLite file; yields (plan, make_engine)."""
+    plan = FaultPlan(seed=39)
+    engines = []
+
+    def make_engine(**kwargs):
+        kwargs = {"pool_size": 4, "max_overflow": 0, "pool_timeout": 2, **kwargs}
+        engine = faulty_sqlite_engine(tmp_path / "faulty.db", plan, **kwargs)
+        engines.append(engine)
+        models.Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM books"))
+            conn.execute(
+                text("INSERT INTO books (tenant_id, title, author) VALUES ('faults', 'T', 'A')")
+            )
+        database.SessionLocal.configure(bind=engine)
+        return engine
+
+    yield plan, make_engine
+    database.SessionLocal.configure(bind=database.engine)
+    for engine in engines:
+        engine.dispose()
+
+
+def test_latency_and_jitter_show_up_without_errors(faulty_db):
+    plan, make_engine = faulty_db
+    make_engine(pool_pre_ping=True)
+    plan.latency, plan.jitter = 0.01, 0.01
+
+    result = run_load(_list_books, total=80, concurrency=4)
+    assert result.error_rate() == 0
+    # pre-ping + SELECT: at least two injected delays per request
+    assert result.p50 >= 0.02
+    assert result.p99 < 0.04 + 0.25
+
+
+def test_rare_stalls_stay_in_the_tail(faulty_db):
+    plan, make_engine = faulty_db
+    make_engine()
+    plan.stall_probability, plan.stall = 0.05, 0.3
+
+    result = run_load(_list_books, total=120, concurrency=8)
+    assert plan.injected["stalls"] > 0
+    assert result.error_rate() == 0  # stalls are shorter than pool_timeout
+    assert result.p50 < 0.1
+    assert result.p99 >= 0.3
+
+
+def test_dropped_connections_are_503_and_pool_recovers(faulty_db):
+    plan, make_engine = faulty_db
+    make_engine(pool_pre_ping=True)
+    plan.drop_probability = 0.1
+
+    result = run_load(_list_books, total=100, concurrency=4)
+    assert set(result.statuses) <= {200, 503}
+    failed = result.statuses.count(503)
+    # drops during pre-ping are absorbed by reconnecting, so not every drop is an error
+    assert 0 < failed <= plan.injected["drops"]
+
+    plan.drop_probability = 1.0
+    response = client.get("/books/", headers=TENANT)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+    plan.clear()
+    assert run_load(_list_books, total=40, concurrency=4).error_rate(lambda s: s == 200) == 0
+
+
+@pytest.mark.parametrize("pre_ping", [True, False])
+def test_server_restart_with_and_without_pre_ping(faulty_db, pre_ping):
+    plan, make_engine = faulty_db
+    make_engine(pool_pre_ping=pre_ping)
+    assert all(_list_books() == 200 for _ in range(5))
+
+    plan.kill_connections()
+    statuses = [_list_books() for _ in range(5)]
+    if pre_ping:
+        assert statuses == [200] * 5
+    else:
+        # the stale pooled connection fails once, then the pool is invalidated and refilled
+        assert statuses == [503, 200, 200, 200, 200]
+
+
+def test_outage_fails_fast_then_recovers(faulty_db):
+    plan, make_engine = faulty_db
+    make_engine(pool_pre_ping=True)
+    assert _list_books() == 200
+
+    plan.outage_for(0.5)
+    start = time.perf_counter()
+    during = [_list_books() for _ in range(5)]
+    assert during == [503] * 5
+    assert (time.perf_counter() - start) / 5 < 0.1  # no hanging on a dead database
+
+    time.sleep(max(0.0, plan.down_until - time.monotonic()) + 0.05)
+    assert [_list_books() for _ in range(5)] == [200] * 5
+
+
+class _Echo(socketserver.BaseRequestHandler):
+    def handle(self):
+        while data := self.request.recv(65536):
+            self.request.sendall(data)
+
+
+@pytest.fixture
+def echo_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Echo)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def _roundtrip(port: int, payload: bytes = b"ping") -> tuple[float, bytes]:
+    """(seconds, reply); a connection closed or reset by the proxy replies b""."""
+    with socket.create_connection(("127.0.0.1", port), timeout=2) as s:
+        start = time.perf_counter()
+        try:
+            s.sendall(payload)
+            data = s.recv(65536)
+        except ConnectionResetError:
+            data = b""
+        return time.perf_counter() - start, data
+
+
+def test_proxy_adds_latency_and_kills_connections(echo_server):
+    plan = FaultPlan(latency=0.05)
+    with FaultProxy(echo_server, plan) as proxy:
+        elapsed, data = _roundtrip(proxy.port)
+        assert data == b"ping"
+        assert elapsed >= 0.05
+
+        plan.latency = 0.0
+        with socket.create_connection(("127.0.0.1", proxy.port), timeout=2) as s:
+            s.sendall(b"a")
+            assert s.recv(10) == b"a"
+            proxy.kill_connections()
+            assert s.recv(10) == b""  # closed by the proxy
+
+        plan.outage_for(0.2)
+        assert _roundtrip(proxy.port)[1] == b""
+        time.sleep(0.25)
+        assert _roundtrip(proxy.port)[1] == b"ping"
+
+
+@pytest.mark.skipif(
+    not os.getenv("FAULT_PG_URL"), reason="set FAULT_PG_URL to a local Postgres to run"
+)
+def test_postgres_pool_recovers_through_proxy():
+    pytest.importorskip("psycopg2")
+    url = make_url(os.environ["FAULT_PG_URL"])
+    plan = FaultPlan(latency=0.002, jitter=0.003)
+    with FaultProxy((url.host, url.port or 5432), plan) as proxy:
+        engine = create_engine(
+            url.set(host="127.0.0.1", port=proxy.port), pool_pre_ping=True, pool_size=2
+        )
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+        proxy.kill_connections()
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+        engine.dispose()
@@ -0,0 +1,193 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import lending, models
+from app.admission import default_limiter
+from app.auth import ADMIN_CLAIM, TENANT_CLAIM, create_access_token
+from app.database import SessionLocal
+from app.main import app
+
+client = TestClient(app)
+
+
+def _headers(user: str, tenant: str | None = None) -> dict:
+    claims = {"sub": user} if tenant is None else {"sub": user, TENANT_CLAIM: tenant}
+    return {"Authorization": f"Bearer {create_access_token(claims)}"}
+
+
+ADMIN = {"Authorization": f"Bearer {create_access_token({'sub': 'admin', ADMIN_CLAIM: True})}"}
+
+
+@pytest.fixture
+def book_with_copies():
+    """Factory: a fresh book with ``n`` copies; returns its id."""
+
+    def make(n: int) -> int:
+        book = client.post("/books/", json={"title": "Lendable", "author": "L"}, headers=ADMIN)
+        book_id = book.json()["id"]
+        if n:
+            added = client.post(f"/books/{book_id}/copies", json={"count": n}, headers=ADMIN)
+            assert added.status_code == 201
+        return book_id
+
+    return make
+
+
+def _availability(book_id: int) -> dict:
+    return client.get(f"/books/{book_id}/availability").json()
+
+
+def test_checkout_and_return(book_with_copies):
+    book_id = book_with_copies(2)
+    loan = client.post(f"/books/{book_id}/checkout", headers=_headers("ann"))
+    assert loan.status_code == 201
+    assert loan.json()["borrower"] == "ann"
+    assert loan.json()["due_at"] > loan.json()["loaned_at"]
+    assert _availability(book_id) == {
+        "book_id": book_id,
+        "copies": 2,
+        "available": 1,
+        "on_loan": 1,
+        "held": 0,
+        "waiting": 0,
+    }
+    assert [entry["id"] for entry in client.get("/loans", headers=_headers("ann")).json()] == [
+        loan.json()["id"]
+    ]
+
+    loan_id = loan.json()["id"]
+    assert client.post(f"/loans/{loan_id}/return", headers=_headers("bob")).status_code == 404
+    returned = client.post(f"/loans/{loan_id}/return", headers=_headers("ann"))
+    assert returned.json()["returned_at"] is not None
+    assert client.post(f"/loans/{loan_id}/return", headers=_headers("ann")).status_code == 409
+    assert _availability(book_id)["available"] == 2
+
+
+def test_only_admins_return_other_borrowers_loans(book_with_copies):
+    book_id = book_with_copies(1)
+    loan_id = client.post(f"/books/{book_id}/checkout", headers=_headers("ann")).json()["id"]
+    # the admin's name without the admin role is just another borrower
+    assert client.post(f"/loans/{loan_id}/return", headers=_headers("admin")).status_code == 404
+    returned = client.post(f"/loans/{loan_id}/return", headers=ADMIN)
+    assert returned.status_code == 200
+    assert returned.json()["borrower"] == "ann"
+
+
+def test_copies_are_admin_only_and_checkout_needs_a_copy(book_with_copies):
+    book_id = book_with_copies(0)
+    denied = client.post(f"/books/{book_id}/copies", json={"count": 1}, headers=_headers("ann"))
+    assert denied.status_code == 403
+    by_name = client.post(f"/books/{book_id}/copies", json={"count": 1}, headers=_headers("admin"))
+    assert by_name.status_code == 403
+    assert client.post(f"/books/{book_id}/checkout", headers=_headers("ann")).status_code == 409
+    assert client.post("/books/999999/checkout", headers=_headers("ann")).status_code == 404
+
+
+def test_reservation_queue_is_fifo(book_with_copies):
+    book_id = book_with_copies(1)
+    client.post(f"/books/{book_id}/checkout", headers=_headers("ann"))
+    loan_id = client.get("/loans", headers=_headers("ann")).json()[-1]["id"]
+
+    first = client.post(f"/books/{book_id}/reservations", headers=_headers("bob"))
+    second = client.post(f"/books/{book_id}/reservations", headers=_headers("cy"))
+    assert (first.json()["position"], second.json()["position"]) == (1, 2)
+    again = client.post(f"/books/{book_id}/reservations", headers=_headers("bob"))
+    assert again.status_code == 409
+
+    # the returned copy is held for bob, not put back on the shelf
+    client.post(f"/loans/{loan_id}/return", headers=_headers("ann"))
+    assert _availability(book_id)["held"] == 1
+    assert client.post(f"/books/{book_id}/checkout", headers=_headers("cy")).status_code == 409
+    [bob] = client.get("/reservations", headers=_headers("bob")).json()
+    assert bob["status"] == "ready" and bob["position"] is None
+    [cy] = client.get("/reservations", headers=_headers("cy")).json()
+    assert cy["position"] == 1
+
+    loan = client.post(f"/books/{book_id}/checkout", headers=_headers("bob"))
+    assert loan.json()["copy_id"] == bob["copy_id"]
+    assert client.get("/reservations", headers=_headers("bob")).json() == []
+    with SessionLocal() as db:
+        topics = [e.topic for e in db.query(models.OutboxEvent).all()]
+    assert "reservation.ready" in topics
+
+
+def test_reserving_an_available_title_is_refused(book_with_copies):
+    book_id = book_with_copies(1)
+    response = client.post(f"/books/{book_id}/reservations", headers=_headers("ann"))
+    assert response.status_code == 409
+
+
+def test_cancelled_and_expired_holds_pass_to_the_next_in_line(book_with_copies, monkeypatch):
+    book_id = book_with_copies(0)
+    ids = {
+        user: client.post(f"/books/{book_id}/reservations", headers=_headers(user)).json()["id"]
+        for user in ("ann", "bob", "cy")
+    }
+    # a new copy serves the queue first
+    client.post(f"/books/{book_id}/copies", json={"count": 1}, headers=ADMIN)
+    assert client.get("/reservations", headers=_headers("ann")).json()[0]["status"] == "ready"
+
+    assert client.delete(f"/reservations/{ids['ann']}", headers=_headers("ann")).status_code == 204
+    assert client.get("/reservations", headers=_headers("bob")).json()[0]["status"] == "ready"
+
+    # bob never picks it up: past the hold, the next checkout or reservation passes it on
+    real_time = time.time
+    monkeypatch.setattr(
+        lending.time, "time", lambda: real_time() + lending.LENDING_HOLD_HOURS * 3600 + 1
+    )
+    assert client.post(f"/books/{book_id}/checkout", headers=_headers("bob")).status_code == 409
+    assert client.get("/reservations", headers=_headers("bob")).json() == []
+    assert client.post(f"/books/{book_id}/checkout", headers=_headers("cy")).status_code == 201
+
+
+def test_tenants_cannot_lend_each_others_copies(book_with_copies):
+    book_id = book_with_copies(1)
+    other = _headers("eve", tenant="elsewhere")
+    assert client.post(f"/books/{book_id}/checkout", headers=other).status_code == 404
+    assert (
+        client.get(f"/books/{book_id}/availability", headers={"X-Tenant": "elsewhere"}).status_code
+        == 404
+    )
+
+
+def test_concurrent_checkouts_never_double_lend(book_with_copies, monkeypatch):
+    copies, clients = 5, 40
+    # the burst must reach the handlers rather than be shed at admission
+    monkeypatch.setattr(default_limiter, "limit", float(default_limiter.max_limit))
+    book_id = book_with_copies(copies)
+    start = threading.Barrier(clients)
+    statuses: list[int] = []
+
+    def borrow(i: int) -> None:
+        start.wait()
+        statuses.append(
+            client.post(f"/books/{book_id}/checkout", headers=_headers(f"u{i}")).status_code
+        )
+
+    threads = [threading.Thread(target=borrow, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] * copies + [409] * (clients - copies)
+    with SessionLocal() as db:
+        lent = [
+            loan.copy_id
+            for loan in db.query(models.Loan).filter(
+                models.Loan.book_id == book_id, models.Loan.returned_at.is_(None)
+            )
+        ]
+    assert len(lent) == len(set(lent)) == copies
+
+
+def test_checkout_query_budget(book_with_copies, max_queries):
+    book_id = book_with_copies(1)
+    # book + lendable check, SQLite re-check under the write lock, hold expiry, own hold,
+    # claim, loan INSERT, outbox INSERT, loan refresh
+    with max_queries(8):
+        response = client.post(f"/books/{book_id}/checkout", headers=_headers("ann"))
+    assert response.status_code == 201
@@ -0,0 +1,100 @@
+import gc
+import os
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import memory
+from app.auth import create_access_token
+from app.main import app
+
+client = TestClient(app)
+
+_leak: list[bytes] = []
+
+
+@pytest.fixture
+def admin_headers():
+    response = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def tracing(admin_headers):
+    assert client.post("/admin/memory/tracemalloc", headers=admin_headers).status_code == 200
+    yield
+    client.delete("/admin/memory/tracemalloc", headers=admin_headers)
+    _leak.clear()
+
+
+def test_memory_endpoints_are_admin_only():
+    assert client.get("/admin/memory").status_code == 401
+    other = {"Authorization": f"Bearer {create_access_token({'sub': 'someone'})}"}
+    assert client.post("/admin/memory/snapshots", headers=other).status_code == 403
+
+
+def test_worker_gauges_on_metrics():
+    text = client.get("/metrics").text
+    pid = os.getpid()
+    assert f'librarylite_worker_rss_bytes{{pid="{pid}"}}' in text
+    assert f'librarylite_worker_gc_pending_objects{{generation="0",pid="{pid}"}}' in text
+    assert f'librarylite_worker_gc_tracked_objects{{pid="{pid}"}}' in text
+    # the default process/GC collectors are still there
+    assert "process_resident_memory_bytes" in text
+    assert "python_gc_collections_total" in text
+
+
+def test_snapshot_requires_tracing(admin_headers):
+    tracemalloc.stop()
+    response = client.post("/admin/memory/snapshots", headers=admin_headers)
+    assert response.status_code == 409
+
+
+def test_snapshot_diff_points_at_the_leaking_line(admin_headers, tracing):
+    first = client.post("/admin/memory/snapshots", headers=admin_headers).json()
+    assert first["previous"] is None
+    _leak.extend(bytes(1024) for _ in range(2000))  # ~2 MB from this line
+
+    second = client.post("/admin/memory/snapshots", headers=admin_headers).json()
+    assert second["previous"] == first["id"]
+    top = second["diff"][0]
+    assert top["location"].startswith(f"{__file__}:")
+    assert top["size_diff"] >= 2000 * 1024
+
+    by_file = client.get(
+        f"/admin/memory/snapshots/{second['id']}/diff",
+        params={"base": first["id"], "group_by": "filename"},
+        headers=admin_headers,
+    ).json()
+    assert by_file["base"] == first["id"]
+    assert any(entry["location"] == f"{__file__}:0" for entry in by_file["diff"])
+
+    summary = client.get("/admin/memory", headers=admin_headers).json()
+    assert summary["pid"] == os.getpid()
+    assert summary["tracemalloc"]["tracing"] is True
+    assert [s["id"] for s in summary["snapshots"]] == [first["id"], second["id"]]
+    assert "librarylite_worker_tracemalloc_traced_bytes" in client.get("/metrics").text
+
+
+def test_unknown_snapshot_is_404(admin_headers, tracing):
+    response = client.get("/admin/memory/snapshots/999999/diff", headers=admin_headers)
+    assert response.status_code == 404
+
+
+def test_snapshot_store_keeps_the_latest(tracing):
+    store = memory.SnapshotStore(max_snapshots=2)
+    ids = [store.take() for _ in range(3)]
+    assert [s["id"] for s in store.list()] == ids[1:]
+    assert store.get(ids[0]) is None
+    assert store.previous(ids[2]) == ids[1]
+
+
+def test_object_count_is_sampled(monkeypatch):
+    calls = []
+    real = gc.get_objects
+    monkeypatch.setattr(memory.gc, "get_objects", lambda: calls.append(1) or real())
+    collector = memory.MemoryCollector(object_count_interval=3600)
+    for _ in range(3):
+        list(collector.collect())
+    assert len(calls) == 1
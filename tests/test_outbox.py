@@ -0,0 +1,135 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models, outbox
+from app.database import SessionLocal
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def empty_outbox():
+    with SessionLocal() as db:
+        db.query(models.OutboxEvent).delete()
+        db.query(models.OutboxDeadLetter).delete()
+        db.commit()
+
+
+@pytest.fixture
+def auth_headers():
+    response = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _events() -> list[models.OutboxEvent]:
+    with SessionLocal() as db:
+        return db.query(models.OutboxEvent).order_by(models.OutboxEvent.id).all()
+
+
+def test_book_writes_enqueue_events(auth_headers):
+    book = client.post("/books/", json={"title": "Evented", "author": "A"}, headers=auth_headers)
+    book_id = book.json()["id"]
+    client.patch(f"/books/{book_id}", json={"year": 1999}, headers=auth_headers)
+    client.delete(f"/books/{book_id}", headers=auth_headers)
+
+    events = _events()
+    assert [e.topic for e in events] == ["book.created", "book.updated", "book.deleted"]
+    assert events[0].payload["id"] == book_id
+    assert events[1].payload["changed"] == ["year"]
+    assert events[2].payload == {"id": book_id}
+    assert {e.tenant_id for e in events} == {"default"}
+
+
+def test_rolled_back_write_leaves_no_event():
+    with SessionLocal() as db:
+        outbox.enqueue(db, "default", "book.created", {"id": -1})
+        db.rollback()
+    assert _events() == []
+
+
+def test_drain_delivers_and_deletes():
+    seen = []
+    handlers = outbox.HandlerRegistry()
+    handlers.register("book.*", seen.append)
+    handlers.register("author.*", lambda m: pytest.fail("wrong topic"))
+    with SessionLocal() as db:
+        outbox.enqueue(db, "t1", "book.created", {"id": 1})
+        outbox.enqueue(db, "t1", "book.deleted", {"id": 1})
+        db.commit()
+
+    assert outbox.drain_once(handlers) == 2
+    assert [(m.topic, m.attempts) for m in seen] == [("book.created", 1), ("book.deleted", 1)]
+    assert _events() == []
+    assert outbox.drain_once(handlers) == 0
+
+
+def test_failing_handler_retries_with_backoff_then_dead_letters(monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    handlers = outbox.HandlerRegistry()
+
+    @handlers.handler("book.created")
+    def flaky(message):
+        raise RuntimeError("downstream unavailable")
+
+    with SessionLocal() as db:
+        outbox.enqueue(db, "t1", "book.created", {"id": 7})
+        db.commit()
+
+    before = time.time()
+    assert outbox.drain_once(handlers) == 1
+    (event,) = _events()
+    assert event.attempts == 1
+    assert event.available_at > before  # backed off, not immediately due
+    assert "downstream unavailable" in event.last_error
+    assert outbox.drain_once(handlers) == 0
+
+    with SessionLocal() as db:
+        db.query(models.OutboxEvent).update({"available_at": 0})
+        db.commit()
+    assert outbox.drain_once(handlers) == 1
+    assert _events() == []
+    with SessionLocal() as db:
+        (dead,) = db.query(models.OutboxDeadLetter).all()
+        assert (dead.topic, dead.attempts, dead.payload) == ("book.created", 2, {"id": 7})
+
+    assert outbox.requeue_dead_letters() == 1
+    (event,) = _events()
+    assert event.attempts == 0
+
+
+def test_claimed_events_are_leased():
+    with SessionLocal() as db:
+        outbox.enqueue(db, "t1", "book.created", {"id": 1})
+        db.commit()
+        claimed = outbox._claim(db, 10, time.time())
+        assert len(claimed) == 1
+        # a second worker sees nothing until the lease runs out
+        assert outbox._claim(db, 10, time.time()) == []
+        later = time.time() + outbox.OUTBOX_LEASE_SECONDS + 1
+        assert [m.attempts for m in outbox._claim(db, 10, later)] == [2]
+
+
+def test_backoff_grows_and_is_capped(monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_BASE_BACKOFF", 1)
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_BACKOFF", 10)
+    assert 0.5 <= outbox.backoff(1) <= 1
+    assert 4 <= outbox.backoff(4) <= 8
+    assert 5 <= outbox.backoff(20) <= 10
+
+
+def test_cli_once_drains_and_metrics_are_exported(monkeypatch):
+    seen = []
+    monkeypatch.setattr(outbox, "registry", outbox.HandlerRegistry())
+    outbox.registry.register("*", seen.append)
+    with SessionLocal() as db:
+        outbox.enqueue(db, "t1", "book.updated", {"id": 3})
+        db.commit()
+
+    assert outbox.main(["--once"]) == 0
+    assert len(seen) == 1
+    metrics = client.get("/metrics").text
+    assert 'librarylite_outbox_events_total{outcome="delivered"}' in metrics
+    assert "librarylite_outbox_oldest_event_age_seconds 0.0" in metrics
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import profiling
+from app.database import SessionLocal
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def admin_headers():
+    response = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_unprofiled_request_has_no_report(profile_dir):
+    response = client.get("/books/", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert list(profile_dir.glob("*.json")) == []
+
+
+def test_admin_header_profiles_request(admin_headers):
+    response = client.get("/books/", headers={**admin_headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    report_id = response.headers["x-profile-id"]
+
+    listing = client.get("/admin/profiles", headers=admin_headers)
+    assert listing.status_code == 200
+    assert listing.json()[0]["id"] == report_id
+
+    report = client.get(f"/admin/profiles/{report_id}", headers=admin_headers).json()
+    assert report["path"] == "/books/"
+    assert report["status"] == 200
+    assert report["sql_count"] >= 1
+    assert any("FROM books" in q["statement"] for q in report["sql"])
+    assert "wall_stacks" in report and "cpu_stacks" in report
+
+
+def test_report_ring_is_bounded(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_MAX_REPORTS", 3)
+    for _ in range(5):
+        profile = profiling.RequestProfile("GET", "/health", "test")
+        profile.start()
+        profile.stop()
+        profiling.save_report(profile)
+    assert len(list(profile_dir.glob("*.json"))) == 3
+
+
+def test_admin_endpoints_require_admin(admin_headers):
+    from app.auth import create_access_token
+
+    user_headers = {"Authorization": f"Bearer {create_access_token({'sub': 'reader'})}"}
+    assert client.get("/admin/profiles").status_code == 401
+    assert client.get("/admin/profiles", headers=user_headers).status_code == 403
+    assert client.get("/admin/profiles/../../etc", headers=admin_headers).status_code == 404
+    assert client.get("/admin/profiles/not-a-report", headers=admin_headers).status_code == 404
+
+
+def _spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_profile_samples_only_the_requests_threads(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_INTERVAL_MS", 1)
+    done = threading.Event()
+
+    def spin_elsewhere():
+        while not done.is_set():
+            _spin(0.001)
+
+    def sync_handler():
+        with SessionLocal() as db:
+            db.execute(text("SELECT 1"))
+        _spin(0.05)
+
+    async def request():
+        profile = profiling.RequestProfile("GET", "/x", "test")
+        token = profiling._active_profile.set(profile)
+        profile.start()
+        _spin(0.05)
+        await asyncio.to_thread(sync_handler)
+        profile.stop()
+        profiling._active_profile.reset(token)
+        return profile
+
+    other = threading.Thread(target=spin_elsewhere)
+    other.start()
+    try:
+        stacks = asyncio.run(request()).to_dict()["wall_stacks"]
+    finally:
+        done.set()
+        other.join()
+    assert any("request (test_profiling.py" in stack for stack in stacks)
+    assert any("sync_handler" in stack for stack in stacks)
+    assert not any("spin_elsewhere" in stack for stack in stacks)
+    assert profiling._thread_profiles == {}
@@ -0,0 +1,114 @@
+import json
+import re
+from pathlib import Path
+
+import pytest
+import yaml
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import (
+    SLO_AVAILABILITY,
+    SLO_LATENCY_BUCKETS,
+    SLO_LATENCY_SECONDS,
+    SLO_LATENCY_TARGET,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+PROMETHEUS_DIR = ROOT / "prometheus"
+DASHBOARD = ROOT / "monitoring" / "grafana" / "dashboards" / "fastapi-dashboard.json"
+
+RECORD_NAME_RE = re.compile(r"^[a-z_]+:[a-z0-9_]+:[a-z0-9_]+$")
+RECORD_REF_RE = re.compile(r"\b[a-z_]+:[a-z0-9_]+:[a-z0-9_]+\b")
+METRIC_REF_RE = re.compile(r"\b(http_[a-z_]+|librarylite_[a-z_]+|process_[a-z_]+)\b")
+
+
+def _rule_files():
+    config = yaml.safe_load((PROMETHEUS_DIR / "prometheus.yml").read_text())
+    return [PROMETHEUS_DIR / Path(p).name for p in config["rule_files"]]
+
+
+def _all_rules():
+    rules = []
+    for path in _rule_files():
+        for group in yaml.safe_load(path.read_text())["groups"]:
+            rules.extend(group["rules"])
+    return rules
+
+
+def _recorded_names():
+    return {r["record"] for r in _all_rules() if "record" in r}
+
+
+@pytest.fixture(scope="module")
+def exposed_metrics():
+    client = TestClient(app)
+    client.get("/books/")
+    text = client.get("/metrics").text
+    return {line.split("{")[0].split(" ")[0] for line in text.splitlines() if line[:1] != "#"}
+
+
+def test_rule_files_load_and_are_well_formed():
+    files = _rule_files()
+    assert {f.name for f in files} == {"recording_rules.yml", "alerts.yml"}
+    group_names = []
+    for path in files:
+        groups = yaml.safe_load(path.read_text())["groups"]
+        group_names.extend(g["name"] for g in groups)
+        for group in groups:
+            for rule in group["rules"]:
+                assert rule.get("expr"), rule
+                assert ("record" in rule) != ("alert" in rule), rule
+                if "record" in rule:
+                    assert RECORD_NAME_RE.match(rule["record"]), rule["record"]
+                else:
+                    assert rule["labels"]["severity"] in {"warning", "critical"}
+                    assert rule["annotations"]["summary"]
+    assert len(group_names) == len(set(group_names))
+
+
+def test_average_latency_and_request_rate_alerts_are_gone():
+    exprs = [r["expr"] for r in _all_rules() if "alert" in r]
+    assert not any("_sum" in e and "_count" in e for e in exprs)
+    assert "HighRequestRate" not in {r.get("alert") for r in _all_rules()}
+
+
+def test_recorded_series_referenced_anywhere_are_defined():
+    recorded = _recorded_names()
+    exprs = [r["expr"] for r in _all_rules()]
+    panels = json.loads(DASHBOARD.read_text())["panels"]
+    exprs += [t["expr"] for p in panels for t in p["targets"]]
+    for expr in exprs:
+        for ref in RECORD_REF_RE.findall(expr):
+            assert ref in recorded, f"{ref} is not a recording rule"
+
+
+def test_base_metrics_used_by_rules_are_exposed(exposed_metrics):
+    panels = json.loads(DASHBOARD.read_text())["panels"]
+    exprs = [r["expr"] for r in _all_rules()] + [t["expr"] for p in panels for t in p["targets"]]
+    for expr in exprs:
+        for metric in METRIC_REF_RE.findall(RECORD_REF_RE.sub("", expr)):
+            assert metric in exposed_metrics, f"{metric} is not exposed by the app"
+
+
+def test_rules_match_slo_constants():
+    assert SLO_LATENCY_SECONDS in SLO_LATENCY_BUCKETS
+    exprs = {r["record"]: r["expr"] for r in _all_rules() if "record" in r}
+    availability_budget = f"(1 - {SLO_AVAILABILITY})"
+    latency_budget = f"(1 - {SLO_LATENCY_TARGET})"
+    for name, expr in exprs.items():
+        if name.startswith("job:slo_availability_burn_rate"):
+            assert availability_budget in expr
+        if name.startswith("job:slo_latency_burn_rate"):
+            assert latency_budget in expr
+        if name.startswith("job:slo_slow_requests"):
+            assert f'le="{SLO_LATENCY_SECONDS}"' in expr
+
+
+def test_dashboard_panels_have_unique_ids_and_layout():
+    panels = json.loads(DASHBOARD.read_text())["panels"]
+    ids = [p["id"] for p in panels]
+    assert len(ids) == len(set(ids))
+    titles = {p["title"] for p in panels}
+    assert "p99 latency by handler" in titles
+    assert "Error budget burn rate" in titles
@@ -0,0 +1,110 @@
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.revocation import BloomFilter, DatabaseBackend, MemoryBackend, RevocationStore
+
+client = TestClient(app)
+
+
+def _login():
+    response = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+    return response.json()["access_token"]
+
+
+def test_tokens_carry_unique_jti():
+    from app.auth import decode_token
+
+    first, second = decode_token(_login()), decode_token(_login())
+    assert first["jti"] and first["jti"] != second["jti"]
+
+
+def test_logout_revokes_only_that_token():
+    token, other = _login(), _login()
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    assert client.post("/auth/logout", headers=headers).status_code == 204
+    assert client.get("/auth/me", headers=headers).status_code == 401
+    assert client.post("/auth/logout", headers=headers).status_code == 401
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {other}"}).status_code == 200
+
+
+def test_logout_requires_token():
+    assert client.post("/auth/logout").status_code == 401
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(10_000, error_rate=0.01)
+    members = [uuid.uuid4().hex for _ in range(10_000)]
+    for key in members:
+        bloom.add(key)
+    assert all(key in bloom for key in members)
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10_000))
+    assert false_positives < 300
+    bloom.add("not-a-uuid")
+    assert "not-a-uuid" in bloom
+
+
+def test_entries_expire_with_the_token():
+    store = RevocationStore(MemoryBackend(), capacity=16)
+    now = int(time.time())
+    store.revoke("short", now + 1)
+    store.revoke("long", now + 3600)
+    assert store.is_revoked("short") and store.is_revoked("long")
+    assert store.prune(now=now + 10) == 1
+    assert not store.is_revoked("short")
+    assert store.is_revoked("long")
+    store.revoke("already-expired", now - 1)
+    assert not store.is_revoked("already-expired")
+
+
+def test_store_grows_past_initial_capacity():
+    store = RevocationStore(MemoryBackend(), capacity=4)
+    exp = int(time.time()) + 3600
+    jtis = [uuid.uuid4().hex for _ in range(50)]
+    for jti in jtis:
+        store.revoke(jti, exp)
+    assert all(store.is_revoked(jti) for jti in jtis)
+    assert len(store) == 50
+
+
+def test_database_backend_syncs_between_workers():
+    worker_a = RevocationStore(DatabaseBackend())
+    worker_b = RevocationStore(DatabaseBackend())
+    worker_b.sync()
+    jti = uuid.uuid4().hex
+
+    worker_a.revoke(jti, int(time.time()) + 600)
+    assert worker_a.is_revoked(jti)
+    assert not worker_b.is_revoked(jti)
+    assert worker_b.sync() >= 1
+    assert worker_b.is_revoked(jti)
+
+
+def test_database_backend_picks_up_late_commits_behind_the_cursor():
+    from sqlalchemy import func
+
+    from app import models
+    from app.database import SessionLocal
+
+    def insert(id_):
+        with SessionLocal() as db:
+            db.add(models.RevokedToken(id=id_, jti=jti[id_], expires_at=int(time.time()) + 600))
+            db.commit()
+
+    worker = RevocationStore(DatabaseBackend())
+    worker.sync()
+    with SessionLocal() as db:
+        high = db.query(func.max(models.RevokedToken.id)).scalar() or 0
+    jti = {high + 1: uuid.uuid4().hex, high + 2: uuid.uuid4().hex}
+
+    # high + 1 was handed out first but commits after high + 2 (Postgres sequences)
+    insert(high + 2)
+    assert worker.sync() == 1
+    insert(high + 1)
+    assert worker.sync() == 1
+    assert worker.is_revoked(jti[high + 1]) and worker.is_revoked(jti[high + 2])
+    assert worker.sync() == 0
@@ -0,0 +1,176 @@
+import json
+import os
+import random
+import shutil
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import outbox, similar
+from app.auth import TENANT_CLAIM, create_access_token
+from app.main import app
+from app.similar import similar_index
+
+client = TestClient(app)
+TENANT = "similar"
+READ = {"X-Tenant": TENANT}
+WRITE = {"Authorization": f"Bearer {create_access_token({'sub': 'admin', TENANT_CLAIM: TENANT})}"}
+
+CATALOG = [
+    ("Dune", "Frank Herbert", "A desert planet, spice and a galactic empire."),
+    ("Dune Messiah", "Frank Herbert", "The emperor of the desert planet and its spice."),
+    ("Children of Dune", "Frank Herbert", "Twins inherit the desert planet."),
+    ("The Hobbit", "J. R. R. Tolkien", "A dragon guards the treasure of the dwarves."),
+    ("The Silmarillion", "J. R. R. Tolkien", "Elves, jewels and the first ages."),
+    ("Cooking for One", "Ann Chef", "Simple recipes."),
+]
+
+
+def _create(title: str, author: str, description: str) -> int:
+    payload = {"title": title, "author": author, "description": description}
+    return client.post("/books/", json=payload, headers=WRITE).json()["id"]
+
+
+def _similar_titles(book_id: int) -> list[str]:
+    return [book["title"] for book in client.get(f"/books/{book_id}/similar", headers=READ).json()]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    ids = {title: _create(title, author, desc) for title, author, desc in CATALOG}
+    outbox.drain_once()  # no index yet: the creates are not folded, the build sees them
+    similar.build()
+    similar_index.refresh(force=True)
+    return ids
+
+
+def test_neighbours_come_from_the_built_index(catalog):
+    response = client.get(f"/books/{catalog['Dune']}/similar", headers=READ)
+    assert response.status_code == 200
+    books = response.json()
+    assert [b["title"] for b in books[:2]] == ["Dune Messiah", "Children of Dune"]
+    assert "Cooking for One" not in [b["title"] for b in books]
+    scores = [b["score"] for b in books]
+    assert scores == sorted(scores, reverse=True) and 0 < scores[0] <= 1
+
+    limited = client.get(f"/books/{catalog['Dune']}/similar?limit=1", headers=READ).json()
+    assert len(limited) == 1
+    assert _similar_titles(catalog["The Hobbit"])[0] == "The Silmarillion"
+
+
+def test_similar_is_tenant_scoped(catalog):
+    other = client.get(f"/books/{catalog['Dune']}/similar", headers={"X-Tenant": "elsewhere"})
+    assert other.status_code == 404
+    assert client.get("/books/99999999/similar", headers=READ).status_code == 404
+
+
+def test_writes_are_folded_in_and_shared_through_the_delta(catalog):
+    other_worker = similar.SimilarIndex(similar_index.path, reload_interval=0)
+    new_id = _create("God Emperor of Dune", "Frank Herbert", "The emperor rules the desert planet.")
+    outbox.drain_once()
+
+    assert "Dune Messiah" in _similar_titles(new_id)[:3]
+    assert "God Emperor of Dune" in _similar_titles(catalog["Dune Messiah"])
+    assert new_id in [other for other, _ in other_worker.lookup(catalog["Dune Messiah"])]
+
+    client.delete(f"/books/{new_id}", headers=WRITE)
+    outbox.drain_once()
+    assert new_id not in [other for other, _ in other_worker.lookup(catalog["Dune Messiah"])]
+
+
+def test_rebuild_replaces_the_delta(catalog):
+    new_id = _create("Heretics of Dune", "Frank Herbert", "Desert planet heretics.")
+    outbox.drain_once()
+    assert os.path.getsize(similar_index.delta_path) > 0
+
+    similar.build()
+    similar_index.refresh(force=True)
+    assert os.path.getsize(similar_index.delta_path) == 0
+    assert similar_index._file.neighbours(new_id)
+    assert "Heretics of Dune" in _similar_titles(catalog["Dune"])
+
+
+def test_no_index_means_no_neighbours(tmp_path):
+    index = similar.SimilarIndex(str(tmp_path / "missing.bin"))
+    assert index.lookup(1) == []
+    assert index.fold("t", 1, "Title", "Author", None, 0.0) is False
+
+
+def test_concurrent_folds_are_serialized(tmp_path):
+    path = str(tmp_path / "shared.bin")
+    similar.build_from_rows(_synthetic_rows(100), path, k=5)
+    books = {
+        1000 + i: ("a", f"w{i % 7} w{i % 11} w3", f"author {i % 5}", f"w{i % 13} w4 w5")
+        for i in range(80)
+    }
+    workers = [similar.SimilarIndex(path), similar.SimilarIndex(path)]
+    errors = []
+
+    def fold(worker, ids):
+        try:
+            for book_id in ids:
+                tenant, title, author, description = books[book_id]
+                worker.fold(tenant, book_id, title, author, description, time.time())
+        except Exception as e:
+            errors.append(e)
+
+    ids = sorted(books)
+    threads = [threading.Thread(target=fold, args=(workers[i % 2], ids[i::4])) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    with open(f"{path}.delta") as f:
+        concurrent = [json.loads(line) for line in f]
+    assert len(concurrent) == len(books)
+
+    # replaying the same folds one at a time must give the same delta: no fold missed another
+    replay_path = str(tmp_path / "replay.bin")
+    shutil.copy(path, replay_path)
+    replay = similar.SimilarIndex(replay_path)
+    for entry in concurrent:
+        tenant, title, author, description = books[entry["id"]]
+        replay.fold(tenant, entry["id"], title, author, description, entry["ts"])
+    with open(f"{replay_path}.delta") as f:
+        assert [json.loads(line) for line in f] == concurrent
+
+
+def _synthetic_rows(n: int):
+    rnd = random.Random(42)
+    words = [f"w{i}" for i in range(200)]
+    for tenant in ("a", "b"):
+        for i in range(n):
+            title = " ".join(rnd.choices(words, k=4))
+            description = " ".join(rnd.choices(words, k=10))
+            yield (
+                tenant,
+                i * 2 + (1 if tenant == "a" else 2),
+                title,
+                f"author {i % 25}",
+                description,
+            )
+
+
+def test_numpy_and_python_builds_agree(tmp_path):
+    files = {}
+    for backend in ("python", "numpy"):
+        path = str(tmp_path / f"{backend}.bin")
+        similar.build_from_rows(_synthetic_rows(300), path, k=5, block_rows=64, backend=backend)
+        files[backend] = similar.NeighbourFile(path)
+    for book_id in files["python"].ids:
+        expected, got = files["python"].neighbours(book_id), files["numpy"].neighbours(book_id)
+        assert [other for other, _ in got] == [other for other, _ in expected]
+        assert [score for _, score in got] == pytest.approx([score for _, score in expected])
+
+
+def test_api_does_not_import_scipy():
+    import subprocess
+    import sys
+
+    code = "import sys, app.main; print('scipy' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["False"]
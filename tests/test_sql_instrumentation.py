@@ -0,0 +1,72 @@
+import logging
+
+from fastapi.testclient import TestClient
+
+from app import database
+from app.main import app
+
+client = TestClient(app)
+
+
+def _auth_headers():
+    response = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_fingerprint_ignores_literals_and_whitespace():
+    a = database.fingerprint("SELECT * FROM books WHERE id = 1")
+    b = database.fingerprint("SELECT *  FROM books\n WHERE id = 42")
+    c = database.fingerprint("SELECT * FROM users WHERE id = 1")
+    assert a == b
+    assert a != c
+
+
+def test_fingerprint_collapses_in_lists_of_any_length():
+    short = database.fingerprint("SELECT * FROM books WHERE id IN (?, ?)")
+    long = database.fingerprint("SELECT * FROM books WHERE id IN (?,?,?,?,?)")
+    pyformat = database.fingerprint("SELECT * FROM books WHERE id IN (%(id_1_1)s, %(id_1_2)s)")
+    assert short == long == pyformat
+
+
+def test_fingerprint_returns_other_once_the_cap_is_reached(monkeypatch):
+    known = database.fingerprint("SELECT * FROM cap_test WHERE id = 1")
+    monkeypatch.setattr(database, "_MAX_FINGERPRINTS", len(database._fingerprints))
+    assert database.fingerprint("SELECT 'never seen' FROM cap_test") == database.OTHER_FINGERPRINT
+    assert database.fingerprint("SELECT * FROM cap_test WHERE id = 1") == known
+
+
+def test_query_budget_per_endpoint(max_queries):
+    headers = _auth_headers()
+    with max_queries(1):
+        listing = client.get("/books/")
+    assert listing.status_code == 200
+    # book INSERT, stats upsert, outbox INSERT, refresh
+    with max_queries(4):
+        created = client.post("/books/", json={"title": "Q", "author": "A"}, headers=headers)
+    assert created.status_code == 201
+    with max_queries(1):
+        book = client.get(f"/books/{created.json()['id']}")
+    assert book.status_code == 200
+    with max_queries(1):
+        stats = client.get("/books/stats")
+    assert stats.status_code == 200
+    with max_queries(0):
+        suggestions = client.get("/books/suggest", params={"prefix": "q"})
+    assert suggestions.status_code == 200
+
+
+def test_queries_are_labelled_with_route():
+    client.get("/books/")
+    metrics = client.get("/metrics").text
+    assert 'librarylite_sql_queries_per_request_count{route="/books/"}' in metrics
+    assert 'librarylite_sql_query_duration_seconds_count{fingerprint="' in metrics
+
+
+def test_slow_query_is_logged_with_plan(monkeypatch, caplog):
+    monkeypatch.setattr(database, "SLOW_QUERY_MS", 0.000001)
+    with caplog.at_level(logging.WARNING, logger="app.database"):
+        client.get("/books/1")
+    slow = [r.getMessage() for r in caplog.records if "slow query" in r.getMessage()]
+    assert slow
+    assert "route=/books/{id}" in slow[0]
+    assert "plan:" in slow[0] and "(not collected)" not in slow[0]
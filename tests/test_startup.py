@@ -0,0 +1,70 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from app import init_db as init_db_module
+from app.main import app, db_probe
+
+
+def test_liveness_does_not_need_startup():
+    client = TestClient(app)
+    assert client.get("/health/live").json() == {"status": "alive"}
+
+
+def test_readiness_follows_lifespan_and_cached_probe(max_queries):
+    with TestClient(app) as client:
+        # served from the cached probe, not a query per call (the background loop may fire once)
+        with max_queries(1):
+            for _ in range(20):
+                response = client.get("/health/ready")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["status"] == "ready"
+        assert body["db_ok"] is True
+        assert "checkedout" in body["pool"]
+
+        db_probe.ok = False
+        assert client.get("/health/ready").status_code == 503
+        db_probe.check()
+    assert TestClient(app).get("/health/ready").status_code == 503
+
+
+def test_wait_for_db_uses_jittered_exponential_backoff(monkeypatch):
+    attempts = []
+    sleeps = []
+
+    def failing_connect():
+        attempts.append(1)
+        raise OperationalError("SELECT 1", {}, Exception("down"))
+
+    monkeypatch.setattr(init_db_module.engine, "connect", failing_connect)
+    monkeypatch.setattr(init_db_module.time, "sleep", sleeps.append)
+    monkeypatch.setattr(init_db_module.random, "uniform", lambda lo, hi: hi)
+
+    assert init_db_module.wait_for_db(retries=5, base_delay=0.1, max_delay=0.5) is False
+    assert len(attempts) == 5
+    assert sleeps == pytest.approx([0.1, 0.2, 0.4, 0.5])
+
+
+def test_init_db_can_skip_schema_work(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        init_db_module.models.Base.metadata, "create_all", lambda **kw: calls.append(kw)
+    )
+    init_db_module.init_db(skip_schema=True)
+    assert calls == []
+    init_db_module.init_db(skip_schema=False)
+    assert len(calls) == 1
+
+
+def test_heavy_auth_imports_are_deferred():
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, app.main; "
+        "print(any(m.startswith(('jose', 'passlib')) for m in sys.modules), "
+        "'jinja2' in sys.modules)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["False", "False"]
@@ -0,0 +1,126 @@
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal
+from app.main import app
+from app.stats import find_drift, main, rebuild_stats
+
+client = TestClient(app)
+
+
+def _auth_headers():
+    response = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _stats():
+    response = client.get("/books/stats")
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_stats_follow_create_update_delete():
+    with SessionLocal() as db:
+        rebuild_stats(db)
+    headers = _auth_headers()
+    before = _stats()
+
+    created = client.post(
+        "/books/",
+        json={"title": "Stats Book", "author": "Stats Author", "year": 1987},
+        headers=headers,
+    ).json()
+    after_create = _stats()
+    assert after_create["total"] == before["total"] + 1
+    assert after_create["by_author"]["Stats Author"] == 1
+    assert after_create["by_year"]["1987"] == before["by_year"].get("1987", 0) + 1
+    assert after_create["by_decade"]["1980s"] == before["by_decade"].get("1980s", 0) + 1
+
+    client.patch(f"/books/{created['id']}", json={"year": 2001}, headers=headers)
+    after_update = _stats()
+    assert after_update["total"] == after_create["total"]
+    assert after_update["by_year"].get("1987", 0) == before["by_year"].get("1987", 0)
+    assert after_update["by_decade"]["2000s"] == before["by_decade"].get("2000s", 0) + 1
+
+    client.delete(f"/books/{created['id']}", headers=headers)
+    after_delete = _stats()
+    assert after_delete["total"] == before["total"]
+    assert "Stats Author" not in after_delete["by_author"]
+
+    with SessionLocal() as db:
+        assert find_drift(db) == []
+
+
+def test_verify_command_detects_and_repairs_drift():
+    from app import models
+    from app.tenancy import DEFAULT_TENANT
+
+    with SessionLocal() as db:
+        rebuild_stats(db)
+        db.get(models.BookStat, (DEFAULT_TENANT, "total", "")).count += 5
+        db.commit()
+
+    assert main([]) == 1
+    assert main(["--repair"]) == 0
+    assert main([]) == 0
+
+
+def test_upserts_touch_rows_in_key_order():
+    # concurrent writes lock the same rows in the same order, so they can't deadlock
+    from sqlalchemy import event
+
+    from app.database import engine
+    from app.stats import record_book_change
+
+    params = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "book_stats" in statement:
+            params.extend(parameters)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        with SessionLocal() as db:
+            record_book_change(db, "order", ("Zed", 1999), ("Abe", 2001))
+            db.rollback()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    keys = [tuple(params[i : i + 3]) for i in range(0, len(params), 4)]
+    assert len(keys) == 6 and keys == sorted(keys)
+
+
+def test_books_total_gauge_is_cached(max_queries):
+    from app import stats
+
+    stats._total_cache = (float("-inf"), 0.0)
+    with max_queries(1):
+        first = stats._read_total()
+        assert stats._read_total() == first
+
+
+def test_restart_after_deleting_every_book_reseeds_with_stats(tmp_path, monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app import init_db as init_db_module
+    from app import models
+    from app.stats import read_stats, record_book_change
+    from app.tenancy import DEFAULT_TENANT
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'restart.db'}")
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(init_db_module, "engine", engine)
+    monkeypatch.setattr(init_db_module, "SessionLocal", factory)
+
+    init_db_module.init_db()
+    with factory() as db:
+        for book in db.query(models.Book):
+            db.delete(book)
+            record_book_change(db, book.tenant_id, (book.author, book.year), None)
+        db.commit()
+        assert read_stats(db, DEFAULT_TENANT)["total"] == 0
+
+    init_db_module.init_db()  # restart: the empty catalog gets its sample books again
+    with factory() as db:
+        assert read_stats(db, DEFAULT_TENANT)["total"] == 3
+        assert find_drift(db) == []
+    engine.dispose()
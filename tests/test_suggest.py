@@ -0,0 +1,88 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.suggest import PrefixIndex, TenantSuggestIndex, normalize
+
+
+class TestPrefixIndex:
+    def test_normalize_folds_case_accents_and_spaces(self):
+        assert normalize("  Zażółć   Gęślą ") == "zazołc gesla"
+        assert normalize("Clean  Code") == "clean code"
+
+    def test_search_matches_title_and_author_prefix(self):
+        index = PrefixIndex()
+        index.build([(1, "Clean Code", "Robert C. Martin"), (2, "Refactoring", "Martin Fowler")])
+        assert [h["id"] for h in index.search("clean")] == [1]
+        hits = index.search("mart")
+        assert [(h["id"], h["match"]) for h in hits] == [(2, "author")]
+        assert index.search("") == []
+
+    def test_limit_and_dedup(self):
+        index = PrefixIndex()
+        index.build([(i, f"Same {i}", "Same Author") for i in range(1, 21)])
+        hits = index.search("same", limit=5)
+        assert len(hits) == 5
+        assert len({h["id"] for h in hits}) == 5
+
+    def test_incremental_add_update_remove(self):
+        index = PrefixIndex()
+        index.build([])
+        before = index.memory_bytes()
+        index.add(7, "Dune", "Frank Herbert")
+        assert index.search("dun")[0]["id"] == 7
+        assert index.memory_bytes() > before
+
+        index.update(7, "Children of Dune", "Frank Herbert")
+        assert index.search("dun") == []
+        assert index.search("children")[0]["title"] == "Children of Dune"
+
+        index.remove(7)
+        assert index.search("children") == []
+        assert index.search("frank") == []
+        assert len(index) == 0
+
+
+def test_suggest_endpoint_tracks_writes():
+    with TestClient(app) as client:
+        login = client.post("/auth/token", data={"username": "admin", "password": "admin"})
+        token = login.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        created = client.post(
+            "/books/",
+            json={"title": "Quixotic Typeahead", "author": "Suggest Author"},
+            headers=headers,
+        ).json()
+        r = client.get("/books/suggest", params={"prefix": "quixotic t"})
+        assert r.status_code == 200
+        assert [h["id"] for h in r.json()] == [created["id"]]
+
+        client.patch(f"/books/{created['id']}", json={"title": "Renamed"}, headers=headers)
+        assert client.get("/books/suggest", params={"prefix": "quixotic"}).json() == []
+
+        client.delete(f"/books/{created['id']}", headers=headers)
+        assert client.get("/books/suggest", params={"prefix": "renamed"}).json() == []
+
+
+def test_suggest_requires_prefix():
+    with TestClient(app) as client:
+        assert client.get("/books/suggest").status_code == 422
+
+
+def test_rebuild_picks_up_other_workers_and_keeps_writes_made_meanwhile():
+    index = TenantSuggestIndex()
+    index.build([("t", 1, "Local Only", "A")])
+    # the database now holds another worker's rename; a local write races the rebuild
+    rows = [("t", 1, "Renamed Elsewhere", "A"), ("t", 2, "Deleted Meanwhile", "B")]
+
+    def scan():
+        yield rows[0]
+        index.add("t", 3, "Written During Rebuild", "C")
+        index.remove("t", 2)
+        yield rows[1]
+
+    index.build(scan())
+    assert index.search("t", "renamed")[0]["id"] == 1
+    assert index.search("t", "local") == []
+    assert index.search("t", "written")[0]["id"] == 3
+    assert index.search("t", "deleted") == []
@@ -0,0 +1,105 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app import models, tenancy
+from app.auth import create_access_token, decode_token
+from app.main import app
+
+client = TestClient(app)
+
+
+def _headers(tenant: str, user: str = "librarian") -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': user, 'tid': tenant})}"}
+
+
+def _create(tenant: str, title: str, author: str = "Tenant Author") -> dict:
+    response = client.post(
+        "/books/", json={"title": title, "author": author}, headers=_headers(tenant)
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_books_are_isolated_between_tenants():
+    book = _create("lib-a", "Only In A")
+    a, b = _headers("lib-a"), _headers("lib-b")
+
+    assert book["id"] in [x["id"] for x in client.get("/books/", headers=a).json()]
+    assert book["id"] not in [x["id"] for x in client.get("/books/", headers=b).json()]
+    assert client.get(f"/books/{book['id']}", headers=a).status_code == 200
+    assert client.get(f"/books/{book['id']}", headers=b).status_code == 404
+    assert client.patch(f"/books/{book['id']}", json={"year": 1}, headers=b).status_code == 404
+    assert client.delete(f"/books/{book['id']}", headers=b).status_code == 404
+    assert client.get(f"/books/{book['id']}", headers=a).json()["year"] is None
+
+
+def test_stats_and_suggest_are_per_tenant():
+    _create("lib-stats", "Zymurgy For Tenants", author="Stats Tenant Author")
+    stats_a = client.get("/books/stats", headers=_headers("lib-stats")).json()
+    stats_b = client.get("/books/stats", headers=_headers("lib-empty")).json()
+    assert stats_a["total"] == 1
+    assert stats_a["by_author"] == {"Stats Tenant Author": 1}
+    assert stats_b["total"] == 0
+
+    params = {"prefix": "zymurgy"}
+    assert len(client.get("/books/suggest", params=params, headers=_headers("lib-stats")).json())
+    assert client.get("/books/suggest", params=params, headers=_headers("lib-empty")).json() == []
+
+
+def test_anonymous_reads_use_tenant_header():
+    book = _create("lib-public", "Public Catalog Book")
+    listed = client.get("/books/", headers={"X-Tenant": "lib-public"}).json()
+    assert [x["id"] for x in listed] == [book["id"]]
+    assert client.get(f"/books/{book['id']}").status_code == 404  # default tenant
+    assert client.get("/books/", headers={"X-Tenant": "../Bad"}).status_code == 400
+
+
+def test_token_tenant_wins_and_mismatching_header_is_rejected():
+    response = client.get("/books/", headers={**_headers("lib-a"), "X-Tenant": "lib-b"})
+    assert response.status_code == 403
+    response = client.get("/books/", headers={**_headers("lib-a"), "X-Tenant": "lib-a"})
+    assert response.status_code == 200
+
+
+def test_registered_user_token_carries_tenant():
+    payload = {"username": "tenant-user", "email": "tenant-user@example.com", "password": "x" * 8}
+    response = client.post("/auth/register", json=payload, headers={"X-Tenant": "lib-reg"})
+    assert response.status_code == 201
+    login = client.post(
+        "/auth/token", data={"username": "tenant-user@example.com", "password": "x" * 8}
+    )
+    claims = decode_token(login.json()["access_token"])
+    assert claims["tid"] == "lib-reg"
+
+
+def test_tenant_scoped_list_is_a_single_query(max_queries):
+    _create("lib-q", "Query Count")
+    with max_queries(1):
+        client.get("/books/", headers={"X-Tenant": "lib-q"})
+
+
+def test_metric_labels_are_bounded(monkeypatch):
+    monkeypatch.setattr(tenancy, "_labelled", set())
+    monkeypatch.setattr(tenancy, "TENANT_METRICS_MAX_LABELS", 2)
+    labels = [tenancy.tenant_label(t) for t in ("t1", "t2", "t3", "t1")]
+    assert labels == ["t1", "t2", "other", "t1"]
+
+
+def test_requests_are_counted_per_tenant():
+    client.get("/books/", headers={"X-Tenant": "lib-metrics"})
+    metrics = client.get("/metrics").text
+    label = tenancy.tenant_label("lib-metrics")
+    assert f'librarylite_tenant_requests_total{{tenant="{label}"}}' in metrics
+
+
+def test_postgres_books_table_is_hash_partitioned_by_tenant():
+    ddl = tenancy.partition_ddl(models.Book.__table__, postgresql.dialect(), partitions=4)
+    create = ddl[0]
+    assert "PRIMARY KEY (tenant_id, id)" in create
+    assert create.endswith("PARTITION BY HASH (tenant_id)")
+    assert "tenant_id VARCHAR(64) NOT NULL" in create
+    partitions = [s for s in ddl if "PARTITION OF books" in s]
+    assert len(partitions) == 4
+    assert "MODULUS 4, REMAINDER 3" in partitions[-1]
+    # (tenant_id, id) is the primary key there, so the separate index is skipped
+    assert not any("ix_books_tenant_id_id" in s for s in ddl)